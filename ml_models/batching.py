@@ -0,0 +1,184 @@
+import queue
+import threading
+import time
+from collections import deque
+from django.conf import settings
+
+
+class PendingPrediction:
+    """One caller's request waiting in the micro-batch queue"""
+
+    __slots__ = ('student_data', 'enqueued_at', 'done', 'result')
+
+    def __init__(self, student_data):
+        self.student_data = student_data
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+
+
+def _percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-student predictions into vectorized batch calls
+
+    Callers block in submit() while a dispatcher thread collects every
+    request that arrives within ``window_ms`` of the first one (or until
+    ``max_rows`` are queued), scores them with a single
+    predictor.predict_batch() call and hands each caller its own row.
+    """
+
+    # Recent samples kept for the latency percentiles
+    SAMPLE_SIZE = 2048
+
+    def __init__(self, predictor, window_ms=2, max_rows=64):
+        self.predictor = predictor
+        self.window = window_ms / 1000
+        self.max_rows = max_rows
+        self.queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self._metrics_lock = threading.Lock()
+        self.request_count = 0
+        self.batch_count = 0
+        self.batch_sizes = {}
+        self.added_latency = deque(maxlen=self.SAMPLE_SIZE)
+        self.batch_latency = deque(maxlen=self.SAMPLE_SIZE)
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='ml-micro-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, student_data, timeout=None):
+        """Queue one prediction and wait for its result (same dict as predictor.predict)"""
+        self.start()
+        pending = PendingPrediction(student_data)
+        self.queue.put(pending)
+        if not pending.done.wait(timeout):
+            return {
+                'predicted_grade': None,
+                'confidence': None,
+                'lower': None,
+                'upper': None,
+                'model_version': None,
+                'error': "Prediction timed out",
+            }
+        return pending.result
+
+    def run(self):
+        while True:
+            first = self.queue.get()
+            batch = [first]
+            # The window is measured from the oldest request in the batch
+            deadline = first.enqueued_at + self.window
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self.queue.get(timeout=remaining))
+                    else:
+                        batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.process(batch)
+
+    def process(self, batch):
+        started = time.perf_counter()
+        scored = None
+        failure = None
+        try:
+            scored = self.predictor.predict_batch([pending.student_data for pending in batch])
+        except Exception as e:
+            failure = f"Error making prediction: {e}"
+
+        for i, pending in enumerate(batch):
+            if scored is None:
+                error = failure
+                model_version = None
+            else:
+                error = scored['errors'].get(i)
+                model_version = scored['model_version']
+            pending.result = {
+                'predicted_grade': scored['predictions'][i] if scored else None,
+                'confidence': scored['confidences'][i] if scored else None,
+                'lower': scored['lower'][i] if scored else None,
+                'upper': scored['upper'][i] if scored else None,
+                'model_version': model_version,
+                'error': error,
+            }
+            pending.done.set()
+
+        self.record(batch, started, time.perf_counter())
+
+    def record(self, batch, started, finished):
+        # Histogram buckets are powers of two: 1, 2, 4, 8, ...
+        bucket = 1
+        while bucket < len(batch):
+            bucket *= 2
+        with self._metrics_lock:
+            self.request_count += len(batch)
+            self.batch_count += 1
+            self.batch_sizes[bucket] = self.batch_sizes.get(bucket, 0) + 1
+            self.added_latency.extend(started - pending.enqueued_at for pending in batch)
+            self.batch_latency.append(finished - started)
+
+    def metrics(self):
+        """Queue depth, batch-size histogram and latency added by batching"""
+        with self._metrics_lock:
+            added = list(self.added_latency)
+            batch = list(self.batch_latency)
+            return {
+                'window_ms': self.window * 1000,
+                'max_rows': self.max_rows,
+                'queue_depth': self.queue.qsize(),
+                'requests': self.request_count,
+                'batches': self.batch_count,
+                'mean_batch_size': round(self.request_count / self.batch_count, 2) if self.batch_count else None,
+                'batch_size_histogram': {
+                    f'<={bucket}': count for bucket, count in sorted(self.batch_sizes.items())
+                },
+                'added_latency_ms': {
+                    'mean': round(sum(added) / len(added) * 1000, 3) if added else None,
+                    'p50': round(_percentile(added, 0.50) * 1000, 3) if added else None,
+                    'p99': round(_percentile(added, 0.99) * 1000, 3) if added else None,
+                },
+                'batch_latency_ms': {
+                    'p50': round(_percentile(batch, 0.50) * 1000, 3) if batch else None,
+                    'p99': round(_percentile(batch, 0.99) * 1000, 3) if batch else None,
+                },
+            }
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """Process-wide MicroBatcher around the global predictor"""
+    global _batcher
+    if _batcher is None:
+        from ml_models.predictor import predictor
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    predictor,
+                    window_ms=getattr(settings, 'ML_MICROBATCH_WINDOW_MS', 2),
+                    max_rows=getattr(settings, 'ML_MICROBATCH_MAX_ROWS', 64),
+                )
+    return _batcher
+
+
+def predict(student_data):
+    """Predict one student through the micro-batcher when ML_MICROBATCH_ENABLED is on"""
+    if getattr(settings, 'ML_MICROBATCH_ENABLED', False):
+        return get_batcher().submit(student_data, timeout=getattr(settings, 'ML_MICROBATCH_TIMEOUT', 30))
+    from ml_models.predictor import predictor
+    return predictor.predict(student_data)
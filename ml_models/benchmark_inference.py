@@ -0,0 +1,68 @@
+import sys
+import os
+import time
+import django
+import numpy as np
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'student_result_management.settings')
+django.setup()
+
+from ml_models.forest_engine import FlatForest, SklearnForest
+from ml_models.predictor import StudentPerformancePredictor
+from ml_models.train_model import create_sample_data
+
+BATCH_SIZES = [1, 100, 100_000]
+
+
+def best_time(func, X, repeat):
+    """Best wall time of ``repeat`` calls, in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(X)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def benchmark_inference():
+    """Compare the sklearn and flattened forest engines at several batch sizes"""
+    predictor = StudentPerformancePredictor(mode='sklearn')
+    if predictor.model is None:
+        print("Model not loaded - run ml_models/train_model.py first")
+        return
+
+    sklearn_forest = SklearnForest(predictor.model)
+    flat_forest = FlatForest.from_sklearn(predictor.model)
+    print(f"Forest: {flat_forest.n_trees} trees, {flat_forest.node_count} nodes, max depth {flat_forest.max_depth}")
+
+    samples = create_sample_data().drop(columns=['math_score'])
+    X_all, _ = predictor.pipeline.transform(samples)
+    rng = np.random.default_rng(42)
+
+    print("=" * 78)
+    print(f"{'rows':>8} | {'sklearn predict':>16} | {'flat predict':>13} | {'sklearn trees':>14} | {'flat trees':>11}")
+    print("-" * 78)
+    for n_rows in BATCH_SIZES:
+        X = X_all[rng.integers(0, len(X_all), n_rows)]
+        expected = predictor.model.predict(X)
+        if not np.array_equal(flat_forest.predict(X), expected):
+            raise AssertionError(f"Flat engine output differs from model.predict at {n_rows} rows")
+
+        repeat = 3 if n_rows >= 10_000 else 50
+        print(
+            f"{n_rows:>8} | "
+            f"{best_time(predictor.model.predict, X, repeat):>13.3f} ms | "
+            f"{best_time(flat_forest.predict, X, repeat):>10.3f} ms | "
+            f"{best_time(sklearn_forest.tree_outputs, X, repeat):>11.3f} ms | "
+            f"{best_time(flat_forest.tree_outputs, X, repeat):>8.3f} ms"
+        )
+    print("=" * 78)
+    print("Flat engine matches model.predict bit for bit at every batch size.")
+
+
+if __name__ == "__main__":
+    benchmark_inference()
@@ -0,0 +1,91 @@
+import sys
+import os
+import multiprocessing
+
+# Add the project root to Python path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+N_WORKERS = 4
+
+
+def read_memory():
+    """Return this process's memory counters in KiB (Linux smaps_rollup)"""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+def worker(loader, barrier, results):
+    """Load the model one way, score a batch, and report memory while all workers are alive"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'student_result_management.settings')
+    import django
+    django.setup()
+
+    from ml_models.predictor import StudentPerformancePredictor
+    from ml_models.train_model import create_sample_data
+
+    samples = create_sample_data().drop(columns=['math_score'])
+    predictor = StudentPerformancePredictor(mode='flat', autoload=False)
+    before = read_memory()
+
+    model_dir = os.path.join(PROJECT_ROOT, 'ml_models')
+    if loader == 'bundle':
+        loaded = predictor.load_bundle(os.path.join(model_dir, 'student_performance_model.bundle'))
+    else:
+        loaded = predictor.load_pickles(model_dir)
+    # Touch every tree so the model pages are actually resident
+    X, _ = loaded.pipeline.transform(samples)
+    loaded.forest.predict(X)
+
+    # Measure only once every worker has loaded, so shared pages are split N ways
+    barrier.wait()
+    after = read_memory()
+    results.put({key: after[key] - before[key] for key in after})
+    barrier.wait()
+
+
+def measure(loader, n_workers):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(n_workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(loader, barrier, results)) for _ in range(n_workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {key: sum(sample[key] for sample in samples) / n_workers for key in samples[0]}
+
+
+def benchmark_memory(n_workers=N_WORKERS):
+    """Compare per-worker model memory for the pickle and memory-mapped bundle paths"""
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("This benchmark needs Linux /proc/<pid>/smaps_rollup")
+        return
+    if not os.path.exists(os.path.join(PROJECT_ROOT, 'ml_models', 'student_performance_model.bundle')):
+        print("Model bundle not found - run ml_models/train_model.py first")
+        return
+
+    print(f"Model memory per worker with {n_workers} workers alive (KiB, delta over an idle worker)")
+    print("=" * 64)
+    print(f"{'loader':>8} | {'RSS':>10} | {'PSS':>10} | {'private':>10}")
+    print("-" * 64)
+    for loader in ['pickle', 'bundle']:
+        usage = measure(loader, n_workers)
+        print(f"{loader:>8} | {usage['rss']:>10.0f} | {usage['pss']:>10.0f} | {usage['private']:>10.0f}")
+    print("=" * 64)
+    print("PSS charges shared pages 1/N to each worker; the bundle's mapped")
+    print("forest arrays are shared through the page cache, pickles are private.")
+
+
+if __name__ == "__main__":
+    benchmark_memory(int(sys.argv[1]) if len(sys.argv) > 1 else N_WORKERS)
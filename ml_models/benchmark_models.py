@@ -0,0 +1,289 @@
+"""Accuracy-versus-latency benchmark for candidate forest configurations
+
+Trains every combination of tree count, depth and leaf size in a pool of
+worker processes, then measures the served bundles one at a time (so no
+latency sample competes with training) and reports, per candidate:
+
+    cv_mse / cv_r2   mean held-out error over K cross-validation folds
+    p50_ms / p99_ms  single-row latency of the served forest (bundle, flat engine)
+    rows_per_s       batch throughput on BATCH_ROWS rows
+    bundle_kib       size of the model bundle on disk
+    rss_kib          resident memory added by loading and using the bundle
+
+Candidates that no other candidate beats on every PARETO_OBJECTIVES are
+marked as Pareto-optimal; their bundles are kept for promotion, e.g.
+
+    cp <bundle> ml_models/student_performance_model.bundle
+    python manage.py reload_model
+
+The encoded and scaled fold matrices are built once and cached on disk
+under CACHE_DIR, keyed by a digest of the data, and every worker
+memory-maps them instead of receiving its own copy.
+
+    python ml_models/benchmark_models.py --trees 50,100,200 --depths none,12 --leaves 1,5
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+
+# Add the project root to Python path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+from ml_models.train_model import CATEGORICAL_COLUMNS, FEATURE_COLUMNS
+
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'ml_models', '.benchmark_cache')
+RUNS_DIR = os.path.join(PROJECT_ROOT, 'ml_models', 'benchmark_runs')
+N_FOLDS = 5
+LATENCY_SAMPLES = 500
+BATCH_ROWS = 10_000
+# Lower is better for every objective
+PARETO_OBJECTIVES = ['cv_mse', 'p99_ms', 'bundle_kib']
+
+
+def load_data(source, chunk_size=5000):
+    """Return (X, y, label_encoders) with X encoded but not yet scaled"""
+    if source == 'db':
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'student_result_management.settings')
+        import django
+        django.setup()
+        from ml_models.train_model import fixed_label_encoders, load_training_data_from_db
+        le_dict = fixed_label_encoders()
+        X, y, _ = load_training_data_from_db(le_dict, chunk_size=chunk_size)
+        return X, y, le_dict
+
+    from sklearn.preprocessing import LabelEncoder
+    from ml_models.train_model import create_sample_data
+    df = create_sample_data()
+    le_dict = {}
+    for col in CATEGORICAL_COLUMNS:
+        le = LabelEncoder()
+        df[col + '_encoded'] = le.fit_transform(df[col])
+        le_dict[col] = le
+    return df[FEATURE_COLUMNS].to_numpy(dtype=np.float64), df['math_score'].to_numpy(dtype=np.float64), le_dict
+
+
+def prepare_folds(X, y, le_dict, n_folds=N_FOLDS, seed=42):
+    """Write the scaled CV fold matrices (and the full training set) once; return the cache directory
+
+    Each fold's scaler is fitted on that fold's training rows only. The
+    directory name is a digest of the data and fold settings, so a rerun
+    on the same data reuses it.
+    """
+    from sklearn.model_selection import KFold
+    from sklearn.preprocessing import StandardScaler
+
+    digest = hashlib.sha256()
+    for array in (X, y):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update(f'{n_folds}:{seed}'.encode())
+    cache = os.path.join(CACHE_DIR, digest.hexdigest()[:16])
+    if os.path.exists(os.path.join(cache, 'meta.json')):
+        return cache
+
+    os.makedirs(cache, exist_ok=True)
+    splits = KFold(n_splits=n_folds, shuffle=True, random_state=seed).split(X)
+    for k, (train, test) in enumerate(splits):
+        scaler = StandardScaler().fit(X[train])
+        np.save(os.path.join(cache, f'fold{k}_X_train.npy'), scaler.transform(X[train]))
+        np.save(os.path.join(cache, f'fold{k}_y_train.npy'), y[train])
+        np.save(os.path.join(cache, f'fold{k}_X_test.npy'), scaler.transform(X[test]))
+        np.save(os.path.join(cache, f'fold{k}_y_test.npy'), y[test])
+
+    scaler = StandardScaler().fit(X)
+    np.save(os.path.join(cache, 'full_X.npy'), scaler.transform(X))
+    np.save(os.path.join(cache, 'full_y.npy'), y)
+    joblib.dump({'scaler': scaler, 'label_encoders': le_dict}, os.path.join(cache, 'preprocessors.pkl'))
+    with open(os.path.join(cache, 'meta.json'), 'w') as f:
+        json.dump({'n_rows': len(X), 'n_folds': n_folds, 'seed': seed}, f)
+    return cache
+
+
+def cached(cache, name):
+    return np.load(os.path.join(cache, f'{name}.npy'), mmap_mode='r')
+
+
+def train_candidate(params, cache, run_dir):
+    """Cross-validate one configuration, then fit it on all rows and write its bundle"""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import mean_squared_error, r2_score
+    from ml_models.bundle import write_bundle
+    from ml_models.feature_pipeline import FeaturePipeline
+    from ml_models.forest_engine import FlatForest
+
+    with open(os.path.join(cache, 'meta.json')) as f:
+        n_folds = json.load(f)['n_folds']
+
+    def fit(X, y):
+        model = RandomForestRegressor(random_state=42, n_jobs=1, **params)
+        return model.fit(X, y)
+
+    mse, r2 = [], []
+    started = time.perf_counter()
+    for k in range(n_folds):
+        model = fit(cached(cache, f'fold{k}_X_train'), cached(cache, f'fold{k}_y_train'))
+        y_test = cached(cache, f'fold{k}_y_test')
+        y_pred = model.predict(cached(cache, f'fold{k}_X_test'))
+        mse.append(mean_squared_error(y_test, y_pred))
+        r2.append(r2_score(y_test, y_pred))
+    cv_seconds = time.perf_counter() - started
+
+    X = cached(cache, 'full_X')
+    model = fit(X, cached(cache, 'full_y'))
+    preprocessors = joblib.load(os.path.join(cache, 'preprocessors.pkl'))
+    name = 'trees{n_estimators}-depth{max_depth}-leaf{min_samples_leaf}'.format(**params)
+    bundle_path = os.path.join(run_dir, f'{name}.bundle')
+    write_bundle(
+        bundle_path,
+        FlatForest.from_sklearn(model),
+        FeaturePipeline.from_preprocessors(preprocessors['label_encoders'], preprocessors['scaler'], FEATURE_COLUMNS),
+        metadata={'candidate': name, 'params': params, 'cv_mse': float(np.mean(mse)), 'cv_r2': float(np.mean(r2))},
+    )
+    return {
+        'name': name,
+        'params': params,
+        'cv_mse': round(float(np.mean(mse)), 4),
+        'cv_mse_std': round(float(np.std(mse)), 4),
+        'cv_r2': round(float(np.mean(r2)), 4),
+        'cv_seconds': round(cv_seconds, 2),
+        'bundle_kib': round(os.path.getsize(bundle_path) / 1024, 1),
+        'bundle': bundle_path,
+    }
+
+
+def measure_candidate(result, cache):
+    """Measure a trained candidate's bundle the way it is served: mapped, flat engine
+
+    Runs alone in a fresh worker process after all training has finished,
+    so neither the latency samples nor the RSS delta of loading the bundle
+    are disturbed by other candidates.
+    """
+    from ml_models.benchmark_memory import read_memory
+    from ml_models.bundle import load_bundle
+    from ml_models.confidence import ConfidenceEngine
+
+    X = cached(cache, 'full_X')
+    rng = np.random.default_rng(0)
+    batch = np.ascontiguousarray(X[rng.integers(0, len(X), BATCH_ROWS)])
+    before = read_memory()
+    engine = ConfidenceEngine(load_bundle(result['bundle'])['forest'])
+    engine.evaluate(batch)
+    rss_kib = read_memory()['rss'] - before['rss']
+
+    latencies = []
+    for i in rng.integers(0, BATCH_ROWS, LATENCY_SAMPLES):
+        row = batch[i:i + 1]
+        start = time.perf_counter()
+        engine.evaluate(row)
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    engine.evaluate(batch)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        **result,
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 3),
+        'rows_per_s': round(BATCH_ROWS / batch_seconds),
+        'rss_kib': rss_kib,
+    }
+
+
+def pareto_front(results, objectives=PARETO_OBJECTIVES):
+    """Mark results that no other result matches or beats on every objective and strictly beats on one"""
+    for result in results:
+        scores = [result[key] for key in objectives]
+        result['pareto'] = not any(
+            all(other[key] <= score for key, score in zip(objectives, scores))
+            and any(other[key] < score for key, score in zip(objectives, scores))
+            for other in results if other is not result
+        )
+    return results
+
+
+def parse_list(text, cast=int):
+    return [None if value.lower() == 'none' else cast(value) for value in text.split(',')]
+
+
+def benchmark_models(trees, depths, leaves, source='sample', workers=None, keep_all=False):
+    X, y, le_dict = load_data(source)
+    cache = prepare_folds(X, y, le_dict)
+    run_dir = os.path.join(RUNS_DIR, time.strftime('%Y%m%d%H%M%S'))
+    os.makedirs(run_dir, exist_ok=True)
+    candidates = [
+        {'n_estimators': n, 'max_depth': depth, 'min_samples_leaf': leaf}
+        for n, depth, leaf in itertools.product(trees, depths, leaves)
+    ]
+    print(f"{len(candidates)} candidates, {len(X)} rows, {N_FOLDS}-fold CV (folds cached in {cache})")
+
+    started = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context) as pool:
+        trained = list(pool.map(train_candidate, candidates, [cache] * len(candidates), [run_dir] * len(candidates)))
+    # One candidate at a time, each in a fresh process, on an otherwise idle pool
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, max_tasks_per_child=1) as pool:
+        results = [pool.submit(measure_candidate, result, cache).result() for result in trained]
+    elapsed = time.perf_counter() - started
+
+    pareto_front(results)
+    results.sort(key=lambda result: result['cv_mse'])
+    if not keep_all:
+        # Only Pareto-optimal bundles are worth promoting
+        for result in results:
+            if not result['pareto']:
+                os.remove(result['bundle'])
+                result['bundle'] = None
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'source': source,
+        'n_rows': len(X),
+        'n_folds': N_FOLDS,
+        'pareto_objectives': PARETO_OBJECTIVES,
+        'seconds': round(elapsed, 1),
+        'candidates': results,
+        'promote': [result['name'] for result in results if result['pareto']],
+    }
+    report_path = os.path.join(run_dir, 'report.json')
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("=" * 100)
+    print(f"{'candidate':>28} | {'cv mse':>8} | {'cv r2':>6} | {'p50 ms':>7} | {'p99 ms':>7} | "
+          f"{'rows/s':>9} | {'KiB':>7} | {'RSS KiB':>8} | pareto")
+    print("-" * 100)
+    for result in results:
+        print(
+            f"{result['name']:>28} | {result['cv_mse']:>8.2f} | {result['cv_r2']:>6.3f} | "
+            f"{result['p50_ms']:>7.3f} | {result['p99_ms']:>7.3f} | {result['rows_per_s']:>9} | "
+            f"{result['bundle_kib']:>7.0f} | {result['rss_kib']:>8} | {'*' if result['pareto'] else ''}"
+        )
+    print("=" * 100)
+    print(f"Finished in {elapsed:.1f}s. Pareto-optimal on {', '.join(PARETO_OBJECTIVES)}: {', '.join(report['promote'])}")
+    print(f"Report and promotable bundles written to {run_dir}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trees', default='25,50,100,200', help="comma-separated n_estimators values")
+    parser.add_argument('--depths', default='none,8,12,16', help="comma-separated max_depth values ('none' = unlimited)")
+    parser.add_argument('--leaves', default='1,5,20', help="comma-separated min_samples_leaf values")
+    parser.add_argument('--source', choices=['sample', 'db'], default='sample',
+                        help="synthetic sample data (default) or profiles and marks from the database")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--keep-all', action='store_true', help="keep the bundles of non-Pareto candidates too")
+    args = parser.parse_args()
+
+    benchmark_models(
+        parse_list(args.trees), parse_list(args.depths), parse_list(args.leaves),
+        source=args.source, workers=args.workers, keep_all=args.keep_all,
+    )
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import struct
+import time
+import numpy as np
+from ml_models.feature_pipeline import FeaturePipeline
+from ml_models.forest_engine import FlatForest
+
+# File layout:
+#   MAGIC | uint64 manifest length | manifest JSON | padding | arrays...
+# Every array starts on an ALIGNMENT boundary so it can be memory-mapped
+# in place; the manifest records each array's dtype, shape and offset.
+MAGIC = b'SPMBNDL1'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+BUNDLE_FILENAME = 'student_performance_model.bundle'
+# Distilled float32 variant for memory-constrained workers (train_model.py --compact)
+COMPACT_BUNDLE_FILENAME = 'student_performance_model.compact.bundle'
+
+FOREST_ARRAYS = ['children', 'feature', 'threshold', 'value', 'roots']
+
+
+class BundleError(Exception):
+    """Raised when a model bundle is missing, corrupt or incompatible"""
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def content_version(forest, pipeline):
+    """Version id derived from the model's contents rather than from file times
+
+    Hashes the forest arrays and the preprocessing, so the same model gets
+    the same version from its bundle and its pickles, and copying or
+    touching the files does not change it.
+    """
+    digest = hashlib.sha256()
+    for name in FOREST_ARRAYS:
+        digest.update(np.ascontiguousarray(getattr(forest, name)).tobytes())
+    digest.update(np.ascontiguousarray(pipeline.mean, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(pipeline.scale, dtype=np.float64).tobytes())
+    digest.update(json.dumps([pipeline.feature_columns, pipeline.category_maps], sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def write_bundle(path, forest, pipeline, version=None, metadata=None):
+    """Write a FlatForest and FeaturePipeline to a single memory-mappable file
+
+    The version defaults to content_version(). The file is written to a
+    temporary name and renamed into place, so readers never see a
+    partially written bundle.
+    """
+    arrays = {name: getattr(forest, name) for name in FOREST_ARRAYS}
+    arrays['scaler_mean'] = pipeline.mean
+    arrays['scaler_scale'] = pipeline.scale
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+            'nbytes': array.nbytes,
+        }
+        offset = _aligned(offset + array.nbytes)
+
+    digest = hashlib.sha256()
+    for name, array in arrays.items():
+        digest.update(array.tobytes())
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version or content_version(forest, pipeline),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'feature_columns': pipeline.feature_columns,
+        'categories': {
+            column: sorted(lookup, key=lookup.get)
+            for column, lookup in pipeline.category_maps.items()
+        },
+        'forest': {
+            'n_trees': forest.n_trees,
+            'node_count': forest.node_count,
+            'max_depth': forest.max_depth,
+        },
+        'arrays': layout,
+        'checksum': {'algorithm': 'sha256', 'digest': digest.hexdigest()},
+        'metadata': metadata or {},
+    }
+
+    header = json.dumps(manifest, indent=2).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def read_manifest(path):
+    """Read a bundle's manifest without touching its arrays"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise BundleError(f"{path} is not a model bundle")
+        (length,) = struct.unpack('<Q', f.read(8))
+        manifest = json.loads(f.read(length).decode('utf-8'))
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise BundleError(f"Unsupported bundle format {manifest.get('format_version')}")
+    manifest['data_start'] = _aligned(len(MAGIC) + 8 + length)
+    return manifest
+
+
+def load_bundle(path, verify=True):
+    """Memory-map a bundle read-only and rebuild the inference objects
+
+    Returns a dict with the manifest, a FlatForest backed directly by the
+    mapped pages (shared by every process on the host through the page
+    cache) and a FeaturePipeline.
+    """
+    manifest = read_manifest(path)
+    arrays = {}
+    for name, spec in manifest['arrays'].items():
+        arrays[name] = np.memmap(
+            path, mode='r', dtype=np.dtype(spec['dtype']), shape=tuple(spec['shape']),
+            offset=manifest['data_start'] + spec['offset'],
+        )
+
+    if verify:
+        digest = hashlib.sha256()
+        for name in manifest['arrays']:
+            digest.update(memoryview(arrays[name]).cast('B'))
+        if digest.hexdigest() != manifest['checksum']['digest']:
+            raise BundleError(f"Checksum mismatch for {path}")
+
+    forest = FlatForest(
+        arrays['children'], arrays['feature'], arrays['threshold'], arrays['value'],
+        arrays['roots'], manifest['forest']['max_depth'],
+    )
+    category_maps = {
+        column: {category: code for code, category in enumerate(categories)}
+        for column, categories in manifest['categories'].items()
+    }
+    pipeline = FeaturePipeline(
+        manifest['feature_columns'], category_maps, arrays['scaler_mean'], arrays['scaler_scale'],
+    )
+    return {'manifest': manifest, 'forest': forest, 'pipeline': pipeline}
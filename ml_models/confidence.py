@@ -0,0 +1,39 @@
+import numpy as np
+from ml_models.forest_engine import sum_trees
+
+
+class ConfidenceEngine:
+    """Forest prediction and uncertainty from one stacked pass over all trees
+
+    The forest backend (see ml_models.forest_engine) yields the full
+    (n_trees x n_rows) matrix of tree outputs in one call. The mean
+    prediction, standard deviation, quantile interval and confidence score
+    are then all array reductions over that matrix.
+    """
+
+    def __init__(self, forest, quantiles=(0.1, 0.9)):
+        self.forest = forest
+        self.quantiles = quantiles
+
+    def tree_outputs(self, X):
+        """Return the (n_trees, n_rows) matrix of per-tree predictions"""
+        return self.forest.tree_outputs(X)
+
+    def evaluate(self, X):
+        """Predict and estimate uncertainty for every row of X"""
+        return self.summarize(self.tree_outputs(X))
+
+    def summarize(self, outputs):
+        """Reduce a (n_trees, n_rows) output matrix to per-row statistics"""
+        # Summing tree by tree matches RandomForestRegressor.predict exactly
+        prediction = sum_trees(outputs) / len(outputs)
+        std = outputs.std(axis=0)
+        lower, upper = np.quantile(outputs, self.quantiles, axis=0)
+        return {
+            'prediction': prediction,
+            'std': std,
+            'lower': lower,
+            'upper': upper,
+            # Inverse relationship with the spread of tree predictions
+            'confidence': np.clip(100 - (std * 2), 0, 100),
+        }
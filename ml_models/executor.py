@@ -0,0 +1,316 @@
+import asyncio
+import copy
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+
+
+class InferenceUnavailable(Exception):
+    """The worker pool is saturated, timed out or lost a worker"""
+
+
+# Set in pool worker processes, which score one request at a time and
+# therefore skip the in-process micro-batcher
+_in_worker = False
+
+
+def init_worker(settings_module):
+    """Pool initializer: set up Django and load the model before taking work"""
+    global _in_worker
+    _in_worker = True
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+    from ml_models.predictor import predictor
+    predictor.load_model()
+    # Workers pick up newly deployed models the same way web workers do
+    interval = getattr(settings, 'ML_MODEL_WATCH_INTERVAL', 0)
+    if interval:
+        predictor.start_watcher(interval)
+
+
+def _warm_up():
+    from ml_models.predictor import predictor
+    return os.getpid(), predictor.model_version
+
+
+def score_student(student_data, explain=False):
+    """Predict one student and build their recommendations
+
+    This is the unit of work shipped to the pool; it runs the feature
+    pipeline, the forest and generate_recommendations in one call, plus
+    explain() when ``explain`` is set.
+    """
+    from ml_models.predictor import predictor
+    if _in_worker:
+        prediction = predictor.predict(student_data)
+    else:
+        from ml_models import batching
+        prediction = batching.predict(student_data)
+
+    recommendations = []
+    if prediction['predicted_grade'] is not None:
+        recommendations = predictor.generate_recommendations(student_data, prediction['predicted_grade'])
+    explanation = None
+    if explain and prediction['predicted_grade'] is not None:
+        explanation = predictor.explain(student_data)
+        # A reload between the two calls would explain another model's grade
+        if explanation['model_version'] != prediction['model_version']:
+            explanation = None
+    return {'prediction': prediction, 'recommendations': recommendations, 'explanation': explanation}
+
+
+def score_batch(records):
+    """Score many students with one vectorized predict_batch() call"""
+    from ml_models.predictor import predictor
+    return predictor.predict_batch(records)
+
+
+def score_stored(student_pks):
+    """Score students from their rows in the feature store
+
+    Students the store can't score (no row yet, or a store built for
+    another model version) are read from the database and go through
+    predict_batch() instead, so the result always covers every pk.
+    """
+    from ml_models.feature_store import get_store
+    from ml_models.predictor import predictor
+    result = predictor.predict_stored(student_pks, get_store())
+    if not result['errors']:
+        return result
+
+    from student_app.models import PerformanceProfile
+    retry = [student_pks[i] for i in result['errors']]
+    profiles = {
+        row['student_id']: row
+        for row in PerformanceProfile.objects.filter(student_id__in=retry).values(
+            'student_id', *PerformanceProfile.FEATURE_FIELDS
+        )
+    }
+    positions = list(result['errors'])
+    fallback = predictor.predict_batch([profiles.get(student_pks[i], {}) for i in positions])
+    result['errors'] = {}
+    for j, i in enumerate(positions):
+        if j in fallback['errors']:
+            result['errors'][i] = fallback['errors'][j]
+            continue
+        for key in ('predictions', 'confidences', 'lower', 'upper'):
+            result[key][i] = fallback[key][j]
+    result['model_version'] = fallback['model_version'] or result['model_version']
+    return result
+
+
+def _failed(error):
+    return {
+        'prediction': {
+            'predicted_grade': None,
+            'confidence': None,
+            'lower': None,
+            'upper': None,
+            'model_version': None,
+            'error': error,
+        },
+        'recommendations': [],
+        'explanation': None,
+    }
+
+
+class InferenceExecutor:
+    """Runs prediction work inline or in a pool of prewarmed worker processes
+
+    With the 'process' backend every worker loads the model once at start-up,
+    so the request thread only dispatches score_student() and waits.
+    ``max_pending`` bounds the requests queued or running in the pool; past
+    that, callers wait up to ``timeout`` seconds for a slot and then get an
+    error instead of piling up behind a saturated pool.
+    """
+
+    BACKENDS = ('inline', 'process')
+
+    def __init__(self, backend='inline', max_workers=None, max_pending=64, timeout=10):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown executor backend '{backend}', expected one of {self.BACKENDS}")
+        self.backend = backend
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+        self._metrics_lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.worker_versions = {}
+
+    def start(self):
+        """Create the pool and wait until every worker has loaded the model"""
+        if self.backend != 'process':
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_worker,
+                    initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'student_result_management.settings'),),
+                )
+                warm_ups = [self._pool.submit(_warm_up) for _ in range(self.max_workers)]
+                self.worker_versions = dict(future.result() for future in warm_ups)
+            return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+    def run(self, func, *args):
+        """Run ``func(*args)`` on the configured backend and return its result
+
+        Raises InferenceUnavailable when no slot frees up within ``timeout``
+        seconds, the work does not finish in time or a worker process dies.
+        """
+        if self.backend == 'inline':
+            return func(*args)
+
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._metrics_lock:
+                self.rejected += 1
+            raise InferenceUnavailable("Prediction service is busy, please try again")
+
+        with self._metrics_lock:
+            self.in_flight += 1
+        try:
+            future = self.start().submit(func, *args)
+            result = future.result(timeout=self.timeout)
+            with self._metrics_lock:
+                self.completed += 1
+            return result
+        except FutureTimeoutError:
+            future.cancel()
+            with self._metrics_lock:
+                self.timed_out += 1
+            raise InferenceUnavailable("Prediction timed out")
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); later requests get a fresh pool
+            self.shutdown()
+            raise InferenceUnavailable("Prediction worker crashed, please try again")
+        finally:
+            with self._metrics_lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def metrics(self):
+        with self._metrics_lock:
+            return {
+                'backend': self.backend,
+                'workers': self.max_workers if self.backend == 'process' else 0,
+                'worker_model_versions': sorted(set(self.worker_versions.values())),
+                'max_pending': self.max_pending,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+            }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide InferenceExecutor configured from settings"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = InferenceExecutor(
+                    backend=getattr(settings, 'ML_EXECUTOR_BACKEND', 'inline'),
+                    max_workers=getattr(settings, 'ML_EXECUTOR_WORKERS', None),
+                    max_pending=getattr(settings, 'ML_EXECUTOR_MAX_PENDING', 64),
+                    timeout=getattr(settings, 'ML_EXECUTOR_TIMEOUT', 10),
+                )
+    return _executor
+
+
+def run_prediction(student_data, explain=False):
+    """Score a student and build recommendations on the configured backend
+
+    Returns {'prediction': <predictor.predict() dict>, 'recommendations': [...],
+    'explanation': <predictor.explain() dict or None>}; the explanation is
+    only computed when ``explain`` is set, in the same call as the grade.
+    A busy or timed-out pool is reported through prediction['error'].
+    Results are served from the prediction cache when it is enabled.
+    """
+    from ml_models.prediction_cache import get_cache
+    from ml_models.predictor import predictor
+
+    cache = get_cache()
+    inputs = None
+    if cache is not None:
+        inputs, canonical = cache.canonicalize(student_data)
+        if inputs is not None:
+            # The version serving here, or the one the pool workers last reported
+            loaded = predictor.active
+            cached = cache.get(cache.key(loaded.version if loaded is not None else cache.model_version, inputs))
+            if cached is not None and (cached.get('explanation') is not None or not explain):
+                return {
+                    'prediction': dict(cached['prediction']),
+                    'recommendations': list(cached['recommendations']),
+                    'explanation': copy.deepcopy(cached.get('explanation')),
+                }
+            student_data = canonical
+
+    try:
+        outcome = get_executor().run(score_student, student_data, explain)
+    except InferenceUnavailable as e:
+        return _failed(str(e))
+
+    prediction = outcome['prediction']
+    # Stored under the version that actually produced the result
+    if inputs is not None and prediction['error'] is None:
+        cache.put(cache.key(prediction['model_version'], inputs), {
+            'prediction': dict(prediction),
+            'recommendations': list(outcome['recommendations']),
+            'explanation': copy.deepcopy(outcome['explanation']),
+        })
+    return outcome
+
+
+_async_pool = None
+
+
+def get_async_pool():
+    """Threads that run blocking prediction calls on behalf of async views"""
+    global _async_pool
+    if _async_pool is None:
+        with _executor_lock:
+            if _async_pool is None:
+                _async_pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'ML_ASYNC_INFERENCE_THREADS', 64),
+                    thread_name_prefix='ml-async',
+                )
+    return _async_pool
+
+
+async def arun(func, *args):
+    """Run a blocking prediction call on the async thread pool and await it"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_async_pool(), func, *args)
+
+
+async def arun_prediction(student_data):
+    """Async version of run_prediction() that never blocks the event loop
+
+    The call runs on a dedicated thread pool. Those threads only wait while
+    the micro-batcher or the worker pool scores the request, so a pool of
+    a few dozen threads keeps many concurrent requests in flight.
+    """
+    return await arun(run_prediction, student_data)
@@ -0,0 +1,154 @@
+import numpy as np
+
+
+class FeaturePipeline:
+    """Compiled encode-and-scale pipeline built once from the fitted preprocessors
+
+    Categorical columns are encoded through plain dict lookups instead of
+    LabelEncoder.transform, and the StandardScaler mean/scale are kept as
+    arrays so that scaling is two in-place operations on a preallocated
+    float64 matrix laid out in feature_columns order.
+    """
+
+    ENCODED_SUFFIX = '_encoded'
+
+    def __init__(self, feature_columns, category_maps, mean, scale):
+        self.feature_columns = list(feature_columns)
+        self.category_maps = category_maps
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+        # (raw input column, category lookup or None for numeric) per feature
+        self.sources = []
+        for feature in self.feature_columns:
+            if feature.endswith(self.ENCODED_SUFFIX):
+                column = feature[:-len(self.ENCODED_SUFFIX)]
+                # Columns without a fitted encoder always encode to 0
+                self.sources.append((column, category_maps.get(column, {})))
+            else:
+                self.sources.append((feature, None))
+
+    @classmethod
+    def from_preprocessors(cls, label_encoders, scaler, feature_columns):
+        """Build the pipeline from the LabelEncoders, StandardScaler and feature list"""
+        category_maps = {
+            column: {category: code for code, category in enumerate(le.classes_.tolist())}
+            for column, le in label_encoders.items()
+        }
+        n_features = len(feature_columns)
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+        return cls(feature_columns, category_maps, mean, scale)
+
+    @property
+    def raw_columns(self):
+        """Input fields the pipeline reads, in feature order"""
+        return [column for column, _ in self.sources]
+
+    @property
+    def numeric_columns(self):
+        return [column for column, lookup in self.sources if lookup is None]
+
+    def transform_one(self, student_data):
+        """Encode and scale a single student dict into a (1, n_features) matrix"""
+        X = np.empty((1, len(self.sources)), dtype=np.float64)
+        for j, (column, lookup) in enumerate(self.sources):
+            if lookup is None:
+                X[0, j] = float(student_data[column])
+            else:
+                X[0, j] = lookup.get(student_data.get(column), 0)
+        return self.scale_in_place(X)
+
+    def transform_grid(self, student_data, grid):
+        """Encode one base profile with one or two numeric columns swept over a grid
+
+        ``grid`` is an ordered mapping of numeric column -> values. Returns a
+        matrix with one row per grid point in row-major ('ij') order, i.e.
+        the last column varies fastest. The base row is encoded once and the
+        swept columns are scaled with the same operations as transform().
+        """
+        base = self.transform_one(student_data)
+        axes = [np.asarray(values, dtype=np.float64) for values in grid.values()]
+        points = np.meshgrid(*axes, indexing='ij')
+        X = np.repeat(base, points[0].size, axis=0)
+        for column, values in zip(grid, points):
+            j = self.raw_columns.index(column)
+            X[:, j] = values.ravel()
+            X[:, j] -= self.mean[j]
+            X[:, j] /= self.scale[j]
+        return X
+
+    def transform(self, records):
+        """Encode and scale a batch of records in one vectorized pass
+
+        Accepts a list of dicts, a DataFrame or a structured NumPy array.
+        Returns (X, errors) where X has one row per input record and errors
+        maps the index of every row with a missing or non-numeric value to a
+        message. Rows listed in errors contain NaN and must not be scored.
+        """
+        columns, n_rows = self.extract_columns(records)
+        X = np.empty((n_rows, len(self.sources)), dtype=np.float64)
+        errors = {}
+
+        for j, (column, lookup) in enumerate(self.sources):
+            values = columns.get(column)
+            if lookup is None:
+                X[:, j] = self.numeric_column(column, values, n_rows, errors)
+            elif values is None:
+                X[:, j] = 0
+            else:
+                X[:, j] = np.fromiter((lookup.get(v, 0) for v in values), dtype=np.float64, count=n_rows)
+
+        return self.scale_in_place(X), errors
+
+    def scale_in_place(self, X):
+        # Same operations, in the same order, as StandardScaler.transform
+        X -= self.mean
+        X /= self.scale
+        return X
+
+    def extract_columns(self, records):
+        """Pull the raw input columns out of any supported batch container"""
+        wanted = set(self.raw_columns)
+        if hasattr(records, 'columns') and hasattr(records, 'to_numpy'):
+            return {c: records[c].to_numpy() for c in records.columns if c in wanted}, len(records)
+        if isinstance(records, np.ndarray):
+            if records.dtype.names is None:
+                raise ValueError("NumPy input must be a structured array with named fields")
+            columns = {}
+            for name in records.dtype.names:
+                if name in wanted:
+                    values = records[name]
+                    if values.dtype.kind == 'S':
+                        values = np.char.decode(values, 'utf-8')
+                    columns[name] = values.tolist() if values.dtype.kind == 'U' else values
+            return columns, len(records)
+
+        records = list(records)
+        columns = {column: [record.get(column) for record in records] for column in wanted}
+        return columns, len(records)
+
+    def numeric_column(self, column, values, n_rows, errors):
+        """Convert one numeric input column to float64, recording bad rows"""
+        if values is None:
+            for i in range(n_rows):
+                errors.setdefault(i, f"Missing value for '{column}'")
+            return np.nan
+
+        try:
+            out = np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            out = np.empty(n_rows, dtype=np.float64)
+            for i, value in enumerate(values):
+                try:
+                    out[i] = np.nan if value is None else float(value)
+                except (TypeError, ValueError):
+                    out[i] = np.nan
+                    errors.setdefault(i, f"Invalid value for '{column}': {value!r}")
+
+        for i in np.flatnonzero(~np.isfinite(out)):
+            if np.isnan(out[i]):
+                errors.setdefault(int(i), f"Missing value for '{column}'")
+            else:
+                errors.setdefault(int(i), f"Invalid value for '{column}': {values[i]!r}")
+        return out
@@ -0,0 +1,322 @@
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import numpy as np
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not serialized across processes
+    fcntl = None
+
+# File layout:
+#   MAGIC | uint64 manifest length | manifest JSON | padding to HEADER_SIZE | matrix
+# The matrix is float32, C-ordered, one row of encoded and scaled features
+# per student pk (row i belongs to the student with pk i) and NaN in rows
+# with no profile. The header has a fixed size so it can be rewritten in
+# place when the file grows.
+MAGIC = b'SPMFEAT1'
+FORMAT_VERSION = 1
+HEADER_SIZE = 4096
+DTYPE = np.dtype('<f4')
+
+
+class FeatureStoreError(Exception):
+    """Raised when a feature store file is missing, corrupt or incompatible"""
+
+
+def _encode_header(manifest):
+    header = json.dumps(manifest).encode('utf-8')
+    if len(MAGIC) + 8 + len(header) > HEADER_SIZE:
+        raise FeatureStoreError("Feature store manifest does not fit in the header")
+    return (MAGIC + struct.pack('<Q', len(header)) + header).ljust(HEADER_SIZE, b'\0')
+
+
+def read_manifest(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise FeatureStoreError(f"{path} is not a feature store")
+        (length,) = struct.unpack('<Q', f.read(8))
+        manifest = json.loads(f.read(length).decode('utf-8'))
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise FeatureStoreError(f"Unsupported feature store format {manifest.get('format_version')}")
+    return manifest
+
+
+class FeatureStore:
+    """Per-student feature vectors in one memory-mapped float32 file
+
+    Each row holds a student's features exactly as the model of
+    ``model_version`` sees them (encoded, scaled, float32), so a batch of
+    students is scored straight from the mapped pages without the ORM or
+    the feature pipeline. The forest compares features in float32, so
+    scores read from the store match scores from raw profiles bit for bit.
+
+    Writers take an exclusive lock on the file and grow it (doubling the
+    capacity) when a pk falls past the end; readers remap when they notice
+    the file grew or was rebuilt.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest = None
+        self.matrix = None
+        self._identity = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, path, model_version, feature_columns, capacity=1024):
+        """Write an empty store (every row NaN) and return it opened
+
+        The file is written under a temporary name and renamed into place,
+        so a rebuild never exposes a half-written store.
+        """
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'model_version': model_version,
+            'feature_columns': list(feature_columns),
+            'capacity': max(int(capacity), 1),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'synced_at': None,
+        }
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(_encode_header(manifest))
+            f.truncate(HEADER_SIZE + manifest['capacity'] * len(feature_columns) * DTYPE.itemsize)
+        matrix = np.memmap(
+            tmp_path, mode='r+', dtype=DTYPE, offset=HEADER_SIZE,
+            shape=(manifest['capacity'], len(feature_columns)),
+        )
+        matrix[:] = np.nan
+        matrix.flush()
+        del matrix
+        os.replace(tmp_path, path)
+        return cls(path).open()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def open(self):
+        """Map the file, or remap it if it grew or was replaced since the last call"""
+        with self._lock:
+            stat = os.stat(self.path)
+            identity = (stat.st_ino, stat.st_size)
+            if identity != self._identity:
+                manifest = read_manifest(self.path)
+                self.matrix = np.memmap(
+                    self.path, mode='r+', dtype=DTYPE, offset=HEADER_SIZE,
+                    shape=(manifest['capacity'], len(manifest['feature_columns'])),
+                )
+                self.manifest = manifest
+                self._identity = identity
+        return self
+
+    @property
+    def model_version(self):
+        return self.manifest['model_version'] if self.manifest else None
+
+    @property
+    def feature_columns(self):
+        return self.manifest['feature_columns'] if self.manifest else None
+
+    @property
+    def capacity(self):
+        return self.manifest['capacity'] if self.manifest else 0
+
+    def is_current(self, loaded):
+        """True when the rows were encoded by this LoadedModel's pipeline"""
+        return (
+            self.exists()
+            and self.open().model_version == loaded.version
+            and self.feature_columns == loaded.feature_columns
+        )
+
+    # ---- Reads ----
+
+    def load_matrix(self):
+        """The whole (capacity, n_features) matrix as a read-only view of the mapped file"""
+        self.open()
+        view = self.matrix.view(np.ndarray)
+        view.flags.writeable = False
+        return view
+
+    def rows(self, pks):
+        """Features for ``pks`` as (X, missing)
+
+        X is a float32 (len(pks), n_features) array and ``missing`` the
+        positions of pks with no stored row. Those rows of X are NaN.
+        """
+        self.open()
+        pks = np.asarray(pks, dtype=np.int64)
+        X = np.full((len(pks), len(self.feature_columns)), np.nan, dtype=DTYPE)
+        inside = (pks >= 0) & (pks < self.capacity)
+        X[inside] = self.matrix[pks[inside]]
+        missing = np.flatnonzero(np.isnan(X).any(axis=1)).tolist()
+        return X, missing
+
+    # ---- Writes ----
+
+    def write(self, pks, X):
+        """Store encoded feature rows for ``pks``; NaN rows mark students without features"""
+        pks = np.asarray(pks, dtype=np.int64)
+        if not len(pks):
+            return
+        with self._exclusive():
+            needed = int(pks.max()) + 1
+            if needed > self.capacity:
+                self._grow(needed)
+            self.matrix[pks] = np.asarray(X, dtype=DTYPE)
+            self.matrix.flush()
+
+    def remove(self, pks):
+        pks = np.asarray(pks, dtype=np.int64)
+        with self._exclusive():
+            pks = pks[pks < self.capacity]
+            self.matrix[pks] = np.nan
+            self.matrix.flush()
+
+    def mark_synced(self, when):
+        """Record the time up to which every profile change is reflected in the store"""
+        with self._exclusive():
+            self.manifest['synced_at'] = when.isoformat()
+            self._write_header()
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        n_features = len(self.feature_columns)
+        with open(self.path, 'r+b') as f:
+            f.truncate(HEADER_SIZE + capacity * n_features * DTYPE.itemsize)
+        grown = np.memmap(self.path, mode='r+', dtype=DTYPE, offset=HEADER_SIZE, shape=(capacity, n_features))
+        grown[self.capacity:] = np.nan
+        self.manifest['capacity'] = capacity
+        self._write_header()
+        self.open()
+
+    def _write_header(self):
+        with open(self.path, 'r+b') as f:
+            f.write(_encode_header(self.manifest))
+
+    class _FileLock:
+        def __init__(self, store):
+            self.store = store
+
+        def __enter__(self):
+            self.file = open(self.store.path, 'rb')
+            if fcntl is not None:
+                fcntl.flock(self.file, fcntl.LOCK_EX)
+            # Another process may have grown or rebuilt the file while we waited
+            self.store.open()
+            self.store.manifest = read_manifest(self.store.path)
+            return self.store
+
+        def __exit__(self, *exc):
+            self.file.close()  # Releases the lock
+
+    def _exclusive(self):
+        return self._FileLock(self)
+
+
+def encode_rows(pipeline, records):
+    """Encode raw profile dicts with a FeaturePipeline into float32 store rows
+
+    Rows the pipeline rejects are returned as NaN, i.e. as missing.
+    """
+    X, errors = pipeline.transform(records)
+    if errors:
+        X[list(errors)] = np.nan
+    return X.astype(DTYPE)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide FeatureStore at ML_FEATURE_STORE_PATH, or None when disabled"""
+    global _store
+    path = getattr(settings, 'ML_FEATURE_STORE_PATH', None)
+    if not path:
+        return None
+    if _store is None or _store.path != path:
+        with _store_lock:
+            if _store is None or _store.path != path:
+                _store = FeatureStore(path)
+    return _store
+
+
+def sync_students(student_pks):
+    """Re-encode the profiles of ``student_pks`` into the store
+
+    Does nothing when the store is disabled or not built yet, when this
+    process has no model loaded (it never loads one just for this), or when
+    the store was built for another model version (it is rebuilt by
+    `manage.py build_feature_store` after a model change). Skipped changes
+    are picked up by `manage.py build_feature_store --incremental`.
+    """
+    store = get_store()
+    if store is None or not store.exists():
+        return
+    from ml_models.predictor import predictor
+    from student_app.models import PerformanceProfile
+    loaded = predictor.active
+    if loaded is None or not store.is_current(loaded):
+        return
+
+    profiles = PerformanceProfile.objects.filter(student_id__in=student_pks).values(
+        'student_id', *PerformanceProfile.FEATURE_FIELDS
+    )
+    records = {profile.pop('student_id'): profile for profile in profiles}
+    present = list(records)
+    if present:
+        store.write(present, encode_rows(loaded.pipeline, [records[pk] for pk in present]))
+    removed = [pk for pk in student_pks if pk not in records]
+    if removed:
+        store.remove(removed)
+
+
+_pending = set()
+_pending_lock = threading.Lock()
+_pending_ready = threading.Event()
+_syncer = None
+
+
+def queue_sync(student_pks):
+    """Sync ``student_pks`` on a background thread, so the caller never waits on the store
+
+    Called after profiles are saved or deleted. Students queued while a sync
+    runs are coalesced into the next one.
+    """
+    global _syncer
+    from ml_models.predictor import predictor
+    if predictor.active is None or get_store() is None:
+        return
+    with _pending_lock:
+        _pending.update(student_pks)
+        if _syncer is None:
+            _syncer = threading.Thread(target=_run_syncer, name='ml-feature-store-sync', daemon=True)
+            _syncer.start()
+    _pending_ready.set()
+
+
+def _run_syncer():
+    while True:
+        _pending_ready.wait()
+        with _pending_lock:
+            _pending_ready.clear()
+            student_pks = list(_pending)
+            _pending.clear()
+        try:
+            sync_students(student_pks)
+        except Exception:
+            # The store is a cache; `manage.py build_feature_store --incremental` repairs it
+            logger.exception("Error updating the feature store for %d students", len(student_pks))
+        finally:
+            connections.close_all()
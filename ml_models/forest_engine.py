@@ -0,0 +1,231 @@
+import numpy as np
+
+TREE_LEAF = -1
+
+# Upper bound on (n_trees * rows) node indices stepped at once; blocks of
+# about a thousand rows keep the working set of each level cache-resident
+MAX_BLOCK_NODES = 1 << 17
+
+
+def sum_trees(outputs):
+    """Sum a (n_trees, n_rows) output matrix in tree order
+
+    RandomForestRegressor.predict accumulates one tree at a time; numpy's
+    sum() may switch to pairwise summation (e.g. for a single row), which
+    rounds differently, so the accumulation order is spelled out here.
+    """
+    if outputs.shape[1] <= 4096:
+        # A running sum is strictly sequential and a single call for small batches
+        return np.cumsum(outputs, axis=0)[-1]
+    total = outputs[0].copy()
+    for row in outputs[1:]:
+        total += row
+    return total
+
+
+class SklearnForest:
+    """Tree outputs through RandomForestRegressor.apply and a packed value array"""
+
+    def __init__(self, model):
+        self.model = model
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        self.n_trees = len(trees)
+        node_counts = np.array([tree.node_count for tree in trees])
+        # Start of each tree's nodes inside the packed value array
+        self.offsets = np.concatenate(([0], np.cumsum(node_counts)[:-1]))
+        self.values = np.concatenate([tree.value[:, 0, 0] for tree in trees])
+
+    def tree_outputs(self, X):
+        """Return the (n_trees, n_rows) matrix of per-tree predictions"""
+        leaves = self.model.apply(X)
+        return self.values[(leaves + self.offsets).T]
+
+    def predict(self, X):
+        return self.model.predict(X)
+
+    def contributions(self, X):
+        """Per-feature contributions; see FlatForest.contributions()"""
+        if getattr(self, '_flat', None) is None:
+            self._flat = FlatForest.from_sklearn(self.model)
+        return self._flat.contributions(X)
+
+
+class FlatForest:
+    """Native NumPy random-forest inference over contiguous packed node arrays
+
+    All trees are concatenated into one set of children/feature/threshold/value
+    arrays with child indices rebased to global node ids. The left and right
+    child of node i sit at children[2 * i] and children[2 * i + 1], and leaves
+    point back to themselves, so a batch of rows can be stepped through every
+    tree at once, one level per iteration, for max_depth iterations.
+    """
+
+    def __init__(self, children, feature, threshold, value, roots, max_depth):
+        self.children = np.ascontiguousarray(children, dtype=np.int32)
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold)
+        self.value = np.ascontiguousarray(value)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.n_trees = len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted RandomForestRegressor (or any bagged tree ensemble)"""
+        children, feature, threshold, value, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left == TREE_LEAF
+            pairs = np.empty((tree.node_count, 2), dtype=np.int64)
+            pairs[:, 0] = np.where(is_leaf, node_ids, tree.children_left + offset)
+            pairs[:, 1] = np.where(is_leaf, node_ids, tree.children_right + offset)
+            children.append(pairs.ravel())
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            value.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += tree.node_count
+
+        return cls(
+            np.concatenate(children), np.concatenate(feature),
+            np.concatenate(threshold), np.concatenate(value),
+            roots, max_depth,
+        )
+
+    @property
+    def node_count(self):
+        return len(self.value)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.children, self.feature, self.threshold, self.value, self.roots))
+
+    def compact(self):
+        """Copy of this forest with float32 thresholds and leaf values
+
+        Inputs are compared as float32, so rounding each threshold down to
+        the nearest float32 sends every row the same way as the float64
+        threshold did; only the leaf values lose precision.
+        """
+        threshold = self.threshold.astype(np.float32)
+        rounded_up = threshold.astype(np.float64) > self.threshold
+        threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+        return FlatForest(
+            self.children, self.feature, threshold, self.value.astype(np.float32), self.roots, self.max_depth,
+        )
+
+    def apply(self, X):
+        """Return the (n_trees, n_rows) matrix of global leaf ids reached by each row"""
+        # Trees compare float32 inputs against float64 thresholds, as sklearn does
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        leaves = np.empty((self.n_trees, n_rows), dtype=np.int32)
+        block = max(1, MAX_BLOCK_NODES // self.n_trees)
+        for start in range(0, n_rows, block):
+            stop = min(start + block, n_rows)
+            leaves[:, start:stop] = self.descend(X[start:stop].ravel(), stop - start, n_features)
+        return leaves
+
+    def descend(self, X_flat, n_rows, n_features):
+        # Offset of each row's first feature inside the flattened block
+        row_base = np.arange(n_rows, dtype=np.int32) * n_features
+        node = np.repeat(self.roots[:, None], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            go_left = X_flat[row_base + self.feature[node]] <= self.threshold[node]
+            node = self.children[2 * node + 1 - go_left]
+        return node
+
+    def tree_outputs(self, X):
+        """Return the (n_trees, n_rows) matrix of per-tree predictions"""
+        return self.value[self.apply(X)]
+
+    def predict(self, X):
+        return sum_trees(self.tree_outputs(X)) / self.n_trees
+
+    def contributions(self, X):
+        """Saabas feature contributions for every row of X
+
+        Returns (bias, contributions): bias is the mean root value and
+        contributions is (n_rows, n_features), so that bias plus a row's
+        contributions equals its prediction up to float rounding. The value
+        change at each split is credited to the split feature while the rows
+        descend, as in apply(), so nothing is precomputed per node and the
+        shared forest arrays are the only model memory touched.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        contributions = np.zeros((n_rows, n_features), dtype=np.float64)
+        block = max(1, MAX_BLOCK_NODES // self.n_trees)
+        for start in range(0, n_rows, block):
+            stop = min(start + block, n_rows)
+            rows = stop - start
+            X_flat = X[start:stop].ravel()
+            row_base = np.arange(rows, dtype=np.int32) * n_features
+            node = np.repeat(self.roots[:, None], rows, axis=1)
+            for _ in range(self.max_depth):
+                cell = row_base + self.feature[node]
+                child = self.children[2 * node + 1 - (X_flat[cell] <= self.threshold[node])]
+                # Leaves point to themselves, so finished paths add nothing
+                delta = self.value[child].astype(np.float64) - self.value[node]
+                contributions[start:stop] += np.bincount(
+                    cell.ravel(), weights=delta.ravel(), minlength=rows * n_features,
+                ).reshape(rows, n_features)
+                node = child
+        contributions /= self.n_trees
+        bias = float(self.value[self.roots].mean())
+        return np.full(n_rows, bias), contributions
+
+    def specialize(self, x, free_features):
+        """Partially evaluate the forest for rows equal to ``x`` outside ``free_features``
+
+        Every split on a fixed feature goes the same way for all such rows,
+        so those nodes are skipped: each child pointer is redirected to the
+        first node below it that splits on a free feature (or to its leaf).
+        The result is a FlatForest whose trees only test the free features,
+        usually a fraction of max_depth deep, and which gives the same
+        leaves as this forest for any row that matches ``x`` elsewhere.
+        """
+        x = np.asarray(x, dtype=np.float32).ravel()
+        node_ids = np.arange(self.node_count, dtype=np.int32)
+        left, right = self.children[0::2], self.children[1::2]
+        is_leaf = left == node_ids
+        stop = is_leaf | np.isin(self.feature, free_features)
+
+        # One step down every fixed split, then pointer doubling to follow
+        # whole chains of fixed splits in log2(max_depth) rounds
+        jump = np.where(stop, node_ids, np.where(x[self.feature] <= self.threshold, left, right))
+        steps = 1
+        while steps < self.max_depth:
+            jump = jump[jump]
+            steps *= 2
+
+        children = jump[self.children]
+        roots = jump[self.roots]
+
+        # Depth of the reduced trees: levels until every path reaches a leaf
+        depth = 0
+        frontier = roots[~is_leaf[roots]]
+        while frontier.size:
+            depth += 1
+            below = np.unique(children[np.concatenate((2 * frontier, 2 * frontier + 1))])
+            frontier = below[~is_leaf[below]]
+
+        return FlatForest(children, self.feature, self.threshold, self.value, roots, depth)
+
+
+FOREST_BACKENDS = {
+    'sklearn': SklearnForest,
+    'flat': FlatForest.from_sklearn,
+}
+
+
+def build_forest(model, mode='sklearn'):
+    """Build the inference backend selected by ``mode`` for a fitted forest"""
+    try:
+        return FOREST_BACKENDS[mode](model)
+    except KeyError:
+        raise ValueError(f"Unknown predictor mode '{mode}', expected one of {sorted(FOREST_BACKENDS)}")
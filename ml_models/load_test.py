@@ -0,0 +1,159 @@
+"""Load test for the JSON prediction endpoint under ASGI and WSGI servers
+
+Start the same project under both kinds of server, e.g.
+
+    uvicorn student_result_management.asgi:application --port 8001
+    gunicorn student_result_management.wsgi:application --port 8000 --threads 8
+
+then point this script at both:
+
+    python ml_models/load_test.py --email teacher@example.com --password ... \\
+        asgi=http://127.0.0.1:8001 wsgi=http://127.0.0.1:8000
+
+Every target gets the same number of requests at the same concurrency; the
+client is a small asyncio HTTP/1.1 client from the standard library, so it
+can hold thousands of connections open from one process.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PREDICT_PATH = '/api/ml/predict/'
+LOGIN_PATH = '/student-login/'
+
+
+async def http_request(base_url, method, path, headers=None, body=b''):
+    """Send one request on a fresh connection; return (status, headers, body)"""
+    url = urlsplit(base_url)
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    lines = [
+        f"{method} {path} HTTP/1.1",
+        f"Host: {url.netloc}",
+        "Connection: close",
+        f"Content-Length: {len(body)}",
+    ]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode('latin-1').split("\r\n")
+    response_headers = []
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        response_headers.append((name.strip().lower(), value.strip()))
+    return int(status_line.split()[1]), response_headers, payload
+
+
+def read_cookies(headers, cookies):
+    for name, value in headers:
+        if name == 'set-cookie':
+            for key, morsel in SimpleCookie(value).items():
+                cookies[key] = morsel.value
+    return cookies
+
+
+async def log_in(base_url, email, password):
+    """Log in through the site's login form and return the session cookies"""
+    _, headers, _ = await http_request(base_url, 'GET', LOGIN_PATH)
+    cookies = read_cookies(headers, {})
+    form = urlencode({
+        'username': email,
+        'password': password,
+        'csrfmiddlewaretoken': cookies.get('csrftoken', ''),
+    }).encode()
+    _, headers, _ = await http_request(base_url, 'POST', LOGIN_PATH, {
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'Cookie': '; '.join(f'{k}={v}' for k, v in cookies.items()),
+    }, form)
+    read_cookies(headers, cookies)
+    if 'sessionid' not in cookies:
+        raise RuntimeError(f"Login failed on {base_url}")
+    return cookies
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_target(base_url, cookies, payloads, concurrency):
+    headers = {
+        'Content-Type': 'application/json',
+        'Cookie': '; '.join(f'{k}={v}' for k, v in cookies.items()),
+        'X-CSRFToken': cookies.get('csrftoken', ''),
+    }
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one(payload):
+        async with gate:
+            started = time.perf_counter()
+            try:
+                status, _, _ = await http_request(base_url, 'POST', PREDICT_PATH, headers, payload)
+            except OSError:
+                status = 'conn-error'
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(payload) for payload in payloads))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(payloads),
+        'seconds': elapsed,
+        'throughput': len(payloads) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'statuses': statuses,
+    }
+
+
+def make_payloads(n_requests):
+    """Encode n prediction requests drawn from the synthetic training distribution"""
+    from ml_models.train_model import create_sample_data
+    records = create_sample_data().drop(columns=['math_score']).to_dict('records')
+    return [json.dumps(records[i % len(records)]).encode() for i in range(n_requests)]
+
+
+async def load_test(targets, email, password, n_requests, concurrency):
+    payloads = make_payloads(n_requests)
+    print(f"{n_requests} requests to {PREDICT_PATH} at concurrency {concurrency}")
+    print("=" * 78)
+    print(f"{'target':>8} | {'req/s':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | statuses")
+    print("-" * 78)
+    for label, base_url in targets:
+        cookies = await log_in(base_url, email, password)
+        # Warm up connections, the model and any caches before measuring
+        await run_target(base_url, cookies, payloads[:min(50, n_requests)], concurrency)
+        stats = await run_target(base_url, cookies, payloads, concurrency)
+        print(
+            f"{label:>8} | {stats['throughput']:>8.1f} | {stats['p50_ms']:>8.1f} | "
+            f"{stats['p95_ms']:>8.1f} | {stats['p99_ms']:>8.1f} | {stats['statuses']}"
+        )
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('targets', nargs='+', help="label=base_url, e.g. asgi=http://127.0.0.1:8001")
+    parser.add_argument('--email', required=True, help="email of an existing account")
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=500)
+    args = parser.parse_args()
+
+    targets = [target.split('=', 1) for target in args.targets]
+    asyncio.run(load_test(targets, args.email, args.password, args.requests, args.concurrency))
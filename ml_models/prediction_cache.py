@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+
+class PredictionCache:
+    """Bounded LRU cache of prediction results with a time-to-live
+
+    Entries are keyed on the model version that produced them plus the
+    student's inputs: numbers as floats, optionally snapped to a grid
+    (``quantize`` maps a numeric column to its step, e.g.
+    {'attendance_rate': 1}), and categories as given. With quantization on,
+    a miss scores the snapped values, so every input that shares a key gets
+    exactly the result it would have got on its own.
+
+    Keys need no model in this process: lookups use ``model_version``, the
+    version of the latest result stored, so the web process of the
+    worker-pool backend caches what its workers report.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, quantize=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.quantize = quantize or {}
+        self.model_version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def canonicalize(self, student_data):
+        """Return (inputs key, canonical student_data), or (None, None) if the input can't be keyed
+
+        Inputs with values other than numbers, strings and None are not
+        cached; they go straight to the predictor, which reports the error.
+        Combine the inputs key with a version through key().
+        """
+        key = []
+        canonical = dict(student_data)
+        for column in sorted(student_data):
+            value = student_data[column]
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = float(value)
+                step = self.quantize.get(column)
+                if step:
+                    value = round(value / step) * step
+                    canonical[column] = value
+            elif value is not None and not isinstance(value, str):
+                return None, None
+            key.append((column, value))
+        return tuple(key), canonical
+
+    @staticmethod
+    def key(version, inputs):
+        return (version, inputs)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self.model_version = key[0]
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def on_reload(self, previous, candidate):
+        """predictor.reload_callbacks hook: drop results computed by the old model"""
+        self.clear()
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'quantize': self.quantize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide PredictionCache, or None when ML_PREDICTION_CACHE_SIZE is 0"""
+    global _cache
+    maxsize = getattr(settings, 'ML_PREDICTION_CACHE_SIZE', 0)
+    if not maxsize:
+        return None
+    if _cache is None:
+        from ml_models.predictor import predictor
+        with _cache_lock:
+            if _cache is None:
+                _cache = PredictionCache(
+                    maxsize=maxsize,
+                    ttl=getattr(settings, 'ML_PREDICTION_CACHE_TTL', 300),
+                    quantize=getattr(settings, 'ML_PREDICTION_CACHE_QUANTIZE', None),
+                )
+                predictor.reload_callbacks.append(_cache.on_reload)
+    return _cache
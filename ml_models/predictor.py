@@ -1,193 +1,708 @@
-import joblib
-import numpy as np
-import pandas as pd
+import logging
+import math
 import os
+import signal
+import threading
+import time
 from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Model load states
+NOT_LOADED = 'not_loaded'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+MODEL_FILENAME = 'student_performance_model.pkl'
+PREPROCESSOR_FILENAMES = ['scaler.pkl', 'label_encoders.pkl', 'feature_columns.pkl']
+BUNDLE_FILENAME = 'student_performance_model.bundle'
+COMPACT_BUNDLE_FILENAME = 'student_performance_model.compact.bundle'
+# Touched by `manage.py reload_model` to ask every watching worker to reload
+RELOAD_TRIGGER_FILENAME = '.reload'
+
+# Known-good profile scored by every newly loaded model before it goes live
+CANARY_PROFILE = {
+    'gender': 'Female',
+    'race_ethnicity': 'group B',
+    'parental_level_of_education': "bachelor's degree",
+    'lunch': 'standard',
+    'test_preparation_course': 'completed',
+    'study_hours_per_week': 25,
+    'attendance_rate': 92.0,
+    'previous_grade': 78.5,
+}
+
+
+class LoadedModel:
+    """One model version together with the preprocessors and engines built for it
+
+    The predictor swaps these in as a single unit, so a request that picked
+    one up keeps a consistent model/scaler/encoder set even if a newer
+    version is activated while it is running.
+    """
+
+    def __init__(self, version, pipeline, forest, confidence_engine,
+                 model=None, scaler=None, label_encoders=None, source=None):
+        self.version = version
+        self.pipeline = pipeline
+        self.forest = forest
+        self.confidence_engine = confidence_engine
+        self.model = model
+        self.scaler = scaler
+        self.label_encoders = label_encoders
+        self.feature_columns = pipeline.feature_columns
+        self.source = source
+        self.fingerprint = None
+
+
+def _active_attribute(name):
+    return property(lambda self: getattr(self.active, name) if self.active else None)
+
 
 class StudentPerformancePredictor:
-    def __init__(self):
-        self.model = None
-        self.scaler = None
-        self.label_encoders = None
-        self.feature_columns = None
-        self.load_model()
+    # Components of the active model version, kept for existing callers
+    model = _active_attribute('model')
+    scaler = _active_attribute('scaler')
+    label_encoders = _active_attribute('label_encoders')
+    feature_columns = _active_attribute('feature_columns')
+    pipeline = _active_attribute('pipeline')
+    forest = _active_attribute('forest')
+    confidence_engine = _active_attribute('confidence_engine')
+    model_version = _active_attribute('version')
+
+    def __init__(self, mode=None, autoload=True, model_dir=None, variant=None):
+        # 'sklearn' runs the fitted forest, 'flat' the packed NumPy engine
+        self.mode = mode or getattr(settings, 'ML_PREDICTOR_MODE', 'sklearn')
+        # 'full' serves the trained forest, 'compact' its distilled float32 bundle
+        self.variant = variant or getattr(settings, 'ML_MODEL_VARIANT', 'full')
+        self.model_dir = model_dir or os.path.join(settings.BASE_DIR, 'ml_models')
+        self.active = None
+
+        # Seconds a prediction waits for a background load before giving up
+        self.load_wait_timeout = getattr(settings, 'ML_MODEL_LOAD_TIMEOUT', 10)
+
+        self.state = NOT_LOADED
+        self.load_error = None
+        self.load_time = None
+        self.loaded_at = None
+        self._load_lock = threading.Lock()
+        self._load_finished = threading.Event()
+
+        self.reloading = False
+        self.reloaded_at = None
+        self.reload_error = None
+        self.reload_callbacks = []
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        if autoload:
+            self.load_model()
     
     def load_model(self):
-        """Load the trained model and preprocessors"""
+        """Load the trained model and preprocessors, returning True when ready"""
+        with self._load_lock:
+            if self.state == READY:
+                return True
+            self.state = LOADING
+            started = time.perf_counter()
+            try:
+                loaded = self.read_artifacts()
+                self.validate(loaded)
+                self.active = loaded
+
+                self.load_error = None
+                self.loaded_at = timezone.now()
+                self.state = READY
+                logger.info("ML model %s loaded in %.2fs", loaded.version, time.perf_counter() - started)
+            except Exception as e:
+                self.load_error = str(e)
+                self.state = FAILED
+                logger.exception("Error loading ML model")
+            finally:
+                self.load_time = time.perf_counter() - started
+                self._load_finished.set()
+        return self.state == READY
+
+    def read_artifacts(self):
+        """Read the model artifacts on disk into a new LoadedModel"""
+        # Taken before reading, so a write that lands mid-load is seen as a change
+        fingerprint = self.artifact_fingerprint()
+        if self.variant == 'compact':
+            # Always the flat engine: the compact variant only exists as a bundle
+            compact_path = os.path.join(self.model_dir, COMPACT_BUNDLE_FILENAME)
+            if not os.path.exists(compact_path):
+                raise FileNotFoundError(f"{COMPACT_BUNDLE_FILENAME} not found - run train_model.py --compact")
+            loaded = self.load_bundle(compact_path)
+            loaded.fingerprint = fingerprint
+            return loaded
+        bundle_path = os.path.join(self.model_dir, BUNDLE_FILENAME)
+        if self.mode == 'flat' and os.path.exists(bundle_path):
+            loaded = self.load_bundle(bundle_path)
+        else:
+            loaded = self.load_pickles(self.model_dir)
+        loaded.fingerprint = fingerprint
+        return loaded
+
+    def load_bundle(self, bundle_path):
+        """Memory-map the single-file model bundle written by train_model.py"""
+        # Heavy imports are deferred so that importing this module
+        # (e.g. from views during manage.py commands) stays cheap
+        from ml_models.bundle import load_bundle
+        from ml_models.confidence import ConfidenceEngine
+
+        logger.info("Loading model bundle: %s", bundle_path)
+        bundle = load_bundle(bundle_path)
+        return LoadedModel(
+            bundle['manifest']['version'], bundle['pipeline'], bundle['forest'],
+            ConfidenceEngine(bundle['forest']), source=bundle_path,
+        )
+
+    def load_pickles(self, model_dir):
+        """Unpickle the model and preprocessors from the separate joblib files"""
+        import joblib
+        from ml_models.confidence import ConfidenceEngine
+        from ml_models.feature_pipeline import FeaturePipeline
+        from ml_models.forest_engine import build_forest
+
+        logger.info("Loading model files from: %s", model_dir)
+        model_path = os.path.join(model_dir, MODEL_FILENAME)
+        model = joblib.load(model_path)
+        scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+        label_encoders = joblib.load(os.path.join(model_dir, 'label_encoders.pkl'))
+        feature_columns = joblib.load(os.path.join(model_dir, 'feature_columns.pkl'))
+        pipeline = FeaturePipeline.from_preprocessors(label_encoders, scaler, feature_columns)
+        forest = build_forest(model, self.mode)
+        # train_model.py stores the content version in the pickle; older
+        # pickles get the same hash computed here
+        version = getattr(model, 'model_version_', None)
+        if version is None:
+            from ml_models.bundle import content_version
+            from ml_models.forest_engine import FlatForest
+            flat = forest if isinstance(forest, FlatForest) else FlatForest.from_sklearn(model)
+            version = content_version(flat, pipeline)
+        return LoadedModel(
+            version, pipeline, forest, ConfidenceEngine(forest),
+            model=model, scaler=scaler, label_encoders=label_encoders, source=model_dir,
+        )
+
+    def validate(self, loaded):
+        """Score the canary profile with a candidate model; raise if the result is unusable"""
+        X = loaded.pipeline.transform_one(CANARY_PROFILE)
+        prediction = float(loaded.confidence_engine.evaluate(X)['prediction'][0])
+        if not math.isfinite(prediction) or not 0 <= prediction <= 100:
+            raise ValueError(f"Canary prediction {prediction} is outside 0-100")
+        return prediction
+
+    def start_background_load(self):
+        """Load the model in a daemon thread; returns the thread, or None if not needed"""
+        # A running load holds the lock until it finishes
+        if self.state != NOT_LOADED:
+            return None
+        with self._load_lock:
+            if self.state != NOT_LOADED:
+                return None
+            self.state = LOADING
+        thread = threading.Thread(target=self.load_model, name='ml-model-loader', daemon=True)
+        thread.start()
+        return thread
+
+    def ensure_loaded(self, timeout=None):
+        """Make sure the model is usable, loading it on first use
+
+        While a background load is running, wait up to ``timeout`` seconds
+        for it instead of starting a second one.
+        """
+        if self.state == NOT_LOADED:
+            return self.load_model()
+        if self.state == LOADING:
+            self._load_finished.wait(timeout)
+        return self.state == READY
+
+    def unavailable_reason(self):
+        if self.state == LOADING:
+            return "Model is still loading, please try again shortly"
+        if self.state == FAILED:
+            return f"Model failed to load: {self.load_error}"
+        return "Model not loaded"
+
+    # ---- Hot reload ----
+
+    def artifact_fingerprint(self):
+        """(name, mtime, size) of every model artifact, to detect a new deployment"""
+        fingerprint = []
+        for filename in [BUNDLE_FILENAME, COMPACT_BUNDLE_FILENAME, MODEL_FILENAME] + PREPROCESSOR_FILENAMES:
+            try:
+                stat = os.stat(os.path.join(self.model_dir, filename))
+            except FileNotFoundError:
+                continue
+            fingerprint.append((filename, stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint)
+
+    def reload(self):
+        """Load the artifacts on disk, validate them and swap them in atomically
+
+        Returns True when a new version was activated. Requests already
+        running keep the LoadedModel they started with; the old version is
+        released once they finish.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False  # Another reload is already in progress
+        self.reloading = True
         try:
-            model_dir = os.path.join(settings.BASE_DIR, 'ml_models')
-            print(f"Loading model files from: {model_dir}")
-            print(f"Model file: {os.path.join(model_dir, 'student_performance_model.pkl')}")
-            print(f"Scaler file: {os.path.join(model_dir, 'scaler.pkl')}")
-            print(f"Label encoders file: {os.path.join(model_dir, 'label_encoders.pkl')}")
-            print(f"Feature columns file: {os.path.join(model_dir, 'feature_columns.pkl')}")
-
-            self.model = joblib.load(os.path.join(model_dir, 'student_performance_model.pkl'))
-            self.scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
-            self.label_encoders = joblib.load(os.path.join(model_dir, 'label_encoders.pkl'))
-            self.feature_columns = joblib.load(os.path.join(model_dir, 'feature_columns.pkl'))
-            print("ML model loaded successfully!")
+            candidate = self.read_artifacts()
+            self.validate(candidate)
+            previous = self.active
+            self.active = candidate  # Single reference swap
+            with self._load_lock:
+                if self.state != READY:
+                    self.state = READY
+                    self.load_error = None
+                    self.loaded_at = timezone.now()
+                    self._load_finished.set()
+            self.reloaded_at = timezone.now()
+            self.reload_error = None
+            logger.info(
+                "ML model reloaded: %s -> %s",
+                previous.version if previous else None, candidate.version,
+            )
+            for callback in self.reload_callbacks:
+                callback(previous, candidate)
+            return True
         except Exception as e:
-            print(f"Error loading ML model: {e}")
+            self.reload_error = str(e)
+            logger.exception("ML model reload failed; keeping the current version")
+            return False
+        finally:
+            self.reloading = False
+            self._reload_lock.release()
+
+    def reload_in_background(self):
+        thread = threading.Thread(target=self.reload, name='ml-model-reloader', daemon=True)
+        thread.start()
+        return thread
+
+    def trigger_mtime(self):
+        try:
+            return os.stat(os.path.join(self.model_dir, RELOAD_TRIGGER_FILENAME)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def start_watcher(self, interval):
+        """Poll the artifact directory and reload when a new model is deployed
+
+        Artifacts must look the same on two consecutive polls before a
+        reload starts, so a training run that is still writing its pickles
+        is not picked up half-way.
+        """
+        if self._watcher is not None:
+            return self._watcher
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(
+            target=self.watch_artifacts, args=(interval,), name='ml-model-watcher', daemon=True
+        )
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watcher(self):
+        self._stop_watching.set()
+        self._watcher = None
+
+    def watch_artifacts(self, interval):
+        seen_trigger = self.trigger_mtime()
+        last_seen = None
+        # Artifacts a failed first load was last retried with
+        retried = None
+        while not self._stop_watching.wait(interval):
+            if self.state not in (READY, FAILED):
+                continue
+            trigger = self.trigger_mtime()
+            if trigger != seen_trigger:
+                seen_trigger = trigger
+                self.reload()
+                continue
+            fingerprint = self.artifact_fingerprint()
+            if fingerprint == last_seen:
+                if self.active is None:
+                    # Never loaded: retry once per deployment, like a reload
+                    if fingerprint != retried:
+                        retried = fingerprint
+                        self.reload()
+                elif fingerprint != self.active.fingerprint:
+                    self.reload()
+                    # Don't retry a broken deployment until it changes again
+                    self.active.fingerprint = fingerprint
+            last_seen = fingerprint
+
+    def install_reload_signal(self, signum):
+        """Reload in the background whenever this process receives ``signum``"""
+        if threading.current_thread() is not threading.main_thread():
+            return False
+        signal.signal(signum, lambda signum, frame: self.reload_in_background())
+        return True
+
+    def status(self):
+        """Readiness report for health checks"""
+        return {
+            'state': self.state,
+            'mode': self.mode,
+            'variant': self.variant,
+            'model_version': self.model_version,
+            'load_time_seconds': round(self.load_time, 3) if self.load_time is not None else None,
+            'loaded_at': self.loaded_at.isoformat() if self.loaded_at else None,
+            'error': self.load_error,
+            'reloading': self.reloading,
+            'reloaded_at': self.reloaded_at.isoformat() if self.reloaded_at else None,
+            'reload_error': self.reload_error,
+        }
+
+    # ---- Inference ----
     
     def preprocess_input(self, student_data):
         """Preprocess input data for prediction"""
         try:
-            # Create a DataFrame from input
-            df = pd.DataFrame([student_data])
-            
-            # Encode categorical variables
-            categorical_columns = ['gender', 'race_ethnicity', 'parental_level_of_education', 'lunch', 'test_preparation_course']
-            
-            for col in categorical_columns:
-                if col in df.columns and col in self.label_encoders:
-                    le = self.label_encoders[col]
-                    # Handle unseen categories
-                    df[col + '_encoded'] = df[col].apply(
-                        lambda x: le.transform([x])[0] if x in le.classes_ else 0
-                    )
-                else:
-                    df[col + '_encoded'] = 0
-            
-            # Select and order features according to training
-            X = df[self.feature_columns].values
-            
-            # Scale features
-            X_scaled = self.scaler.transform(X)
-            
-            return X_scaled
+            return self.pipeline.transform_one(student_data)
         except Exception as e:
-            print(f"Error preprocessing input: {e}")
+            logger.warning("Error preprocessing input: %s", e)
             return None
+
+    def predict(self, student_data):
+        """Predict one student's grade and report the model version that produced it
+
+        Returns a dict with predicted_grade, confidence, lower/upper interval
+        bounds, model_version and error (None on success).
+        """
+        result = {
+            'predicted_grade': None,
+            'confidence': None,
+            'lower': None,
+            'upper': None,
+            'model_version': None,
+            'error': None,
+        }
+        if not self.ensure_loaded(timeout=self.load_wait_timeout):
+            result['error'] = self.unavailable_reason()
+            return result
+
+        # Use one model version for the whole request, even across a reload
+        loaded = self.active
+        result['model_version'] = loaded.version
+        try:
+            X_processed = loaded.pipeline.transform_one(student_data)
+        except Exception as e:
+            logger.warning("Error preprocessing input: %s", e)
+            result['error'] = "Error processing input data"
+            return result
+
+        try:
+            # One pass over the trees gives both the prediction and its spread
+            estimate = loaded.confidence_engine.evaluate(X_processed)
+        except Exception as e:
+            result['error'] = f"Error making prediction: {e}"
+            return result
+
+        result['predicted_grade'] = round(float(estimate['prediction'][0]), 2)
+        result['confidence'] = round(float(estimate['confidence'][0]), 1)
+        result['lower'] = round(float(estimate['lower'][0]), 2)
+        result['upper'] = round(float(estimate['upper'][0]), 2)
+        return result
     
     def predict_grade(self, student_data):
         """Predict student grade based on input features"""
-        if self.model is None:
-            return None, "Model not loaded"
-        
-        X_processed = self.preprocess_input(student_data)
-        if X_processed is None:
-            return None, "Error processing input data"
-        
+        result = self.predict(student_data)
+        if result['error']:
+            return None, result['error']
+        return result['predicted_grade'], result['confidence']
+
+    def predict_batch(self, records):
+        """Predict grades for many students with one encode, scale and predict pass
+
+        Accepts a list of dicts, a DataFrame or a structured NumPy array.
+        Returns a dict with 'predictions', 'confidences' and the 'lower'/'upper'
+        interval bounds as lists aligned with the input rows (None for rows
+        that could not be scored), 'errors'
+        mapping row index to the error message for those rows, and the
+        'model_version' that scored the batch.
+        """
+        n_rows = len(records)
+        result = {
+            'predictions': [None] * n_rows,
+            'confidences': [None] * n_rows,
+            'lower': [None] * n_rows,
+            'upper': [None] * n_rows,
+            'errors': {},
+            'model_version': None,
+        }
+        if not self.ensure_loaded(timeout=self.load_wait_timeout):
+            reason = self.unavailable_reason()
+            result['errors'] = {i: reason for i in range(n_rows)}
+            return result
+
+        loaded = self.active
+        result['model_version'] = loaded.version
         try:
-            prediction = self.model.predict(X_processed)[0]
-            confidence = self.get_prediction_confidence(X_processed)
-            return round(prediction, 2), confidence
+            X, errors = loaded.pipeline.transform(records)
         except Exception as e:
-            return None, f"Error making prediction: {e}"
-    
+            logger.warning("Error preprocessing batch: %s", e)
+            result['errors'] = {i: f"Error processing input data: {e}" for i in range(n_rows)}
+            return result
+
+        result['errors'] = errors
+        return self.score_rows(loaded, X, result)
+
+    def predict_stored(self, student_pks, store):
+        """Predict grades for students from their rows in a FeatureStore
+
+        Skips the ORM and the feature pipeline entirely: the encoded rows
+        are read from the memory-mapped store and scored in one pass.
+        Returns the same dict as predict_batch(), aligned with
+        ``student_pks``; students without a stored row are reported in
+        'errors'. If the store was built for another model version, every
+        row is an error.
+        """
+        n_rows = len(student_pks)
+        result = {
+            'predictions': [None] * n_rows,
+            'confidences': [None] * n_rows,
+            'lower': [None] * n_rows,
+            'upper': [None] * n_rows,
+            'errors': {},
+            'model_version': None,
+        }
+        if not self.ensure_loaded(timeout=self.load_wait_timeout):
+            reason = self.unavailable_reason()
+            result['errors'] = {i: reason for i in range(n_rows)}
+            return result
+
+        loaded = self.active
+        result['model_version'] = loaded.version
+        if not store.is_current(loaded):
+            reason = f"Feature store was built for model {store.model_version}, not {loaded.version}"
+            result['errors'] = {i: reason for i in range(n_rows)}
+            return result
+
+        X, missing = store.rows(student_pks)
+        result['errors'] = {i: "No stored features" for i in missing}
+        return self.score_rows(loaded, X, result)
+
+    def score_rows(self, loaded, X, result):
+        """Fill a predict_batch() result from encoded rows X, skipping rows already in errors"""
+        errors = result['errors']
+        valid_rows = [i for i in range(len(X)) if i not in errors]
+        if not valid_rows:
+            return result
+
+        try:
+            X_processed = X[valid_rows] if errors else X
+            estimate = loaded.confidence_engine.evaluate(X_processed)
+        except Exception as e:
+            for i in valid_rows:
+                errors[i] = f"Error making prediction: {e}"
+            return result
+
+        for j, i in enumerate(valid_rows):
+            result['predictions'][i] = round(float(estimate['prediction'][j]), 2)
+            result['confidences'][i] = round(float(estimate['confidence'][j]), 1)
+            result['lower'][i] = round(float(estimate['lower'][j]), 2)
+            result['upper'][i] = round(float(estimate['upper'][j]), 2)
+        return result
+
+    def explain_batch(self, records):
+        """Break each student's predicted grade down into per-feature contributions
+
+        Saabas-style attribution: the change in node value at every split on
+        a student's path through each tree is credited to the split feature.
+        Returns {'bias', 'contributions', 'errors', 'model_version'} where
+        bias is the forest's average grade and contributions holds, per row,
+        a list of {'feature', 'value', 'contribution'} sorted by absolute
+        contribution. bias plus a row's contributions is its prediction.
+        """
+        records = records if hasattr(records, 'columns') else list(records)
+        n_rows = len(records)
+        result = {
+            'bias': None,
+            'contributions': [None] * n_rows,
+            'errors': {},
+            'model_version': None,
+        }
+        if not self.ensure_loaded(timeout=self.load_wait_timeout):
+            reason = self.unavailable_reason()
+            result['errors'] = {i: reason for i in range(n_rows)}
+            return result
+
+        loaded = self.active
+        result['model_version'] = loaded.version
+        try:
+            X, errors = loaded.pipeline.transform(records)
+            result['errors'] = errors
+            valid_rows = [i for i in range(n_rows) if i not in errors]
+            if not valid_rows:
+                return result
+            bias, contributions = loaded.forest.contributions(X[valid_rows] if errors else X)
+        except Exception as e:
+            result['errors'] = {i: f"Error explaining prediction: {e}" for i in range(n_rows)}
+            return result
+
+        columns = loaded.pipeline.raw_columns
+        raw = loaded.pipeline.extract_columns(records)[0]
+        result['bias'] = round(float(bias[0]), 2)
+        for j, i in enumerate(valid_rows):
+            row = contributions[j].tolist()
+            order = sorted(range(len(columns)), key=lambda k: -abs(row[k]))
+            result['contributions'][i] = [
+                {
+                    'feature': columns[k],
+                    'value': raw[columns[k]][i] if columns[k] in raw else None,
+                    'contribution': round(row[k], 2),
+                }
+                for k in order
+            ]
+        return result
+
+    def explain(self, student_data):
+        """Feature contributions for one student; see explain_batch()
+
+        Returns {'bias', 'contributions', 'model_version', 'error'}.
+        """
+        result = self.explain_batch([student_data])
+        return {
+            'bias': result['bias'],
+            'contributions': result['contributions'][0],
+            'model_version': result['model_version'],
+            'error': result['errors'].get(0),
+        }
+
+    def what_if(self, student_data, grid):
+        """Predict one profile over a grid of one or two numeric inputs
+
+        ``grid`` maps each swept column (study_hours_per_week,
+        attendance_rate or previous_grade) to the values to try. All grid
+        points are scored in a single batched forest call. The returned
+        predicted_grade/confidence/lower/upper are lists for one column and
+        nested lists (first column by second) for two.
+        """
+        result = {
+            'features': list(grid),
+            'values': [list(map(float, values)) for values in grid.values()],
+            'predicted_grade': None,
+            'confidence': None,
+            'lower': None,
+            'upper': None,
+            'model_version': None,
+            'error': None,
+        }
+        if not self.ensure_loaded(timeout=self.load_wait_timeout):
+            result['error'] = self.unavailable_reason()
+            return result
+
+        loaded = self.active
+        result['model_version'] = loaded.version
+        numeric = loaded.pipeline.numeric_columns
+        unknown = [column for column in grid if column not in numeric]
+        if not 1 <= len(grid) <= 2 or unknown:
+            result['error'] = f"Sweep one or two of {numeric}"
+            return result
+        n_points = 1
+        for values in grid.values():
+            n_points *= len(values)
+        max_points = getattr(settings, 'ML_WHAT_IF_MAX_POINTS', 10000)
+        if not 0 < n_points <= max_points:
+            result['error'] = f"Grid must have between 1 and {max_points} points"
+            return result
+
+        try:
+            X = loaded.pipeline.transform_grid(student_data, grid)
+            forest = loaded.forest
+            if hasattr(forest, 'specialize'):
+                # Only the swept columns vary, so resolve every other split once
+                swept = [loaded.pipeline.raw_columns.index(column) for column in grid]
+                forest = forest.specialize(X[0], swept)
+            estimate = loaded.confidence_engine.summarize(forest.tree_outputs(X))
+        except Exception as e:
+            result['error'] = f"Error making prediction: {e}"
+            return result
+
+        # Rounded like predict() so a grid point matches the single prediction
+        width = len(result['values'][-1])
+
+        def as_grid(values, digits):
+            flat = [round(value, digits) for value in values.tolist()]
+            if len(grid) == 1:
+                return flat
+            return [flat[start:start + width] for start in range(0, len(flat), width)]
+
+        result['predicted_grade'] = as_grid(estimate['prediction'], 2)
+        result['confidence'] = as_grid(estimate['confidence'], 1)
+        result['lower'] = as_grid(estimate['lower'], 2)
+        result['upper'] = as_grid(estimate['upper'], 2)
+        return result
+
+    def predict_grades_batch(self, records):
+        """Predict grades for many students with one encode, scale and predict pass
+
+        Returns (predictions, confidences, errors); see predict_batch().
+        """
+        result = self.predict_batch(records)
+        return result['predictions'], result['confidences'], result['errors']
+
     def get_prediction_confidence(self, X_processed):
         """Calculate prediction confidence based on model uncertainty"""
         try:
-            # For Random Forest, we can use the standard deviation of tree predictions
-            tree_predictions = []
-            for tree in self.model.estimators_:
-                tree_pred = tree.predict(X_processed)
-                tree_predictions.append(tree_pred[0])
-            
-            std_dev = np.std(tree_predictions)
-            # Convert to confidence percentage (inverse relationship with std dev)
-            confidence = max(0, min(100, 100 - (std_dev * 2)))
-            return round(confidence, 1)
+            # For Random Forest, we use the standard deviation of tree predictions
+            estimate = self.confidence_engine.evaluate(X_processed)
+            return round(estimate['confidence'][0], 1)
         except:
             return 85.0  # Default confidence
     
     def generate_recommendations(self, student_data, predicted_grade):
         """Generate improvement recommendations based on student data and prediction"""
-        recommendations = []
-        
-        try:
-            study_hours = student_data.get('study_hours_per_week', 0)
-            attendance_rate = student_data.get('attendance_rate', 0)
-            previous_grade = student_data.get('previous_grade', 0)
-            test_prep = student_data.get('test_preparation_course', 'none')
-            
-            # Study hours recommendations
-            if study_hours < 15:
-                recommendations.append({
-                    'category': 'Study Time',
-                    'suggestion': f'Increase study hours from {study_hours} to at least 15-20 hours per week',
-                    'impact': 'High',
-                    'priority': 1
-                })
-            elif study_hours < 25:
-                recommendations.append({
-                    'category': 'Study Time',
-                    'suggestion': f'Consider increasing study hours from {study_hours} to 25-30 hours per week for better results',
-                    'impact': 'Medium',
-                    'priority': 2
-                })
-            
-            # Attendance recommendations
-            if attendance_rate < 85:
-                recommendations.append({
-                    'category': 'Attendance',
-                    'suggestion': f'Improve attendance from {attendance_rate:.1f}% to at least 90%',
-                    'impact': 'High',
-                    'priority': 1
-                })
-            elif attendance_rate < 95:
-                recommendations.append({
-                    'category': 'Attendance',
-                    'suggestion': f'Maintain consistent attendance above 95% (currently {attendance_rate:.1f}%)',
-                    'impact': 'Medium',
-                    'priority': 2
-                })
-            
-            # Test preparation recommendations
-            if test_prep == 'none':
-                recommendations.append({
-                    'category': 'Test Preparation',
-                    'suggestion': 'Enroll in test preparation courses to boost performance',
-                    'impact': 'High',
-                    'priority': 1
-                })
-            
-            # Subject-specific recommendations based on predicted grade
-            if predicted_grade < 60:
-                recommendations.extend([
-                    {
-                        'category': 'Mathematics',
-                        'suggestion': 'Focus on fundamental math concepts and practice daily',
-                        'impact': 'High',
-                        'priority': 1
-                    },
-                    {
-                        'category': 'Study Strategy',
-                        'suggestion': 'Consider getting a tutor or joining study groups',
-                        'impact': 'High',
-                        'priority': 1
-                    }
-                ])
-            elif predicted_grade < 75:
-                recommendations.extend([
-                    {
-                        'category': 'Mathematics',
-                        'suggestion': 'Practice more challenging math problems and review weak areas',
-                        'impact': 'Medium',
-                        'priority': 2
-                    },
-                    {
-                        'category': 'Study Strategy',
-                        'suggestion': 'Create a structured study schedule and use active learning techniques',
-                        'impact': 'Medium',
-                        'priority': 2
-                    }
-                ])
-            
-            # Sort recommendations by priority
-            recommendations.sort(key=lambda x: x['priority'])
-            
-            return recommendations
-        
-        except Exception as e:
-            print(f"Error generating recommendations: {e}")
-            return [{
-                'category': 'General',
-                'suggestion': 'Maintain consistent study habits and regular attendance',
-                'impact': 'Medium',
-                'priority': 1
-            }]
-
-# Global predictor instance
-predictor = StudentPerformancePredictor()
+        from ml_models.recommendations import rule_table
+        return rule_table.evaluate_one(student_data, predicted_grade)
+
+    def generate_recommendations_batch(self, records, predicted_grades):
+        """Recommendations for many students in one vectorized pass over the rule table
+
+        ``records`` is a list of student dicts or a DataFrame; returns one
+        list per student, identical to generate_recommendations().
+        """
+        from ml_models.recommendations import rule_table
+        return rule_table.evaluate(records, predicted_grades)
+
+# Global predictor instance; the model is loaded on first use or by preload_model()
+predictor = StudentPerformancePredictor(autoload=False)
+
+
+def preload_model():
+    """Warm up the global predictor and start its hot-reload hooks
+
+    Called from the WSGI/ASGI entry points so that serving processes start
+    loading immediately (ML_MODEL_PRELOAD), watch for new artifacts
+    (ML_MODEL_WATCH_INTERVAL) and reload on a signal (ML_MODEL_RELOAD_SIGNAL),
+    while manage.py commands never load the model.
+    """
+    thread = None
+    if getattr(settings, 'ML_MODEL_PRELOAD', True):
+        thread = predictor.start_background_load()
+
+    interval = getattr(settings, 'ML_MODEL_WATCH_INTERVAL', 0)
+    if interval:
+        predictor.start_watcher(interval)
+
+    signal_name = getattr(settings, 'ML_MODEL_RELOAD_SIGNAL', None)
+    if signal_name:
+        predictor.install_reload_signal(getattr(signal, signal_name))
+
+    if getattr(settings, 'ML_EXECUTOR_BACKEND', 'inline') == 'process':
+        # Spawn the inference pool now rather than on the first prediction
+        from ml_models.executor import get_executor
+        threading.Thread(target=get_executor().start, name='ml-pool-starter', daemon=True).start()
+    return thread
+
+
+def request_reload(model_dir=None):
+    """Ask every worker watching ``model_dir`` to hot-reload the model"""
+    path = os.path.join(model_dir or os.path.join(settings.BASE_DIR, 'ml_models'), RELOAD_TRIGGER_FILENAME)
+    with open(path, 'a'):
+        os.utime(path, None)
+    return path
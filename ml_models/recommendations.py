@@ -0,0 +1,246 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One row per recommendation. Rules on the same field with a 'below'
+# threshold form an if/elif chain: a student matches the lowest threshold
+# their value is under, and every rule sharing that threshold fires.
+# 'equals' rules fire on an exact match. Matches are listed in table order
+# and then stably sorted by priority.
+RECOMMENDATION_RULES = [
+    {
+        'field': 'study_hours_per_week', 'below': 15,
+        'category': 'Study Time',
+        'suggestion': 'Increase study hours from {value} to at least 15-20 hours per week',
+        'impact': 'High', 'priority': 1,
+    },
+    {
+        'field': 'study_hours_per_week', 'below': 25,
+        'category': 'Study Time',
+        'suggestion': 'Consider increasing study hours from {value} to 25-30 hours per week for better results',
+        'impact': 'Medium', 'priority': 2,
+    },
+    {
+        'field': 'attendance_rate', 'below': 85,
+        'category': 'Attendance',
+        'suggestion': 'Improve attendance from {value:.1f}% to at least 90%',
+        'impact': 'High', 'priority': 1,
+    },
+    {
+        'field': 'attendance_rate', 'below': 95,
+        'category': 'Attendance',
+        'suggestion': 'Maintain consistent attendance above 95% (currently {value:.1f}%)',
+        'impact': 'Medium', 'priority': 2,
+    },
+    {
+        'field': 'test_preparation_course', 'equals': 'none',
+        'category': 'Test Preparation',
+        'suggestion': 'Enroll in test preparation courses to boost performance',
+        'impact': 'High', 'priority': 1,
+    },
+    {
+        'field': 'predicted_grade', 'below': 60,
+        'category': 'Mathematics',
+        'suggestion': 'Focus on fundamental math concepts and practice daily',
+        'impact': 'High', 'priority': 1,
+    },
+    {
+        'field': 'predicted_grade', 'below': 60,
+        'category': 'Study Strategy',
+        'suggestion': 'Consider getting a tutor or joining study groups',
+        'impact': 'High', 'priority': 1,
+    },
+    {
+        'field': 'predicted_grade', 'below': 75,
+        'category': 'Mathematics',
+        'suggestion': 'Practice more challenging math problems and review weak areas',
+        'impact': 'Medium', 'priority': 2,
+    },
+    {
+        'field': 'predicted_grade', 'below': 75,
+        'category': 'Study Strategy',
+        'suggestion': 'Create a structured study schedule and use active learning techniques',
+        'impact': 'Medium', 'priority': 2,
+    },
+]
+
+# Value used when a student dict has no entry for the field
+FIELD_DEFAULTS = {
+    'study_hours_per_week': 0,
+    'attendance_rate': 0,
+    'test_preparation_course': 'none',
+}
+
+FALLBACK_RECOMMENDATION = {
+    'category': 'General',
+    'suggestion': 'Maintain consistent study habits and regular attendance',
+    'impact': 'Medium',
+    'priority': 1,
+}
+
+# Scalar types whose comparisons NumPy reproduces exactly in float64
+_PLAIN_NUMBERS = (int, float, bool, np.integer, np.floating, np.bool_)
+
+
+class CompiledRule:
+    __slots__ = ('field', 'below', 'equals', 'category', 'suggestion', 'impact', 'priority', 'templated', 'key')
+
+    def __init__(self, field, category, suggestion, impact, priority, below=None, equals=None):
+        self.field = field
+        self.below = below
+        self.equals = equals
+        self.category = category
+        self.suggestion = suggestion
+        self.impact = impact
+        self.priority = priority
+        self.templated = '{' in suggestion
+        # Rules sharing a condition share one mask
+        self.key = (field, 'below', below) if below is not None else (field, 'equals', equals)
+
+    def render(self, value):
+        return {
+            'category': self.category,
+            'suggestion': self.suggestion.format(value=value) if self.templated else self.suggestion,
+            'impact': self.impact,
+            'priority': self.priority,
+        }
+
+
+class RuleTable:
+    """Recommendation rules compiled once and evaluated with NumPy masks
+
+    evaluate() builds one boolean mask per rule over all students and then
+    emits the matches rule by rule in (priority, table order), which is the
+    order the stable priority sort would give. Students whose inputs are
+    not plain numbers go through evaluate_one(), which applies the same
+    table with Python comparisons and the same error fallback.
+    """
+
+    def __init__(self, rules):
+        self.rules = [CompiledRule(**rule) for rule in rules]
+        self.fields = list(dict.fromkeys(rule.field for rule in self.rules))
+        self.numeric_fields = [f for f in self.fields if any(r.below is not None for r in self.rules if r.field == f)]
+        # Emission order: by priority, ties kept in table order
+        self.ordered = sorted(self.rules, key=lambda rule: rule.priority)
+
+    def evaluate_one(self, student_data, predicted_grade):
+        """Recommendations for one student (same output as evaluate())"""
+        try:
+            values = self.field_values(student_data, predicted_grade)
+            matched = []
+            chain_hit = {}
+            for rule in self.rules:
+                value = values[rule.field]
+                if rule.below is not None:
+                    # elif chain: skip once a lower threshold on this field matched
+                    hit = chain_hit.get(rule.field)
+                    if hit is None and value < rule.below:
+                        chain_hit[rule.field] = hit = rule.below
+                    if hit == rule.below:
+                        matched.append(rule.render(value))
+                elif value == rule.equals:
+                    matched.append(rule.render(value))
+            matched.sort(key=lambda x: x['priority'])
+            return matched
+        except Exception as e:
+            logger.warning("Error generating recommendations: %s", e)
+            return [dict(FALLBACK_RECOMMENDATION)]
+
+    def field_values(self, student_data, predicted_grade):
+        values = {
+            field: student_data.get(field, FIELD_DEFAULTS.get(field))
+            for field in self.fields if field != 'predicted_grade'
+        }
+        values['predicted_grade'] = predicted_grade
+        return values
+
+    def columns(self, records, predicted_grades):
+        """Pull each rule field out of a list of dicts or a DataFrame as a sequence"""
+        if hasattr(records, 'columns') and hasattr(records, 'to_numpy'):
+            n_rows = len(records)
+            columns = {
+                field: records[field].to_numpy() if field in records.columns else [FIELD_DEFAULTS.get(field)] * n_rows
+                for field in self.fields if field != 'predicted_grade'
+            }
+        else:
+            columns = {
+                field: [record.get(field, FIELD_DEFAULTS.get(field)) for record in records]
+                for field in self.fields if field != 'predicted_grade'
+            }
+        columns['predicted_grade'] = predicted_grades
+        return columns
+
+    def evaluate(self, records, predicted_grades):
+        """Recommendations for many students at once
+
+        ``records`` is a list of student dicts or a DataFrame and
+        ``predicted_grades`` the matching predictions. Returns one list of
+        recommendation dicts per student, identical to evaluate_one().
+        """
+        n_rows = len(records)
+        columns = self.columns(records, predicted_grades)
+        results = [[] for _ in range(n_rows)]
+
+        # Rows with anything but plain numbers take the scalar path so that
+        # comparisons (and their errors) behave exactly as in Python
+        regular = np.ones(n_rows, dtype=bool)
+        numeric = {}
+        for field in self.numeric_fields:
+            values = columns[field]
+            if isinstance(values, np.ndarray) and values.dtype.kind in 'biuf':
+                numeric[field] = values.astype(np.float64, copy=False)
+                continue
+            if set(map(type, values)) <= {int, float}:
+                numeric[field] = np.asarray(values, dtype=np.float64)
+                continue
+            plain = np.fromiter((isinstance(v, _PLAIN_NUMBERS) for v in values), dtype=bool, count=n_rows)
+            regular &= plain
+            numeric[field] = np.fromiter(
+                (float(v) if ok else np.nan for v, ok in zip(values, plain)), dtype=np.float64, count=n_rows,
+            )
+
+        masks = {}
+        chain_hit = {field: np.zeros(n_rows, dtype=bool) for field in self.numeric_fields}
+        for rule in self.rules:
+            if rule.key in masks:
+                continue
+            if rule.below is not None:
+                below = numeric[rule.field] < rule.below
+                masks[rule.key] = below & ~chain_hit[rule.field] & regular
+                chain_hit[rule.field] |= below
+            else:
+                masks[rule.key] = regular & np.fromiter(
+                    (v == rule.equals for v in columns[rule.field]), dtype=bool, count=n_rows,
+                )
+
+        for rule in self.ordered:
+            values = columns[rule.field]
+            if isinstance(values, np.ndarray):
+                # Python scalars format faster and print the same as NumPy ones
+                values = values.tolist()
+            # Build the dicts inline; a method call per row costs as much as the dict
+            category, impact, priority = rule.category, rule.impact, rule.priority
+            rows = np.flatnonzero(masks[rule.key]).tolist()
+            if rule.templated:
+                fmt = rule.suggestion.format
+                for i in rows:
+                    results[i].append({
+                        'category': category, 'suggestion': fmt(value=values[i]),
+                        'impact': impact, 'priority': priority,
+                    })
+            else:
+                suggestion = rule.suggestion
+                for i in rows:
+                    results[i].append({
+                        'category': category, 'suggestion': suggestion,
+                        'impact': impact, 'priority': priority,
+                    })
+
+        for i in np.flatnonzero(~regular):
+            record = records.iloc[i].to_dict() if hasattr(records, 'iloc') else records[i]
+            results[i] = self.evaluate_one(record, predicted_grades[i])
+        return results
+
+
+rule_table = RuleTable(RECOMMENDATION_RULES)
@@ -0,0 +1,538 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import Client, Listener
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RegistryError(Exception):
+    """Raised for unknown versions or artifacts that cannot be registered or promoted"""
+
+
+class VersionStats:
+    """Latency samples for one model version, plus its deltas against the primary"""
+
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.abs_deltas = deque(maxlen=window)
+        self.scored = 0
+        self.errors = 0
+        self.compared = 0
+        self.delta_sum = 0.0
+        self.abs_delta_sum = 0.0
+        self.sq_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+
+    def add_delta(self, delta):
+        self.compared += 1
+        self.delta_sum += delta
+        self.abs_delta_sum += abs(delta)
+        self.sq_delta_sum += delta * delta
+        self.max_abs_delta = max(self.max_abs_delta, abs(delta))
+        self.abs_deltas.append(abs(delta))
+
+    def report(self):
+        import numpy as np
+        latencies = np.array(self.latencies) * 1000
+        report = {
+            'scored': self.scored,
+            'errors': self.errors,
+            'latency_ms': {
+                'p50': round(float(np.percentile(latencies, 50)), 3),
+                'p95': round(float(np.percentile(latencies, 95)), 3),
+                'p99': round(float(np.percentile(latencies, 99)), 3),
+            } if len(latencies) else None,
+        }
+        if self.compared:
+            report['delta'] = {
+                'compared': self.compared,
+                'mean': round(self.delta_sum / self.compared, 4),
+                'mean_abs': round(self.abs_delta_sum / self.compared, 4),
+                'rmse': round((self.sq_delta_sum / self.compared) ** 0.5, 4),
+                'p95_abs': round(float(np.percentile(self.abs_deltas, 95)), 4),
+                'max_abs': round(self.max_abs_delta, 4),
+            }
+        return report
+
+
+class ModelRegistry:
+    """The primary model plus shadow versions scored against live traffic
+
+    The primary is the global predictor, served as before. Shadow versions
+    are listed in a JSON state file (name -> bundle file or artifact
+    directory) shared by every worker on the host.
+
+    Shadow scoring runs in a scorer process, so it never competes with
+    requests for a worker's GIL. Without a ``scorer_address`` every worker
+    starts its own. With one, the host shares a single scorer: the first
+    worker to bind the address is the designated one, it starts the scorer
+    process and relays what the other workers send to it. submit() only
+    puts the served prediction on a bounded local queue without waiting;
+    a forwarder thread passes it on, and work is dropped when the queue is
+    full or no scorer can be reached. The scorer runs the input through the
+    primary and every shadow with the same code path, so their latency
+    samples are comparable, and records each shadow's delta against the
+    prediction the user was actually given. If the designated worker exits,
+    the scorer exits with it and the next worker to find the address free
+    takes over.
+
+    promote() copies a shadow's artifacts over the primary's and asks every
+    worker to hot-reload, the same way `manage.py reload_model` does.
+    """
+
+    def __init__(self, state_path, queue_size=256, sample_rate=1.0, latency_window=2000,
+                 scorer_address=None):
+        self.state_path = state_path
+        self.queue_size = queue_size
+        self.sample_rate = sample_rate
+        self.latency_window = latency_window
+        self.scorer_address = tuple(scorer_address) if scorer_address else None
+        self.submitted = 0
+        self.dropped = 0
+        self._state_mtime = None
+        self._shadow_names = []
+        self._pending = queue.Queue(maxsize=queue_size)
+        self._forwarder = None
+        self._connection = None
+        self._retry_at = 0.0
+        # Set only in the designated worker
+        self._designated = False
+        self._listener = None
+        self._process = None
+        self._queue = None
+        self._control = None
+        self._lock = threading.Lock()
+
+    # ---- State file ----
+
+    def read_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'shadows': {}}
+
+    def write_state(self, state):
+        tmp_path = f"{self.state_path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def shadow_names(self):
+        """Registered shadow names, re-read only when the state file changes"""
+        try:
+            mtime = os.stat(self.state_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._state_mtime:
+            self._state_mtime = mtime
+            self._shadow_names = list(self.read_state()['shadows'])
+        return self._shadow_names
+
+    # ---- Registry operations ----
+
+    def describe(self):
+        from ml_models.predictor import predictor
+        return {'primary': predictor.model_dir, 'shadows': self.read_state()['shadows']}
+
+    def add_shadow(self, name, path):
+        """Validate the artifacts at ``path`` and register them as shadow ``name``"""
+        path = os.path.abspath(path)
+        try:
+            load_version(path)
+        except Exception as e:
+            raise RegistryError(f"{path} failed validation: {e}")
+        state = self.read_state()
+        state['shadows'][name] = path
+        self.write_state(state)
+        return path
+
+    def remove_shadow(self, name):
+        state = self.read_state()
+        if state['shadows'].pop(name, None) is None:
+            raise RegistryError(f"No shadow model named '{name}'")
+        self.write_state(state)
+
+    def promote(self, name):
+        """Make shadow ``name`` the primary on every worker
+
+        Its artifacts are validated, copied over the primary's (each file
+        renamed into place) and the workers are asked to hot-reload. A
+        directory without a bundle gets one built from its pickles, so flat
+        mode never keeps serving the old bundle. The shadow entry is
+        removed. Returns the files written.
+        """
+        from ml_models import predictor as predictor_module
+        state = self.read_state()
+        path = state['shadows'].get(name)
+        if path is None:
+            raise RegistryError(f"No shadow model named '{name}'")
+        try:
+            loaded = load_version(path)
+        except Exception as e:
+            raise RegistryError(f"{path} failed validation: {e}")
+
+        primary = predictor_module.predictor
+        if os.path.isdir(path):
+            filenames = [predictor_module.BUNDLE_FILENAME, predictor_module.MODEL_FILENAME]
+            filenames += predictor_module.PREPROCESSOR_FILENAMES
+            copies = [(os.path.join(path, f), f) for f in filenames if os.path.exists(os.path.join(path, f))]
+        elif primary.variant == 'compact':
+            copies = [(path, predictor_module.COMPACT_BUNDLE_FILENAME)]
+        elif primary.mode == 'flat':
+            copies = [(path, predictor_module.BUNDLE_FILENAME)]
+        else:
+            raise RegistryError("A bundle can only be promoted when ML_PREDICTOR_MODE is 'flat'")
+
+        written = []
+        for source, filename in copies:
+            target = os.path.join(primary.model_dir, filename)
+            tmp_path = f"{target}.tmp{os.getpid()}"
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, target)
+            written.append(target)
+        if os.path.isdir(path) and not os.path.exists(os.path.join(path, predictor_module.BUNDLE_FILENAME)):
+            from ml_models.bundle import write_bundle
+            from ml_models.forest_engine import FlatForest
+            target = os.path.join(primary.model_dir, predictor_module.BUNDLE_FILENAME)
+            write_bundle(target, FlatForest.from_sklearn(loaded.model), loaded.pipeline, version=loaded.version)
+            written.append(target)
+
+        del state['shadows'][name]
+        self.write_state(state)
+        predictor_module.request_reload(primary.model_dir)
+        return written
+
+    # ---- Shadow scoring ----
+
+    @property
+    def designated(self):
+        """True in a worker that owns a scorer process"""
+        return self._designated
+
+    def authkey(self):
+        return hashlib.sha256(f'{settings.SECRET_KEY}:{self.state_path}'.encode()).digest()
+
+    def submit(self, student_data, prediction):
+        """Queue a served prediction for shadow scoring; never blocks"""
+        if not self.shadow_names():
+            return False
+        if prediction.get('predicted_grade') is None or random.random() >= self.sample_rate:
+            return False
+        self.submitted += 1
+        if self._forwarder is None:
+            with self._lock:
+                if self._forwarder is None:
+                    self._forwarder = threading.Thread(target=self.forward, name='ml-shadow-forwarder', daemon=True)
+                    self._forwarder.start()
+        try:
+            self._pending.put_nowait((dict(student_data), prediction))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def forward(self):
+        """Forwarder thread: hand queued work to the scorer process"""
+        while True:
+            item = self._pending.get()
+            try:
+                delivered = self.deliver(item)
+            except Exception:
+                logger.exception("Could not hand work to the shadow scorer")
+                delivered = False
+            if not delivered:
+                self.dropped += 1
+
+    def deliver(self, item):
+        if not self.designated and not self.connect():
+            return False
+        if self.designated:
+            if self._process is None or not self._process.is_alive():
+                # Restart a scorer that died, at most every few seconds
+                if time.monotonic() < self._retry_at:
+                    return False
+                self._retry_at = time.monotonic() + 5
+                self.start()
+            try:
+                self._queue.put_nowait(item)
+                return True
+            except queue.Full:
+                return False
+        try:
+            with self._lock:
+                self._connection.send(('score', item))
+            return True
+        except (OSError, EOFError):
+            # The designated worker went away; find or become the next one
+            self._connection = None
+            return False
+
+    def connect(self):
+        """Connect to the scorer's address, or bind it and become the designated worker
+
+        Returns True when work can be delivered. Failed attempts are only
+        retried after a second, so a missing scorer costs little per sample.
+        """
+        if self._connection is not None or self.designated:
+            return True
+        if self.scorer_address is None:
+            # No shared scorer: this worker runs its own
+            self._designated = True
+            self.start()
+            return True
+        if time.monotonic() < self._retry_at:
+            return False
+        try:
+            self._connection = Client(self.scorer_address, authkey=self.authkey())
+            return True
+        except OSError:
+            pass
+        try:
+            listener = Listener(self.scorer_address, authkey=self.authkey())
+        except OSError:
+            # Another worker is binding it right now
+            self._retry_at = time.monotonic() + 1
+            return False
+        with self._lock:
+            self._listener = listener
+            self._designated = True
+        self.start()
+        threading.Thread(target=self.accept, name='ml-shadow-listener', daemon=True).start()
+        return True
+
+    def start(self):
+        """Spawn the scorer process (designated worker only)"""
+        ctx = multiprocessing.get_context('spawn')
+        work_queue = ctx.Queue(maxsize=self.queue_size)
+        control, child_control = ctx.Pipe()
+        process = ctx.Process(
+            target=run_shadow_scorer,
+            args=(
+                os.environ.get('DJANGO_SETTINGS_MODULE', 'student_result_management.settings'),
+                self.state_path, work_queue, child_control, self.latency_window,
+            ),
+            name='ml-shadow-scorer',
+            daemon=True,
+        )
+        process.start()
+        with self._lock:
+            self._queue, self._control, self._process = work_queue, control, process
+        logger.info("Shadow scorer process %s started", process.pid)
+
+    def accept(self):
+        """Designated worker: take connections from the other workers"""
+        while True:
+            try:
+                connection = self._listener.accept()
+            except Exception:
+                # A client that failed the handshake; keep serving the others
+                logger.warning("Rejected a shadow scorer connection", exc_info=True)
+                continue
+            threading.Thread(
+                target=self.relay, args=(connection,), name='ml-shadow-relay', daemon=True,
+            ).start()
+
+    def relay(self, connection):
+        """Designated worker: pass one worker's work and metrics requests to the scorer"""
+        with connection:
+            while True:
+                try:
+                    message = connection.recv()
+                except (OSError, EOFError):
+                    return
+                if message[0] == 'score':
+                    try:
+                        self._queue.put_nowait(message[1])
+                    except queue.Full:
+                        self.dropped += 1
+                elif message[0] == 'metrics':
+                    connection.send(self.scorer_metrics())
+
+    def scorer_metrics(self):
+        """The scorer process's report, asked directly or through the designated worker"""
+        with self._lock:
+            try:
+                if self.designated:
+                    if self._process is None or not self._process.is_alive():
+                        return None
+                    self._control.send('metrics')
+                    return self._control.recv() if self._control.poll(2) else None
+                if self._connection is not None:
+                    self._connection.send(('metrics',))
+                    if self._connection.poll(2):
+                        return self._connection.recv()
+                    # A late reply would be read as the answer to the next request
+                    self._connection.close()
+                    self._connection = None
+            except (OSError, EOFError):
+                self._connection = None
+        return None
+
+    def metrics(self):
+        scorer = self.scorer_metrics()
+        return {
+            'shadows': self.shadow_names(),
+            'submitted': self.submitted,
+            'dropped': self.dropped,
+            'sample_rate': self.sample_rate,
+            'designated': self.designated,
+            'scorer_pid': scorer['pid'] if scorer else None,
+            'scorer': scorer,
+        }
+
+
+class ShadowScorer:
+    """Scorer-process side of the registry: loads the shadows and keeps their stats"""
+
+    def __init__(self, state_path, latency_window):
+        self.state_path = state_path
+        self.latency_window = latency_window
+        self.shadows = {}
+        self.paths = {}
+        self.stats = {}
+        self._state_mtime = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Load shadows added to the state file and drop removed ones"""
+        try:
+            mtime = os.stat(self.state_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._loaded and mtime == self._state_mtime:
+            return
+        self._state_mtime = mtime
+        self._loaded = True
+
+        try:
+            with open(self.state_path) as f:
+                wanted = json.load(f)['shadows']
+        except FileNotFoundError:
+            wanted = {}
+        shadows = {}
+        for name, path in wanted.items():
+            if self.paths.get(name) == path and name in self.shadows:
+                shadows[name] = self.shadows[name]
+                continue
+            try:
+                shadows[name] = load_version(path)
+                logger.info("Shadow model %s loaded from %s", name, path)
+            except Exception:
+                logger.exception("Could not load shadow model %s from %s", name, path)
+        self.shadows = shadows
+        self.paths = {name: wanted[name] for name in shadows}
+
+    def run(self, work_queue):
+        from ml_models.predictor import predictor
+        while True:
+            self.refresh()
+            try:
+                student_data, prediction = work_queue.get(timeout=5)
+            except queue.Empty:
+                continue
+
+            loaded = predictor.active
+            if loaded is not None:
+                self.score(f"primary:{loaded.version}", loaded, student_data)
+            served = prediction['predicted_grade']
+            for name, shadow in list(self.shadows.items()):
+                key = f"{name}:{shadow.version}"
+                grade = self.score(key, shadow, student_data)
+                if grade is not None:
+                    with self._lock:
+                        self.stats_for(key).add_delta(grade - served)
+
+    def score(self, key, loaded, student_data):
+        started = time.perf_counter()
+        try:
+            estimate = loaded.confidence_engine.evaluate(loaded.pipeline.transform_one(student_data))
+            grade = round(float(estimate['prediction'][0]), 2)
+        except Exception:
+            grade = None
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            stats = self.stats_for(key)
+            if grade is None:
+                stats.errors += 1
+            else:
+                stats.latencies.append(elapsed)
+                stats.scored += 1
+        return grade
+
+    def stats_for(self, key):
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = VersionStats(self.latency_window)
+        return stats
+
+    def serve_metrics(self, control):
+        """Answer the web process's metrics requests over the control pipe"""
+        while True:
+            try:
+                control.recv()
+            except EOFError:
+                os._exit(0)  # The web process is gone
+            with self._lock:
+                report = {key: stats.report() for key, stats in self.stats.items()}
+            control.send({'pid': os.getpid(), 'loaded': dict(self.paths), 'versions': report})
+
+
+def run_shadow_scorer(settings_module, state_path, work_queue, control, latency_window):
+    """Entry point of the scorer process"""
+    if hasattr(os, 'nice'):
+        # Yield the CPU to request-serving processes whenever they want it
+        os.nice(19)
+    from ml_models.executor import init_worker
+    init_worker(settings_module)
+    scorer = ShadowScorer(state_path, latency_window)
+    threading.Thread(target=scorer.serve_metrics, args=(control,), name='ml-shadow-metrics', daemon=True).start()
+    scorer.run(work_queue)
+
+
+def load_version(path):
+    """Load and canary-check a model from a bundle file or an artifact directory"""
+    from ml_models.predictor import StudentPerformancePredictor
+    if os.path.isdir(path):
+        candidate = StudentPerformancePredictor(autoload=False, model_dir=path)
+        loaded = candidate.read_artifacts()
+    elif os.path.isfile(path):
+        candidate = StudentPerformancePredictor(autoload=False, model_dir=os.path.dirname(path))
+        loaded = candidate.load_bundle(path)
+    else:
+        raise RegistryError(f"{path} does not exist")
+    candidate.validate(loaded)
+    return loaded
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Process-wide ModelRegistry, or None when ML_MODEL_REGISTRY_PATH is not set"""
+    global _registry
+    path = getattr(settings, 'ML_MODEL_REGISTRY_PATH', None)
+    if not path:
+        return None
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry(
+                    path,
+                    queue_size=getattr(settings, 'ML_SHADOW_QUEUE_SIZE', 256),
+                    sample_rate=getattr(settings, 'ML_SHADOW_SAMPLE_RATE', 1.0),
+                    scorer_address=getattr(settings, 'ML_SHADOW_SCORER_ADDRESS', None),
+                )
+    return _registry
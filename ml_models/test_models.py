@@ -0,0 +1,176 @@
+import itertools
+import unittest
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from ml_models.confidence import ConfidenceEngine
+from ml_models.forest_engine import FlatForest, build_forest
+from ml_models.recommendations import rule_table
+
+
+def legacy_recommendations(student_data, predicted_grade):
+    """The if/elif chain generate_recommendations() used before the rule table"""
+    recommendations = []
+    try:
+        study_hours = student_data.get('study_hours_per_week', 0)
+        attendance_rate = student_data.get('attendance_rate', 0)
+        test_prep = student_data.get('test_preparation_course', 'none')
+
+        if study_hours < 15:
+            recommendations.append({
+                'category': 'Study Time',
+                'suggestion': f'Increase study hours from {study_hours} to at least 15-20 hours per week',
+                'impact': 'High', 'priority': 1,
+            })
+        elif study_hours < 25:
+            recommendations.append({
+                'category': 'Study Time',
+                'suggestion': f'Consider increasing study hours from {study_hours} to 25-30 hours per week for better results',
+                'impact': 'Medium', 'priority': 2,
+            })
+
+        if attendance_rate < 85:
+            recommendations.append({
+                'category': 'Attendance',
+                'suggestion': f'Improve attendance from {attendance_rate:.1f}% to at least 90%',
+                'impact': 'High', 'priority': 1,
+            })
+        elif attendance_rate < 95:
+            recommendations.append({
+                'category': 'Attendance',
+                'suggestion': f'Maintain consistent attendance above 95% (currently {attendance_rate:.1f}%)',
+                'impact': 'Medium', 'priority': 2,
+            })
+
+        if test_prep == 'none':
+            recommendations.append({
+                'category': 'Test Preparation',
+                'suggestion': 'Enroll in test preparation courses to boost performance',
+                'impact': 'High', 'priority': 1,
+            })
+
+        if predicted_grade < 60:
+            recommendations.extend([
+                {'category': 'Mathematics', 'suggestion': 'Focus on fundamental math concepts and practice daily',
+                 'impact': 'High', 'priority': 1},
+                {'category': 'Study Strategy', 'suggestion': 'Consider getting a tutor or joining study groups',
+                 'impact': 'High', 'priority': 1},
+            ])
+        elif predicted_grade < 75:
+            recommendations.extend([
+                {'category': 'Mathematics', 'suggestion': 'Practice more challenging math problems and review weak areas',
+                 'impact': 'Medium', 'priority': 2},
+                {'category': 'Study Strategy',
+                 'suggestion': 'Create a structured study schedule and use active learning techniques',
+                 'impact': 'Medium', 'priority': 2},
+            ])
+
+        recommendations.sort(key=lambda x: x['priority'])
+        return recommendations
+    except Exception:
+        return [{
+            'category': 'General',
+            'suggestion': 'Maintain consistent study habits and regular attendance',
+            'impact': 'Medium',
+            'priority': 1,
+        }]
+
+
+class FlatForestTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(2000, 8))
+        y = 3 * X[:, 0] + 5 * np.sin(X[:, 1]) + X[:, 2] * X[:, 3] + rng.normal(size=2000)
+        cls.model = RandomForestRegressor(n_estimators=25, min_samples_leaf=2, random_state=0, n_jobs=1).fit(X, y)
+        cls.forest = FlatForest.from_sklearn(cls.model)
+        # Wider than the training data, so rows also land on the outermost leaves
+        cls.X = rng.normal(scale=1.5, size=(5000, 8))
+
+    def test_predict_matches_sklearn_bit_for_bit(self):
+        # One row, a small batch, and both sides of the summation switch in sum_trees
+        for rows in (1, 7, 4096, 5000):
+            with self.subTest(rows=rows):
+                np.testing.assert_array_equal(self.forest.predict(self.X[:rows]), self.model.predict(self.X[:rows]))
+
+    def test_apply_reaches_the_sklearn_leaves(self):
+        expected = (self.model.apply(self.X) + self.forest.roots).T
+        np.testing.assert_array_equal(self.forest.apply(self.X), expected)
+
+    def test_contributions_add_up_to_the_prediction(self):
+        bias, contributions = self.forest.contributions(self.X[:500])
+        self.assertEqual(contributions.shape, (500, 8))
+        np.testing.assert_allclose(bias + contributions.sum(axis=1), self.model.predict(self.X[:500]), atol=1e-9)
+
+
+    def test_compact_copy_reaches_the_same_leaves(self):
+        compact = self.forest.compact()
+        self.assertEqual((compact.threshold.dtype, compact.value.dtype), (np.float32, np.float32))
+        self.assertLess(compact.nbytes, self.forest.nbytes)
+        # Rows sitting exactly on a split, where rounding a threshold the wrong way would flip the branch
+        splits = self.forest.children[0::2] != np.arange(self.forest.node_count)
+        on_split = np.tile(self.X[:1], (splits.sum(), 1)).astype(np.float32)
+        on_split[np.arange(len(on_split)), self.forest.feature[splits]] = self.forest.threshold[splits]
+        for X in (self.X, on_split):
+            np.testing.assert_array_equal(compact.apply(X), self.forest.apply(X))
+            np.testing.assert_allclose(compact.predict(X), self.forest.predict(X), rtol=1e-5)
+
+class ConfidenceEngineTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(1)
+        X = rng.normal(size=(1000, 8))
+        y = 10 * X[:, 0] + 4 * X[:, 1] ** 2 + rng.normal(scale=3, size=1000)
+        cls.model = RandomForestRegressor(n_estimators=30, random_state=0, n_jobs=1).fit(X, y)
+        cls.X = rng.normal(size=(200, 8))
+
+    def legacy_confidence(self, row):
+        """The per-tree loop get_prediction_confidence() ran before the engine, unrounded"""
+        tree_predictions = [tree.predict(row)[0] for tree in self.model.estimators_]
+        return max(0, min(100, 100 - np.std(tree_predictions) * 2)), tree_predictions
+
+    def test_one_pass_matches_the_per_tree_loop(self):
+        for mode in ('sklearn', 'flat'):
+            with self.subTest(mode=mode):
+                estimate = ConfidenceEngine(build_forest(self.model, mode)).evaluate(self.X)
+                np.testing.assert_array_equal(estimate['prediction'], self.model.predict(self.X))
+                for i in range(len(self.X)):
+                    confidence, tree_predictions = self.legacy_confidence(self.X[i:i + 1])
+                    self.assertAlmostEqual(estimate['confidence'][i], confidence, places=9)
+                    np.testing.assert_allclose(
+                        [estimate['lower'][i], estimate['upper'][i]], np.quantile(tree_predictions, [0.1, 0.9]),
+                    )
+
+
+class RuleTableTests(unittest.TestCase):
+    STUDY_HOURS = [0, 14, 14.9, 15, 24, 25, 40]
+    ATTENDANCE = [0.0, 84.9, 85, 94.99, 95, 100.0]
+    TEST_PREPARATION = ['none', 'completed']
+    PREDICTED_GRADES = [30.0, 59.99, 60, 74.9, 75, 95.0]
+
+    def cases(self):
+        for hours, attendance, prep, grade in itertools.product(
+            self.STUDY_HOURS, self.ATTENDANCE, self.TEST_PREPARATION, self.PREDICTED_GRADES,
+        ):
+            yield {'study_hours_per_week': hours, 'attendance_rate': attendance, 'test_preparation_course': prep}, grade
+
+    def test_evaluate_one_matches_the_if_chain(self):
+        for student, grade in self.cases():
+            with self.subTest(student=student, grade=grade):
+                self.assertEqual(rule_table.evaluate_one(student, grade), legacy_recommendations(student, grade))
+
+    def test_evaluate_matches_the_if_chain(self):
+        students, grades = zip(*self.cases())
+        expected = [legacy_recommendations(student, grade) for student, grade in zip(students, grades)]
+        self.assertEqual(rule_table.evaluate(list(students), list(grades)), expected)
+
+    def test_missing_and_invalid_fields(self):
+        students = [{}, {'study_hours_per_week': 'ten', 'attendance_rate': 90.0}, {'attendance_rate': None}]
+        grades = [80.0, 50.0, 65.0]
+        expected = [legacy_recommendations(student, grade) for student, grade in zip(students, grades)]
+        with self.assertLogs('ml_models.recommendations', 'WARNING'):
+            self.assertEqual([rule_table.evaluate_one(s, g) for s, g in zip(students, grades)], expected)
+            self.assertEqual(rule_table.evaluate(students, grades), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
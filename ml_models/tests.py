@@ -0,0 +1,420 @@
+import contextlib
+import io
+import math
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from ml_models import train_model
+from ml_models.bundle import (
+    BUNDLE_FILENAME, FOREST_ARRAYS, BundleError, content_version, load_bundle, read_manifest, write_bundle,
+)
+from ml_models.feature_pipeline import FeaturePipeline
+from ml_models.feature_store import FeatureStore, encode_rows
+from ml_models.forest_engine import FlatForest
+from ml_models.prediction_cache import PredictionCache
+from ml_models.predictor import (
+    COMPACT_BUNDLE_FILENAME, CANARY_PROFILE, FAILED, LOADING, NOT_LOADED, READY, StudentPerformancePredictor,
+)
+from ml_models.train_model import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, NUMERIC_COLUMNS
+
+
+def sample_frame():
+    """The sample training data with the encoded columns train_model.py adds, and its LabelEncoders"""
+    df = train_model.create_sample_data()
+    label_encoders = {}
+    for column in CATEGORICAL_COLUMNS:
+        label_encoders[column] = LabelEncoder().fit(df[column])
+        df[column + '_encoded'] = label_encoders[column].transform(df[column])
+    return df, label_encoders
+
+
+def sample_records(n_rows=None):
+    """Raw student dicts as the prediction form submits them"""
+    return train_model.create_sample_data().drop(columns=['math_score']).to_dict('records')[:n_rows]
+
+
+def train_artifacts(model_dir, n_estimators=10, seed=0, target_scale=1):
+    """Train a small forest on the sample data and save it to ``model_dir`` as train_model.py does
+
+    ``target_scale`` multiplies the grades learned, e.g. to get a model
+    that fails the canary. Returns the bundle manifest.
+    """
+    df, label_encoders = sample_frame()
+    scaler = StandardScaler().fit(df[FEATURE_COLUMNS])
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=seed, n_jobs=1)
+    model.fit(scaler.transform(df[FEATURE_COLUMNS]), df['math_score'] * target_scale)
+    with mock.patch.object(train_model, 'MODEL_DIR', model_dir), contextlib.redirect_stdout(io.StringIO()):
+        return train_model.save_artifacts(model, scaler, label_encoders, list(FEATURE_COLUMNS), {})
+
+
+class ModelDirTestCase(SimpleTestCase):
+    """Trains one small model into a temporary model directory for the whole class"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._model_dir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls._model_dir.cleanup)
+        cls.model_dir = cls._model_dir.name
+        cls.manifest = train_artifacts(cls.model_dir)
+
+    def make_predictor(self, mode='flat', **kwargs):
+        return StudentPerformancePredictor(mode=mode, model_dir=self.model_dir, **kwargs)
+
+
+class FeaturePipelineTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.df, label_encoders = sample_frame()
+        scaler = StandardScaler().fit(cls.df[FEATURE_COLUMNS])
+        cls.pipeline = FeaturePipeline.from_preprocessors(label_encoders, scaler, FEATURE_COLUMNS)
+        # What the predictor computed before the pipeline: LabelEncoder codes through StandardScaler
+        cls.expected = scaler.transform(cls.df[FEATURE_COLUMNS])
+
+    def test_batches_match_the_label_encoders_and_scaler(self):
+        raw = self.df[CATEGORICAL_COLUMNS + NUMERIC_COLUMNS]
+        for name, batch in (
+            ('dicts', raw.to_dict('records')), ('DataFrame', raw), ('structured array', raw.to_records(index=False)),
+        ):
+            with self.subTest(container=name):
+                X, errors = self.pipeline.transform(batch)
+                self.assertEqual(errors, {})
+                np.testing.assert_array_equal(X, self.expected)
+
+    def test_single_rows_match_the_label_encoders_and_scaler(self):
+        for i, record in enumerate(sample_records(50)):
+            np.testing.assert_array_equal(self.pipeline.transform_one(record), self.expected[i:i + 1])
+
+
+class PredictBatchTests(ModelDirTestCase):
+    def test_bad_rows_are_reported_and_the_rest_scored(self):
+        records = sample_records(8)
+        del records[1]['study_hours_per_week']
+        records[3]['attendance_rate'] = 'abc'
+        records[4]['previous_grade'] = None
+        records[6]['attendance_rate'] = math.inf
+        for mode in ('flat', 'sklearn'):
+            with self.subTest(mode=mode):
+                predictor = self.make_predictor(mode)
+                result = predictor.predict_batch(records)
+                self.assertEqual(sorted(result['errors']), [1, 3, 4, 6])
+                self.assertIn('study_hours_per_week', result['errors'][1])
+                self.assertIn("'abc'", result['errors'][3])
+                self.assertEqual(result['model_version'], self.manifest['version'])
+                for i, record in enumerate(records):
+                    if i in result['errors']:
+                        self.assertIsNone(result['predictions'][i])
+                        continue
+                    single = predictor.predict(record)
+                    self.assertEqual(result['predictions'][i], single['predicted_grade'])
+                    self.assertEqual(result['confidences'][i], single['confidence'])
+                    self.assertEqual((result['lower'][i], result['upper'][i]), (single['lower'], single['upper']))
+
+
+class LoadStateTests(ModelDirTestCase):
+    def test_loads_on_first_use(self):
+        predictor = self.make_predictor(autoload=False)
+        self.assertEqual(predictor.state, NOT_LOADED)
+        self.assertIsNone(predictor.model_version)
+        result = predictor.predict(CANARY_PROFILE)
+        self.assertIsNone(result['error'])
+        self.assertEqual(predictor.state, READY)
+        self.assertEqual(predictor.status()['model_version'], self.manifest['version'])
+
+    def test_missing_artifacts_fail_with_the_reason(self):
+        with tempfile.TemporaryDirectory() as empty:
+            predictor = StudentPerformancePredictor(mode='flat', model_dir=empty, autoload=False)
+            with self.assertLogs('ml_models.predictor', 'ERROR'):
+                result = predictor.predict(CANARY_PROFILE)
+        self.assertEqual(predictor.state, FAILED)
+        self.assertIsNone(result['predicted_grade'])
+        self.assertTrue(result['error'].startswith('Model failed to load'))
+        self.assertEqual(predictor.status()['error'], predictor.load_error)
+
+    def test_requests_wait_for_a_background_load(self):
+        predictor = self.make_predictor(autoload=False)
+        predictor.load_wait_timeout = 0.05
+        release = threading.Event()
+        read_artifacts = predictor.read_artifacts
+
+        def slow_read():
+            release.wait(5)
+            return read_artifacts()
+
+        with mock.patch.object(predictor, 'read_artifacts', slow_read):
+            thread = predictor.start_background_load()
+            self.assertEqual(predictor.state, LOADING)
+            self.assertIsNone(predictor.start_background_load())
+            # Times out while the load is still running, without starting another
+            self.assertEqual(predictor.predict(CANARY_PROFILE)['error'], predictor.unavailable_reason())
+            self.assertIn('still loading', predictor.unavailable_reason())
+            release.set()
+            thread.join(5)
+        self.assertEqual(predictor.state, READY)
+        self.assertIsNone(predictor.predict(CANARY_PROFILE)['error'])
+
+
+class BundleTests(ModelDirTestCase):
+    def setUp(self):
+        self.pickles = self.make_predictor('sklearn', autoload=False).load_pickles(self.model_dir)
+        self.bundle_path = os.path.join(self.model_dir, BUNDLE_FILENAME)
+
+    def test_round_trip(self):
+        bundle = load_bundle(self.bundle_path)
+        forest, pipeline = FlatForest.from_sklearn(self.pickles.model), self.pickles.pipeline
+        for name in FOREST_ARRAYS:
+            np.testing.assert_array_equal(getattr(bundle['forest'], name), getattr(forest, name))
+        self.assertEqual(bundle['pipeline'].category_maps, pipeline.category_maps)
+        self.assertEqual(bundle['pipeline'].feature_columns, pipeline.feature_columns)
+
+        X, _ = bundle['pipeline'].transform(sample_records(200))
+        np.testing.assert_array_equal(bundle['forest'].predict(X), self.pickles.model.predict(X))
+        # The same content version whichever way the model is read
+        self.assertEqual(bundle['manifest']['version'], content_version(forest, pipeline))
+        self.assertEqual(self.pickles.version, bundle['manifest']['version'])
+
+    def test_metadata_and_explicit_version(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'candidate.bundle')
+            forest = FlatForest.from_sklearn(self.pickles.model)
+            write_bundle(path, forest, self.pickles.pipeline, version='v1', metadata={'note': 'x'})
+            manifest = load_bundle(path)['manifest']
+        self.assertEqual((manifest['version'], manifest['metadata']), ('v1', {'note': 'x'}))
+
+    def test_corrupt_bundles_are_rejected(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'corrupt.bundle')
+            shutil.copy(self.bundle_path, path)
+            manifest = read_manifest(path)
+            spec = manifest['arrays']['value']
+            with open(path, 'r+b') as f:
+                f.seek(manifest['data_start'] + spec['offset'])
+                byte = f.read(1)
+                f.seek(-1, os.SEEK_CUR)
+                f.write(bytes([byte[0] ^ 0xFF]))
+            with self.assertRaisesRegex(BundleError, 'Checksum mismatch'):
+                load_bundle(path)
+            # verify=False skips the check
+            load_bundle(path, verify=False)
+
+            not_a_bundle = os.path.join(tmp, 'model.pkl')
+            shutil.copy(os.path.join(self.model_dir, 'student_performance_model.pkl'), not_a_bundle)
+            with self.assertRaisesRegex(BundleError, 'not a model bundle'):
+                load_bundle(not_a_bundle)
+
+    def test_flat_mode_serves_the_bundle(self):
+        flat, sklearn = self.make_predictor('flat'), self.make_predictor('sklearn')
+        self.assertEqual(flat.active.source, self.bundle_path)
+        self.assertEqual(flat.model_version, sklearn.model_version)
+        records = sample_records(100)
+        self.assertEqual(flat.predict_batch(records), sklearn.predict_batch(records))
+
+
+class ReloadTests(ModelDirTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.deploy_dir = tmp.name
+        self.deploy()
+
+    def deploy(self):
+        """Copy the class's model into the directory the predictors under test serve"""
+        for filename in os.listdir(self.model_dir):
+            shutil.copy(os.path.join(self.model_dir, filename), self.deploy_dir)
+
+    def test_a_model_failing_the_canary_is_not_activated(self):
+        predictor = StudentPerformancePredictor(mode='flat', model_dir=self.deploy_dir)
+        before = predictor.active
+        expected = predictor.predict(CANARY_PROFILE)
+
+        train_artifacts(self.deploy_dir, seed=1, target_scale=10)
+        with self.assertLogs('ml_models.predictor', 'ERROR'):
+            self.assertFalse(predictor.reload())
+        self.assertIs(predictor.active, before)
+        self.assertIn('outside 0-100', predictor.reload_error)
+        self.assertEqual(predictor.predict(CANARY_PROFILE), expected)
+        self.assertEqual(predictor.state, READY)
+
+    def test_a_good_model_is_swapped_in(self):
+        for mode in ('flat', 'sklearn'):
+            with self.subTest(mode=mode):
+                self.deploy()
+                predictor = StudentPerformancePredictor(mode=mode, model_dir=self.deploy_dir)
+                swaps = []
+                predictor.reload_callbacks.append(lambda previous, candidate: swaps.append((previous, candidate)))
+                before = predictor.active
+
+                manifest = train_artifacts(self.deploy_dir, seed=1)
+                self.assertTrue(predictor.reload())
+                self.assertEqual(predictor.model_version, manifest['version'])
+                self.assertNotEqual(manifest['version'], before.version)
+                self.assertEqual(swaps, [(before, predictor.active)])
+                self.assertIsNone(predictor.reload_error)
+                # A request that picked up the old version can still finish with it
+                self.assertIsNotNone(before.confidence_engine.evaluate(before.pipeline.transform_one(CANARY_PROFILE)))
+
+
+class MicroBatcherTests(ModelDirTestCase):
+    def test_batched_results_match_single_predictions(self):
+        from ml_models.batching import MicroBatcher
+
+        predictor = self.make_predictor()
+        records = sample_records(8)
+        records[2]['attendance_rate'] = 'abc'
+        # A wide window so all eight requests land in one batch
+        batcher = MicroBatcher(predictor, window_ms=2000, max_rows=len(records))
+        results = [None] * len(records)
+
+        def submit(i):
+            results[i] = batcher.submit(records[i], timeout=10)
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(records))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(batcher.metrics()['batches'], 1)
+        self.assertIn("'abc'", results[2]['error'])
+        self.assertIsNone(results[2]['predicted_grade'])
+        for i, record in enumerate(records):
+            if i != 2:
+                self.assertEqual(results[i], predictor.predict(record))
+
+
+class PredictionCacheTests(ModelDirTestCase):
+    def test_keys(self):
+        cache = PredictionCache(quantize={'attendance_rate': 5})
+        record = sample_records(1)[0]
+        inputs, canonical = cache.canonicalize(dict(record, attendance_rate=81.9))
+        self.assertEqual(canonical['attendance_rate'], 80)
+        self.assertEqual(cache.canonicalize(dict(record, attendance_rate=78))[0], inputs)
+        self.assertNotEqual(cache.canonicalize(dict(record, attendance_rate=83))[0], inputs)
+        # Ints and floats share a key; unkeyable values skip the cache
+        self.assertEqual(cache.canonicalize(dict(record, previous_grade=70))[0],
+                         cache.canonicalize(dict(record, previous_grade=70.0))[0])
+        self.assertEqual(cache.canonicalize(dict(record, previous_grade=[70])), (None, None))
+
+        cache.put(cache.key('v1', inputs), {'grade': 1})
+        self.assertEqual(cache.get(cache.key('v1', inputs)), {'grade': 1})
+        self.assertIsNone(cache.get(cache.key('v2', inputs)))
+        self.assertEqual(cache.model_version, 'v1')
+
+    def test_expiry_and_eviction(self):
+        cache = PredictionCache(maxsize=2, ttl=-1)
+        cache.put('a', 1)
+        self.assertIsNone(cache.get('a'))
+        cache.ttl = 300
+        for key in 'abc':
+            cache.put(key, key)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual((cache.get('b'), cache.get('c')), ('b', 'c'))
+        metrics = cache.metrics()
+        self.assertEqual((metrics['expirations'], metrics['evictions'], metrics['size']), (1, 1, 2))
+
+    @override_settings(ML_PREDICTION_CACHE_SIZE=16, ML_MICROBATCH_ENABLED=False, ML_EXECUTOR_BACKEND='inline')
+    def test_run_prediction_serves_snapped_results_until_a_reload(self):
+        from ml_models import executor, prediction_cache
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        for filename in os.listdir(self.model_dir):
+            shutil.copy(os.path.join(self.model_dir, filename), tmp.name)
+        predictor = StudentPerformancePredictor(mode='flat', model_dir=tmp.name)
+        cache = PredictionCache(maxsize=16, quantize={'attendance_rate': 5})
+        predictor.reload_callbacks.append(cache.on_reload)
+        record = sample_records(1)[0]
+
+        with mock.patch('ml_models.predictor.predictor', predictor), \
+                mock.patch.object(prediction_cache, '_cache', cache), \
+                mock.patch.object(executor, '_executor', executor.InferenceExecutor(backend='inline')):
+            first = executor.run_prediction(dict(record, attendance_rate=81))
+            # A miss scores the snapped value, so both inputs get one result
+            self.assertEqual(first['prediction'], predictor.predict(dict(record, attendance_rate=80)))
+            self.assertEqual(executor.run_prediction(dict(record, attendance_rate=79)), first)
+            self.assertEqual(cache.hits, 1)
+
+            manifest = train_artifacts(tmp.name, seed=1)
+            self.assertTrue(predictor.reload())
+            self.assertEqual(cache.metrics()['size'], 0)
+            second = executor.run_prediction(dict(record, attendance_rate=81))
+            self.assertEqual(second['prediction']['model_version'], manifest['version'])
+            self.assertEqual(cache.hits, 1)
+
+
+class FeatureStoreTests(ModelDirTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'features.store')
+        self.predictor = self.make_predictor()
+        loaded = self.predictor.active
+        self.store = FeatureStore.create(self.path, loaded.version, loaded.feature_columns, capacity=4)
+
+    def test_rows_and_missing_pks(self):
+        X = encode_rows(self.predictor.active.pipeline, sample_records(3))
+        self.store.write([1, 3, 2], X)
+        self.store.remove([2, 99])
+        rows, missing = self.store.rows([3, 0, 1, 2, 1000, -1])
+        self.assertEqual(missing, [1, 3, 4, 5])
+        np.testing.assert_array_equal(rows[[0, 2]], X[[1, 0]])
+        self.assertTrue(np.isnan(rows[missing]).all())
+
+    def test_writes_past_the_end_grow_the_file(self):
+        X = encode_rows(self.predictor.active.pipeline, sample_records(2))
+        reader = FeatureStore(self.path).open()
+        self.store.write([2, 9], X)
+        self.assertEqual(self.store.capacity, 16)
+        # Another handle remaps the grown file on its next read
+        rows, missing = reader.rows([2, 9, 10])
+        self.assertEqual((reader.capacity, missing), (16, [2]))
+        np.testing.assert_array_equal(rows[:2], X)
+
+    def test_stored_rows_score_like_raw_profiles(self):
+        records = sample_records(50)
+        self.store.write(range(1, 51), encode_rows(self.predictor.active.pipeline, records))
+        self.assertTrue(self.store.is_current(self.predictor.active))
+        stored = self.predictor.predict_stored(list(range(1, 51)), self.store)
+        self.assertEqual(stored, self.predictor.predict_batch(records))
+
+        stale = FeatureStore.create(self.path, 'another-version', self.predictor.active.feature_columns)
+        self.assertFalse(stale.is_current(self.predictor.active))
+        self.assertIn('another-version', self.predictor.predict_stored([1], stale)['errors'][0])
+
+
+class CompactModelTests(SimpleTestCase):
+    def test_distilled_bundle_tracks_the_full_model(self):
+        df, label_encoders = sample_frame()
+        scaler = StandardScaler().fit(df[FEATURE_COLUMNS])
+        X, y = scaler.transform(df[FEATURE_COLUMNS]), df['math_score']
+        model = RandomForestRegressor(n_estimators=10, random_state=0, n_jobs=1).fit(X[:800], y[:800])
+
+        with tempfile.TemporaryDirectory() as model_dir:
+            with mock.patch.object(train_model, 'MODEL_DIR', model_dir), contextlib.redirect_stdout(io.StringIO()):
+                manifest = train_model.save_artifacts(model, scaler, label_encoders, list(FEATURE_COLUMNS), {})
+                report = train_model.distill_compact_model(
+                    model, scaler, label_encoders, list(FEATURE_COLUMNS), X[:800], X[800:], y[800:],
+                    n_estimators=10, max_depth=8, transfer_size=2000, teacher_version=manifest['version'],
+                )
+            self.assertGreater(report['fidelity_r2'], 0.9)
+            self.assertLess(report['node_count'], report['full_node_count'])
+            self.assertEqual(report['teacher_version'], manifest['version'])
+
+            full = StudentPerformancePredictor(mode='flat', model_dir=model_dir)
+            compact = StudentPerformancePredictor(mode='flat', model_dir=model_dir, variant='compact')
+            self.assertEqual(compact.active.source, os.path.join(model_dir, COMPACT_BUNDLE_FILENAME))
+            self.assertNotEqual(compact.model_version, full.model_version)
+            records = sample_records()[800:]
+            full_grades = full.predict_batch(records)['predictions']
+            compact_grades = compact.predict_batch(records)['predictions']
+        # Grades are rounded to two decimals, so allow that on top of the distillation error
+        self.assertLessEqual(
+            max(abs(a - b) for a, b in zip(full_grades, compact_grades)), report['fidelity_max_abs'] + 0.01,
+        )
@@ -5,7 +5,26 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.metrics import mean_squared_error, r2_score
 import joblib
+import argparse
+import itertools
+from collections import Counter
 import os
+import resource
+import sys
+import time
+
+# Allow running as a script (python ml_models/train_model.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_models.bundle import BUNDLE_FILENAME, COMPACT_BUNDLE_FILENAME, content_version, write_bundle
+from ml_models.feature_pipeline import FeaturePipeline
+from ml_models.confidence import ConfidenceEngine
+from ml_models.forest_engine import FlatForest
+
+CATEGORICAL_COLUMNS = ['gender', 'race_ethnicity', 'parental_level_of_education', 'lunch', 'test_preparation_course']
+NUMERIC_COLUMNS = ['study_hours_per_week', 'attendance_rate', 'previous_grade']
+FEATURE_COLUMNS = [col + '_encoded' for col in CATEGORICAL_COLUMNS] + NUMERIC_COLUMNS
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
 
 def create_sample_data():
     """Create sample student performance data"""
@@ -40,8 +59,12 @@ def create_sample_data():
     
     return df
 
-def train_student_performance_model():
-    """Train and save the student performance prediction model"""
+def train_student_performance_model(compact=None):
+    """Train and save the student performance prediction model
+
+    ``compact`` is an optional dict of distill_compact_model() options;
+    when given, the compact variant is distilled from the new model too.
+    """
     
     # Create or load your dataset
     df = create_sample_data()  # Replace with your actual dataset loading
@@ -78,7 +101,7 @@ def train_student_performance_model():
     X_test_scaled = scaler.transform(X_test)
     
     # Train the model
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
     model.fit(X_train_scaled, y_train)
     
     # Evaluate the model
@@ -90,17 +113,273 @@ def train_student_performance_model():
     print(f"MSE: {mse:.2f}")
     print(f"R² Score: {r2:.2f}")
     
-    # Save the model and preprocessors
-    model_dir = os.path.dirname(os.path.abspath(__file__))
+    manifest = save_artifacts(model, scaler, le_dict, feature_columns, {'mse': round(mse, 4), 'r2': round(r2, 4), 'n_train': len(X_train)})
+    if compact is not None:
+        distill_compact_model(
+            model, scaler, le_dict, feature_columns, X_train_scaled, X_test_scaled, y_test.to_numpy(),
+            teacher_version=manifest['version'], **compact
+        )
+    
+    return model, scaler, le_dict, feature_columns
+
+def save_artifacts(model, scaler, le_dict, feature_columns, metadata):
+    """Save the model and preprocessors as pickles and as a serving bundle"""
+    # Trained on every core, served one request at a time: n_jobs=-1 would
+    # send each sklearn-mode prediction through joblib and make the order
+    # the trees are summed in vary between calls
+    model.set_params(n_jobs=1)
+    forest = FlatForest.from_sklearn(model)
+    pipeline = FeaturePipeline.from_preprocessors(le_dict, scaler, feature_columns)
+    # Carried inside the pickle, so sklearn mode reports the bundle's version
+    model.model_version_ = content_version(forest, pipeline)
+    joblib.dump(model, os.path.join(MODEL_DIR, 'student_performance_model.pkl'))
+    joblib.dump(scaler, os.path.join(MODEL_DIR, 'scaler.pkl'))
+    joblib.dump(le_dict, os.path.join(MODEL_DIR, 'label_encoders.pkl'))
+    joblib.dump(feature_columns, os.path.join(MODEL_DIR, 'feature_columns.pkl'))
     
-    joblib.dump(model, os.path.join(model_dir, 'student_performance_model.pkl'))
-    joblib.dump(scaler, os.path.join(model_dir, 'scaler.pkl'))
-    joblib.dump(le_dict, os.path.join(model_dir, 'label_encoders.pkl'))
-    joblib.dump(feature_columns, os.path.join(model_dir, 'feature_columns.pkl'))
+    # Single memory-mappable bundle shared by all serving workers
+    manifest = write_bundle(
+        os.path.join(MODEL_DIR, BUNDLE_FILENAME), forest, pipeline,
+        version=model.model_version_, metadata=metadata,
+    )
+    print(f"Model bundle version {manifest['version']} written to {BUNDLE_FILENAME}")
     
     print("Model and preprocessors saved successfully!")
+    return manifest
+
+def single_row_ms(engine, X, samples=200):
+    """Median latency of scoring one row at a time, in milliseconds"""
+    timings = []
+    for i in range(samples):
+        row = X[i % len(X):i % len(X) + 1]
+        start = time.perf_counter()
+        engine.evaluate(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+def distill_compact_model(model, scaler, le_dict, feature_columns, X_train, X_test, y_test,
+                          n_estimators=20, max_depth=10, transfer_size=20000, teacher_version=None):
+    """Distill a small float32 forest from the full model and write it as the compact bundle
+
+    The student forest is fitted to the full model's predictions (not the
+    raw targets) on the training rows plus ``transfer_size`` synthetic rows
+    whose columns are drawn independently from the training rows, so it
+    learns the full model's response surface beyond the observed feature
+    combinations. Fidelity to the full model is reported on the test rows.
+    """
+    teacher = FlatForest.from_sklearn(model)
+    X_train = np.asarray(X_train, dtype=np.float64)
+    rng = np.random.default_rng(42)
+    synthetic = np.empty((transfer_size, X_train.shape[1]), dtype=np.float64)
+    for j in range(X_train.shape[1]):
+        synthetic[:, j] = rng.choice(X_train[:, j], transfer_size)
+    X_transfer = np.concatenate((X_train, synthetic))
     
-    return model, scaler, le_dict, feature_columns
+    student = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth, random_state=42, n_jobs=-1)
+    student.fit(X_transfer, teacher.predict(X_transfer))
+    compact = FlatForest.from_sklearn(student).compact()
+    
+    X_test = np.ascontiguousarray(X_test, dtype=np.float64)
+    full_pred = teacher.predict(X_test)
+    compact_pred = compact.predict(X_test).astype(np.float64)
+    report = {
+        'variant': 'compact',
+        'teacher_version': teacher_version,
+        'n_trees': compact.n_trees,
+        'max_depth': compact.max_depth,
+        'node_count': compact.node_count,
+        'full_node_count': teacher.node_count,
+        'kib': round(compact.nbytes / 1024, 1),
+        'full_kib': round(teacher.nbytes / 1024, 1),
+        'fidelity_mae': round(float(np.abs(compact_pred - full_pred).mean()), 4),
+        'fidelity_max_abs': round(float(np.abs(compact_pred - full_pred).max()), 4),
+        'fidelity_r2': round(float(r2_score(full_pred, compact_pred)), 4),
+        'mse': round(float(mean_squared_error(y_test, compact_pred)), 4),
+        'full_mse': round(float(mean_squared_error(y_test, full_pred)), 4),
+        'single_row_ms': round(single_row_ms(ConfidenceEngine(compact), X_test), 3),
+        'full_single_row_ms': round(single_row_ms(ConfidenceEngine(teacher), X_test), 3),
+    }
+    
+    print("Compact model (vs full model on the test rows):")
+    for key, value in report.items():
+        print(f"  {key}: {value}")
+    
+    manifest = write_bundle(
+        os.path.join(MODEL_DIR, COMPACT_BUNDLE_FILENAME),
+        compact,
+        FeaturePipeline.from_preprocessors(le_dict, scaler, feature_columns),
+        metadata=report,
+    )
+    print(f"Compact bundle version {manifest['version']} written to {COMPACT_BUNDLE_FILENAME}")
+    return report
+
+def fixed_label_encoders():
+    """LabelEncoders fitted on every category the profile form allows
+
+    Fitting on the full choice lists rather than on whatever a training
+    chunk happens to contain keeps the codes stable between runs.
+    """
+    from student_app.models import PerformanceProfile
+    le_dict = {}
+    for col in CATEGORICAL_COLUMNS:
+        le = LabelEncoder()
+        le.fit([value for value, _ in PerformanceProfile._meta.get_field(col).choices])
+        le_dict[col] = le
+    return le_dict
+
+def load_training_data_from_db(le_dict, chunk_size=5000, since=None):
+    """Stream profiles and marks from the database into one preallocated matrix
+
+    Rows are read in student pk order with iterator(chunk_size) and encoded
+    chunk by chunk straight into X (float64, FEATURE_COLUMNS order) and y,
+    so no DataFrame or per-column copies are built. With ``since``, only
+    profiles updated on or after that date are read.
+
+    Rows with a category the encoders don't know are skipped. Returns
+    (X, y, skipped), skipped counting the rejected (column, value) pairs.
+    """
+    from student_app.models import Student
+    students = Student.objects.filter(performance_profile__isnull=False)
+    if since is not None:
+        students = students.filter(performance_profile__updated_at__date__gte=since)
+    fields = [f'performance_profile__{col}' for col in CATEGORICAL_COLUMNS + NUMERIC_COLUMNS] + ['marks']
+    
+    n_rows = students.count()
+    X = np.empty((n_rows, len(FEATURE_COLUMNS)), dtype=np.float64)
+    y = np.empty(n_rows, dtype=np.float64)
+    lookups = [
+        {category: code for code, category in enumerate(le_dict[col].classes_.tolist())}
+        for col in CATEGORICAL_COLUMNS
+    ]
+    
+    rows = students.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size)
+    skipped = Counter()
+    read = start = 0
+    while read < n_rows:
+        chunk = list(itertools.islice(rows, min(chunk_size, n_rows - read)))
+        if not chunk:
+            break
+        read += len(chunk)
+        unknown = [
+            (col, row[j]) for row in chunk
+            for j, (col, lookup) in enumerate(zip(CATEGORICAL_COLUMNS, lookups)) if row[j] not in lookup
+        ]
+        if unknown:
+            skipped.update(unknown)
+            chunk = [row for row in chunk if all(row[j] in lookup for j, lookup in enumerate(lookups))]
+            if not chunk:
+                continue
+        stop = start + len(chunk)
+        columns = list(zip(*chunk))
+        for j, lookup in enumerate(lookups):
+            X[start:stop, j] = [lookup[value] for value in columns[j]]
+        for j in range(len(CATEGORICAL_COLUMNS), len(FEATURE_COLUMNS)):
+            X[start:stop, j] = columns[j]
+        y[start:stop] = [float(mark) for mark in columns[-1]]
+        start = stop
+    rows.close()
+    if skipped:
+        print("Skipped profiles with unknown categories: " + ", ".join(
+            f"{col}={value!r} ({count})" for (col, value), count in skipped.most_common()
+        ))
+    # Rows added or removed since count() was taken are left for the next run
+    return X[:start], y[:start], skipped
+
+def train_from_database(chunk_size=5000, add_trees=0, since=None, test_fraction=0.2, compact=None):
+    """Train on historical profiles and marks in the database using every core
+
+    With ``add_trees``, the saved model is extended with that many new
+    trees fitted on the selected rows (warm start), keeping its existing
+    trees, scaler and encoders. Otherwise a new model is fitted from
+    scratch. The most recent ``test_fraction`` of rows (by pk) is held out
+    for evaluation. Returns the run report.
+    """
+    started = time.perf_counter()
+    
+    if add_trees:
+        model = joblib.load(os.path.join(MODEL_DIR, 'student_performance_model.pkl'))
+        scaler = joblib.load(os.path.join(MODEL_DIR, 'scaler.pkl'))
+        le_dict = joblib.load(os.path.join(MODEL_DIR, 'label_encoders.pkl'))
+        feature_columns = joblib.load(os.path.join(MODEL_DIR, 'feature_columns.pkl'))
+        if feature_columns != FEATURE_COLUMNS:
+            raise ValueError(f"Saved model uses features {feature_columns}, expected {FEATURE_COLUMNS}")
+    else:
+        model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
+        scaler = StandardScaler()
+        le_dict = fixed_label_encoders()
+        feature_columns = FEATURE_COLUMNS
+    
+    X, y, skipped = load_training_data_from_db(le_dict, chunk_size=chunk_size, since=since)
+    loaded_at = time.perf_counter()
+    n_test = int(len(X) * test_fraction)
+    n_train = len(X) - n_test
+    if n_train < 2:
+        raise ValueError(f"Not enough training rows in the database ({len(X)})")
+    
+    # Views, not copies: train on the older rows, evaluate on the newest
+    X_train, X_test = X[:n_train], X[n_train:]
+    y_train, y_test = y[:n_train], y[n_train:]
+    
+    if not add_trees:
+        scaler.fit(X_train)
+    scaler.transform(X, copy=False)
+    
+    if add_trees:
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + add_trees, n_jobs=-1)
+    model.fit(X_train, y_train)
+    model.set_params(warm_start=False)
+    fitted_at = time.perf_counter()
+    
+    report = {
+        'mode': 'warm_start' if add_trees else 'full',
+        'n_train': n_train,
+        'n_test': n_test,
+        'n_trees': len(model.estimators_),
+        'skipped_unknown_categories': sum(skipped.values()),
+        'load_seconds': round(loaded_at - started, 2),
+        'fit_seconds': round(fitted_at - loaded_at, 2),
+        'wall_seconds': round(fitted_at - started, 2),
+        # ru_maxrss is reported in KiB on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if n_test:
+        y_pred = model.predict(X_test)
+        report['mse'] = round(float(mean_squared_error(y_test, y_pred)), 4)
+        report['r2'] = round(float(r2_score(y_test, y_pred)), 4)
+    
+    print("Training run:")
+    for key, value in report.items():
+        print(f"  {key}: {value}")
+    
+    manifest = save_artifacts(model, scaler, le_dict, feature_columns, report)
+    if compact is not None:
+        if not n_test:
+            raise ValueError("Distilling a compact model needs test rows to measure fidelity")
+        report['compact'] = distill_compact_model(
+            model, scaler, le_dict, feature_columns, X_train, X_test, y_test,
+            teacher_version=manifest['version'], **compact
+        )
+    return report
 
 if __name__ == "__main__":
-    train_student_performance_model()
+    parser = argparse.ArgumentParser(description="Train the student performance model")
+    parser.add_argument('--source', choices=['sample', 'db'], default='sample',
+                        help="synthetic sample data (default) or profiles and marks from the database")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="rows fetched per database round trip")
+    parser.add_argument('--add-trees', type=int, default=0,
+                        help="warm start: add this many trees to the saved model instead of refitting")
+    parser.add_argument('--since', help="only train on profiles updated on or after this date (YYYY-MM-DD)")
+    parser.add_argument('--compact', action='store_true',
+                        help=f"also distill a small float32 forest into {COMPACT_BUNDLE_FILENAME}")
+    parser.add_argument('--compact-trees', type=int, default=20)
+    parser.add_argument('--compact-depth', type=int, default=10)
+    args = parser.parse_args()
+    compact = {'n_estimators': args.compact_trees, 'max_depth': args.compact_depth} if args.compact else None
+    
+    if args.source == 'db':
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'student_result_management.settings')
+        import django
+        django.setup()
+        train_from_database(chunk_size=args.chunk_size, add_trees=args.add_trees, since=args.since, compact=compact)
+    else:
+        train_student_performance_model(compact=compact)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Student, Teacher
+from .models import PerformanceProfile, ScoringCheckpoint, Student, StudentPrediction, Teacher
 
 
 @admin.register(Student)
@@ -48,3 +48,27 @@ class TeacherAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(PerformanceProfile)
+class PerformanceProfileAdmin(admin.ModelAdmin):
+    """Admin configuration for PerformanceProfile model"""
+    list_display = ['student', 'study_hours_per_week', 'attendance_rate', 'previous_grade', 'test_preparation_course', 'updated_at']
+    list_filter = ['test_preparation_course', 'lunch', 'gender']
+    search_fields = ['student__name', 'student__roll_number']
+    raw_id_fields = ['student']
+
+
+@admin.register(StudentPrediction)
+class StudentPredictionAdmin(admin.ModelAdmin):
+    """Admin configuration for StudentPrediction model"""
+    list_display = ['student', 'predicted_grade', 'confidence', 'model_version', 'scored_at']
+    list_filter = ['model_version']
+    search_fields = ['student__name', 'student__roll_number']
+    raw_id_fields = ['student']
+
+
+@admin.register(ScoringCheckpoint)
+class ScoringCheckpointAdmin(admin.ModelAdmin):
+    """Admin configuration for ScoringCheckpoint model"""
+    list_display = ['name', 'last_pk', 'scored', 'model_version', 'started_at', 'finished_at']
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StudentAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'student_app'
+
+    def ready(self):
+        from student_app import signals  # noqa: F401
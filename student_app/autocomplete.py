@@ -0,0 +1,238 @@
+import logging
+import random
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+# Fields returned for each match, served from memory
+RECORD_FIELDS = ('name', 'roll_number', 'email', 'course', 'grade')
+
+# Every change bumps a shared generation counter and is logged under its
+# generation, so a worker that fell behind reloads just the changed students
+GENERATION_KEY = 'student_autocomplete:generation'
+CHANGE_KEY = 'student_autocomplete:change:%d'
+CHANGE_TTL = 3600
+MAX_CATCH_UP = 500
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse whitespace"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.lower().split())
+
+
+def record_keys(record):
+    """Lookup keys of a student: roll number, email and each tail of the name
+
+    Indexing every tail ("sita thapa", "thapa") lets "tha" find surnames and
+    "sita th" find the full name.
+    """
+    words = normalize(record['name']).split()
+    keys = {' '.join(words[i:]) for i in range(len(words))}
+    keys.add(normalize(record['roll_number']))
+    keys.add(normalize(record['email']))
+    keys.discard('')
+    return keys
+
+
+def _cache():
+    return caches[getattr(settings, 'STUDENT_AUTOCOMPLETE_CACHE', 'default')]
+
+
+def enabled():
+    """Whether the index can be used: its change log must reach every process serving requests
+
+    A per-process cache would leave each worker blind to the others'
+    changes, so unless STUDENT_AUTOCOMPLETE_SINGLE_PROCESS says one process
+    serves everything, type-ahead then queries the database instead.
+    """
+    cache = _cache()
+    if isinstance(cache, DummyCache):
+        return False
+    return getattr(settings, 'STUDENT_AUTOCOMPLETE_SINGLE_PROCESS', False) or not isinstance(cache, LocMemCache)
+
+
+def current_generation(cache):
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # A random start means a counter lost with the cache never matches a
+        # worker's old generation, so every worker rebuilds
+        cache.add(GENERATION_KEY, random.getrandbits(48), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def record_change(student_pk):
+    """Bump the shared generation for a changed student and return the new generation"""
+    cache = _cache()
+    try:
+        generation = cache.incr(GENERATION_KEY)
+    except ValueError:
+        current_generation(cache)
+        generation = cache.incr(GENERATION_KEY)
+    cache.set(CHANGE_KEY % generation, student_pk, CHANGE_TTL)
+    return generation
+
+
+class AutocompleteIndex:
+    """Sorted in-memory prefix index over student names, roll numbers and emails
+
+    ``keys`` is sorted and ``pks`` runs parallel to it (sorted by pk within
+    equal keys). A prefix lookup is one bisect followed by a scan of the
+    matching run, so the first matches in key order (an exact match, then
+    the shortest completions) come back without touching the database.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.pks = []
+        self.records = {}
+        self.generation = None
+        self._lock = threading.Lock()
+
+    @property
+    def built(self):
+        return self.generation is not None
+
+    def search(self, text, limit=10):
+        """Students whose name, roll number or email starts with ``text``, as dicts"""
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        self.refresh()
+        matches = []
+        seen = set()
+        with self._lock:
+            i = bisect_left(self.keys, prefix)
+            while i < len(self.keys) and len(matches) < limit and self.keys[i].startswith(prefix):
+                pk = self.pks[i]
+                if pk not in seen:
+                    seen.add(pk)
+                    matches.append({'id': pk, **self.records[pk]})
+                i += 1
+        return matches
+
+    # ---- Keeping up to date ----
+
+    def refresh(self):
+        """Build the index on first use, or catch up with changes made by other workers"""
+        cache = _cache()
+        generation = current_generation(cache)
+        if generation == self.generation:
+            return
+        with self._lock:
+            if generation == self.generation:
+                return
+            behind = generation - self.generation if self.built else 0
+            changed = None
+            if 0 < behind <= MAX_CATCH_UP:
+                logged = cache.get_many([CHANGE_KEY % g for g in range(self.generation + 1, generation + 1)])
+                if len(logged) == behind:
+                    changed = set(logged.values())
+            if changed is None:
+                self._build()
+            else:
+                self._reload(changed)
+            # Changes committed while reading are replayed on the next refresh
+            self.generation = generation
+
+    def apply(self, student_pk, record, generation):
+        """Apply a change made in this process; ``record`` is None for a deleted student"""
+        with self._lock:
+            if not self.built:
+                return
+            self._remove(student_pk)
+            if record is not None:
+                self._insert(student_pk, record)
+            if generation == self.generation + 1:
+                self.generation = generation
+
+    def _build(self):
+        from student_app.models import Student
+        entries = []
+        records = {}
+        for pk, *values in Student.objects.values_list('pk', *RECORD_FIELDS).iterator(chunk_size=5000):
+            record = dict(zip(RECORD_FIELDS, values))
+            records[pk] = record
+            entries.extend((key, pk) for key in record_keys(record))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.pks = [pk for _, pk in entries]
+        self.records = records
+
+    def _reload(self, student_pks):
+        from student_app.models import Student
+        current = {
+            pk: dict(zip(RECORD_FIELDS, values))
+            for pk, *values in Student.objects.filter(pk__in=student_pks).values_list('pk', *RECORD_FIELDS)
+        }
+        for pk in student_pks:
+            self._remove(pk)
+            if pk in current:
+                self._insert(pk, current[pk])
+
+    def _insert(self, pk, record):
+        self.records[pk] = record
+        for key in record_keys(record):
+            lo = bisect_left(self.keys, key)
+            hi = bisect_right(self.keys, key, lo)
+            i = bisect_left(self.pks, pk, lo, hi)
+            self.keys.insert(i, key)
+            self.pks.insert(i, pk)
+
+    def _remove(self, pk):
+        record = self.records.pop(pk, None)
+        if record is None:
+            return
+        for key in record_keys(record):
+            lo = bisect_left(self.keys, key)
+            hi = bisect_right(self.keys, key, lo)
+            i = bisect_left(self.pks, pk, lo, hi)
+            if i < hi and self.pks[i] == pk:
+                del self.keys[i]
+                del self.pks[i]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Process-wide AutocompleteIndex (built by preload_index() or on its first search)"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = AutocompleteIndex()
+    return _index
+
+
+def _build_index():
+    try:
+        get_index().refresh()
+    except Exception:
+        logger.exception("Could not build the student autocomplete index")
+
+
+def preload_index():
+    """Build this process's index in the background; called from the WSGI/ASGI entry points"""
+    if not enabled():
+        return None
+    thread = threading.Thread(target=_build_index, name='student-autocomplete-loader', daemon=True)
+    thread.start()
+    return thread
+
+
+def student_changed(student_pk, record):
+    """Publish a saved (``record`` given) or deleted student to every worker's index"""
+    if not enabled():
+        return
+    generation = record_change(student_pk)
+    get_index().apply(student_pk, record, generation)
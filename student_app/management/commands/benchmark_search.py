@@ -0,0 +1,158 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from student_app.search import SEARCH_INDEXES, fts_table, index_sql, match_expression
+
+TABLE = 'student_app_student'
+COLUMNS = SEARCH_INDEXES[TABLE]
+FIRST_NAMES = [
+    'Aarav', 'Anjali', 'Bikash', 'Deepa', 'Gita', 'Hari', 'Kiran', 'Manish', 'Nisha', 'Prakash',
+    'Rajesh', 'Ramesh', 'Sabina', 'Sanjay', 'Sita', 'Suman', 'Sunita', 'Tara', 'Ujjwal', 'Yamuna',
+]
+LAST_NAMES = [
+    'Adhikari', 'Basnet', 'Bhandari', 'Gurung', 'Karki', 'Khadka', 'Lama', 'Magar', 'Poudel', 'Rai',
+    'Shahi', 'Sharma', 'Shrestha', 'Tamang', 'Thapa',
+]
+COURSES = ['Computer Science', 'Business Studies', 'Civil Engineering', 'Mathematics', 'Physics', 'English']
+RARE_NAME = 'Zenobia Quill'
+
+# (label, text typed into the search box)
+TERMS = [
+    ('common name', 'sha'),
+    ('full name', 'sita thapa'),
+    ('course word', 'computer'),
+    ('roll number', 'R0001234'),
+    ('rare name', 'zenob'),
+]
+
+
+def synthetic_rows(n, seed=0):
+    rng = random.Random(seed)
+    rare = {rng.randrange(n) for _ in range(5)}
+    for i in range(n):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        name = RARE_NAME if i in rare else f'{first} {last}'
+        yield (
+            i + 1, name, f'R{i + 1:07d}', f'{first.lower()}.{last.lower()}{i}@example.edu', rng.choice(COURSES),
+        )
+
+
+def like_condition(columns):
+    # What Q(col__icontains=...) | ... compiles to on SQLite
+    return ' OR '.join(f"{column} LIKE ? ESCAPE '\\'" for column in columns)
+
+
+def timed(query, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = query()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), rows
+
+
+def fts_top(db, fts, match, rank_limit, limit=10):
+    # The queries ranked_search() runs
+    query = f'SELECT rowid FROM {fts} WHERE {fts} MATCH ?'
+    ids = [row[0] for row in db.execute(f'{query} LIMIT ?', [match, rank_limit + 1])]
+    if len(ids) <= rank_limit:
+        ids = [row[0] for row in db.execute(f'{query} ORDER BY rank LIMIT ?', [match, limit])]
+    ids = ids[:limit]
+    return db.execute(f'SELECT * FROM {TABLE} WHERE id IN ({", ".join("?" * len(ids))})', ids).fetchall()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the FTS5 student search against the icontains queries on synthetic tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[100_000, 1_000_000],
+            help='Table sizes to benchmark (default 100000 1000000)',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Runs per query; the median is reported (default 5)',
+        )
+
+    def handle(self, *args, **options):
+        if not sqlite3.connect(':memory:').execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0]:
+            raise CommandError('This SQLite build has no FTS5')
+        with tempfile.TemporaryDirectory() as tmp:
+            for n in options['rows']:
+                self.benchmark(os.path.join(tmp, f'search_{n}.sqlite3'), n, options['repeat'])
+
+    def benchmark(self, path, n, repeat):
+        cols = ', '.join(COLUMNS)
+        create = (
+            f'CREATE TABLE {TABLE} (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, '
+            f'roll_number TEXT UNIQUE, email TEXT UNIQUE, course TEXT)'
+        )
+        insert = f'INSERT INTO {TABLE} (id, {cols}) VALUES (?, ?, ?, ?, ?)'
+        statements = index_sql(TABLE, COLUMNS)
+
+        # The same rows inserted through the sync triggers, into a second database
+        indexed = sqlite3.connect(f'{path}.indexed')
+        indexed.execute(create)
+        for sql in statements[:-1]:
+            indexed.execute(sql)
+        start = time.perf_counter()
+        indexed.executemany(insert, synthetic_rows(n))
+        indexed.commit()
+        indexed_insert = time.perf_counter() - start
+        indexed.close()
+        os.remove(f'{path}.indexed')
+
+        db = sqlite3.connect(path)
+        db.execute(create)
+        start = time.perf_counter()
+        db.executemany(insert, synthetic_rows(n))
+        db.commit()
+        plain_insert = time.perf_counter() - start
+        plain_mib = os.path.getsize(path) / 2**20
+
+        # What the migration does: create the index over the existing rows
+        start = time.perf_counter()
+        for sql in statements:
+            db.execute(sql)
+        db.commit()
+        build = time.perf_counter() - start
+        index_mib = os.path.getsize(path) / 2**20 - plain_mib
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{n:,} students'))
+        self.stdout.write(
+            f'  index build {build:.2f}s, {index_mib:.0f} MiB on a {plain_mib:.0f} MiB table; '
+            f'bulk insert {plain_insert:.2f}s without the index, {indexed_insert:.2f}s with the triggers'
+        )
+        self.stdout.write(f'  {"query":<13}{"rows":>15}  {"count (ms)":>20}  {"top 10 (ms)":>20}')
+        self.stdout.write(f'  {"":<13}{"":>15}  {"icontains":>10}{"fts5":>10}  {"icontains":>10}{"fts5":>10}')
+
+        fts = fts_table(TABLE)
+        like = like_condition(COLUMNS)
+        rank_limit = getattr(settings, 'SEARCH_RANK_LIMIT', 1000)
+        for label, text in TERMS:
+            pattern = ['%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'] * len(COLUMNS)
+            match = match_expression(text, COLUMNS)
+            like_count, [(like_rows,)] = timed(
+                lambda: db.execute(f'SELECT COUNT(*) FROM {TABLE} WHERE {like}', pattern).fetchall(), repeat,
+            )
+            fts_count, [(fts_rows,)] = timed(
+                lambda: db.execute(f'SELECT COUNT(*) FROM {fts} WHERE {fts} MATCH ?', [match]).fetchall(), repeat,
+            )
+            # The search APIs: first 10 in the model ordering vs the best 10 by rank
+            like_top, _ = timed(
+                lambda: db.execute(
+                    f'SELECT * FROM {TABLE} WHERE {like} ORDER BY roll_number LIMIT 10', pattern,
+                ).fetchall(), repeat,
+            )
+            fts_top_ms, _ = timed(lambda: fts_top(db, fts, match, rank_limit), repeat)
+            # icontains matches substrings, FTS5 only word prefixes
+            rows = f'{fts_rows:,}' if like_rows == fts_rows else f'{like_rows:,}/{fts_rows:,}'
+            self.stdout.write(
+                f'  {label:<13}{rows:>15}  {like_count:>10.1f}{fts_count:>10.1f}  {like_top:>10.1f}{fts_top_ms:>10.1f}'
+            )
+        db.close()
@@ -0,0 +1,94 @@
+import itertools
+import os
+import time
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.utils import timezone
+from student_app.models import PerformanceProfile, Student
+from ml_models.feature_store import FeatureStore, encode_rows, get_store
+
+
+class Command(BaseCommand):
+    help = "Build the feature store of every student's encoded profile, or bring it up to date"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Profiles read and encoded per batch (default 5000)',
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only re-encode profiles changed since the last sync and drop deleted ones '
+                 '(the store is rebuilt if it belongs to another model version)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        store = get_store()
+        if store is None:
+            raise CommandError('ML_FEATURE_STORE_PATH is not set')
+
+        from ml_models.predictor import predictor
+        if not predictor.ensure_loaded():
+            raise CommandError(predictor.unavailable_reason())
+        loaded = predictor.active
+
+        started_at = timezone.now()
+        started = time.perf_counter()
+        if options['incremental'] and store.is_current(loaded) and store.manifest['synced_at']:
+            since = store.manifest['synced_at']
+            self.stdout.write(f'Updating profiles changed since {since}')
+            profiles = PerformanceProfile.objects.filter(updated_at__gte=since)
+            written = self.encode_into(store, loaded, profiles, chunk_size)
+            removed = self.drop_deleted(store)
+        else:
+            # Build next to the live file and swap it in, so readers never see a partial store
+            building = FeatureStore.create(
+                f'{store.path}.building', loaded.version, loaded.feature_columns,
+                capacity=(Student.objects.aggregate(top=Max('pk'))['top'] or 0) + 1,
+            )
+            self.stdout.write(f'Building the feature store for model {loaded.version}')
+            written = self.encode_into(building, loaded, PerformanceProfile.objects.all(), chunk_size)
+            os.replace(building.path, store.path)
+            removed = 0
+
+        # Profiles saved while this ran are picked up by the signal or the next --incremental
+        store.open().mark_synced(started_at)
+        self.stdout.write(self.style.SUCCESS(
+            f'Encoded {written} profiles and dropped {removed} in {time.perf_counter() - started:.1f}s '
+            f'({store.capacity} rows, model {store.model_version})'
+        ))
+
+    def encode_into(self, store, loaded, profiles, chunk_size):
+        """Stream profiles in student pk order and write their encoded rows to the store"""
+        rows = (
+            profiles
+            .order_by('student_id')
+            .values_list('student_id', *PerformanceProfile.FEATURE_FIELDS)
+            .iterator(chunk_size=chunk_size)
+        )
+        written = 0
+        try:
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    return written
+                pks = [row[0] for row in chunk]
+                records = [dict(zip(PerformanceProfile.FEATURE_FIELDS, row[1:])) for row in chunk]
+                store.write(pks, encode_rows(loaded.pipeline, records))
+                written += len(pks)
+        finally:
+            rows.close()
+
+    def drop_deleted(self, store):
+        """Clear stored rows whose student no longer has a profile"""
+        stored = np.flatnonzero(~np.isnan(store.load_matrix()[:, 0]))
+        current = np.fromiter(
+            PerformanceProfile.objects.values_list('student_id', flat=True).iterator(), dtype=np.int64,
+        )
+        deleted = np.setdiff1d(stored, current, assume_unique=True)
+        store.remove(deleted)
+        return len(deleted)
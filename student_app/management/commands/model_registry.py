@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from ml_models.registry import RegistryError, get_registry
+
+
+class Command(BaseCommand):
+    help = 'List, add, remove or promote shadow model versions'
+
+    def add_arguments(self, parser):
+        actions = parser.add_subparsers(dest='action', required=True)
+        actions.add_parser('list', help='Show the primary model directory and the registered shadows')
+        add = actions.add_parser('add-shadow', help='Score live traffic with another model version in the background')
+        add.add_argument('name')
+        add.add_argument('path', help='A model bundle file or a directory of model artifacts')
+        remove = actions.add_parser('remove-shadow', help='Stop shadow scoring with a version')
+        remove.add_argument('name')
+        promote = actions.add_parser('promote', help="Replace the primary model with a shadow's artifacts and reload")
+        promote.add_argument('name')
+
+    def handle(self, *args, **options):
+        registry = get_registry()
+        if registry is None:
+            raise CommandError('ML_MODEL_REGISTRY_PATH is not set')
+
+        action = options['action']
+        try:
+            if action == 'list':
+                state = registry.describe()
+                self.stdout.write(f"primary: {state['primary']}")
+                for name, path in state['shadows'].items():
+                    self.stdout.write(f"shadow {name}: {path}")
+                if not state['shadows']:
+                    self.stdout.write('No shadow versions registered')
+            elif action == 'add-shadow':
+                path = registry.add_shadow(options['name'], options['path'])
+                self.stdout.write(self.style.SUCCESS(f"Shadow {options['name']} registered from {path}"))
+            elif action == 'remove-shadow':
+                registry.remove_shadow(options['name'])
+                self.stdout.write(self.style.SUCCESS(f"Shadow {options['name']} removed"))
+            elif action == 'promote':
+                written = registry.promote(options['name'])
+                for path in written:
+                    self.stdout.write(f'  wrote {path}')
+                self.stdout.write(self.style.SUCCESS(
+                    f"Promoted {options['name']}; watching workers reload on their next poll"
+                ))
+        except RegistryError as e:
+            raise CommandError(str(e))
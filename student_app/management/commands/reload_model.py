@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from ml_models.predictor import StudentPerformancePredictor, request_reload
+
+
+class Command(BaseCommand):
+    help = 'Validate the model artifacts on disk and tell running workers to hot-reload them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--skip-check',
+            action='store_true',
+            help='Signal the workers without loading and canary-testing the artifacts first',
+        )
+
+    def handle(self, *args, **options):
+        if not options['skip_check']:
+            candidate = StudentPerformancePredictor(autoload=False)
+            try:
+                loaded = candidate.read_artifacts()
+                prediction = candidate.validate(loaded)
+            except Exception as e:
+                raise CommandError(f'Model artifacts failed validation: {e}')
+            self.stdout.write(f'Model version {loaded.version} passed the canary check ({prediction:.2f})')
+
+        path = request_reload()
+        self.stdout.write(self.style.SUCCESS(f'Reload requested via {path}'))
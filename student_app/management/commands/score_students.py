@@ -0,0 +1,220 @@
+import itertools
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from student_app.models import PerformanceProfile, ScoringCheckpoint, Student, StudentPrediction
+from ml_models.executor import init_worker, score_batch, score_stored
+from ml_models.feature_store import get_store
+
+PREDICTION_FIELDS = ['predicted_grade', 'confidence', 'lower', 'upper', 'model_version', 'scored_at']
+
+
+class Command(BaseCommand):
+    help = 'Score students with a performance profile and store the predictions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Students fetched, scored and written per batch (default 2000)',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=0,
+            help='Score chunks in this many worker processes (default: score in this process)',
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only rescore students whose profile changed since the last finished run '
+                 '(everyone is rescored if the model version changed)',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore the checkpoint of an unfinished run and start from the first student',
+        )
+        parser.add_argument(
+            '--checkpoint', default='score_students',
+            help='Name of the checkpoint row that tracks progress (default score_students)',
+        )
+        parser.add_argument(
+            '--no-store', action='store_true',
+            help='Read profiles from the database even when the feature store is up to date',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        from ml_models.predictor import predictor
+        if not predictor.ensure_loaded():
+            raise CommandError(predictor.unavailable_reason())
+        model_version = predictor.model_version
+
+        checkpoint, _ = ScoringCheckpoint.objects.get_or_create(name=options['checkpoint'])
+        full_run = (
+            not options['incremental']
+            or checkpoint.watermark is None
+            or checkpoint.watermark_version != model_version
+        )
+        resuming = checkpoint.finished_at is None and checkpoint.last_pk and not options['restart']
+        if resuming and full_run and not checkpoint.full_run:
+            # The model changed under an unfinished incremental run; everyone needs rescoring
+            resuming = False
+
+        if resuming:
+            self.stdout.write(f'Resuming after student pk {checkpoint.last_pk} ({checkpoint.scored} already scored)')
+        else:
+            checkpoint.last_pk = 0
+            checkpoint.scored = 0
+            checkpoint.started_at = timezone.now()
+            checkpoint.finished_at = None
+            checkpoint.full_run = full_run
+            checkpoint.save()
+
+        since = None if checkpoint.full_run else checkpoint.watermark
+        if since is None:
+            self.stdout.write(f'Scoring every student with model {model_version}')
+        else:
+            self.stdout.write(f'Rescoring students whose profile changed since {since:%Y-%m-%d %H:%M:%S}')
+
+        store = None if options['no_store'] else get_store()
+        self.from_store = store is not None and store.is_current(predictor.active)
+        if self.from_store:
+            self.stdout.write(f'Reading encoded features from {store.path}')
+        chunks = self.read_chunks(checkpoint.last_pk, chunk_size, since, with_features=not self.from_store)
+        self.started = time.perf_counter()
+        self.failed = 0
+        self.scored_this_run = 0
+        try:
+            if options['workers'] > 0:
+                self.score_in_pool(chunks, checkpoint, options['workers'])
+            else:
+                self.score_inline(chunks, checkpoint)
+        except KeyboardInterrupt:
+            raise CommandError(
+                f'Interrupted after student pk {checkpoint.last_pk}; run the command again to resume'
+            )
+        finally:
+            chunks.close()
+
+        # Profiles saved after this run started are picked up by the next one
+        checkpoint.finished_at = timezone.now()
+        checkpoint.watermark = checkpoint.started_at
+        checkpoint.watermark_version = model_version
+        checkpoint.save(update_fields=['finished_at', 'watermark', 'watermark_version', 'updated_at'])
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {self.scored_this_run} students in {elapsed:.1f}s '
+            f'({checkpoint.scored} in total, {self.failed} failed, model {checkpoint.model_version})'
+        ))
+
+    def read_chunks(self, after_pk, chunk_size, since=None, with_features=True):
+        """Stream (student pks, feature dicts) chunks in pk order, starting after ``after_pk``
+
+        With ``since``, only students whose profile was saved after it are
+        read. Without ``with_features`` only the pks are read and the
+        feature dicts are None (the features come from the store).
+        """
+        profile_fields = []
+        if with_features:
+            profile_fields = [f'performance_profile__{field}' for field in PerformanceProfile.FEATURE_FIELDS]
+        students = Student.objects.filter(pk__gt=after_pk, performance_profile__isnull=False)
+        if since is not None:
+            students = students.filter(performance_profile__updated_at__gt=since)
+        rows = (
+            students
+            .order_by('pk')
+            .values_list('pk', *profile_fields)
+            .iterator(chunk_size=chunk_size)
+        )
+        try:
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    return
+                pks = [row[0] for row in chunk]
+                records = None
+                if with_features:
+                    records = [dict(zip(PerformanceProfile.FEATURE_FIELDS, row[1:])) for row in chunk]
+                yield pks, records
+        finally:
+            # Release the database cursor now, even when the run is interrupted
+            rows.close()
+
+    def score_inline(self, chunks, checkpoint):
+        for pks, records in chunks:
+            result = score_stored(pks) if records is None else score_batch(records)
+            self.write_chunk(pks, result, checkpoint)
+
+    def score_in_pool(self, chunks, checkpoint, workers):
+        """Score chunks in worker processes and write them back in pk order
+
+        At most two chunks per worker are in flight, so memory stays bounded
+        and the checkpoint only ever advances past fully written chunks.
+        """
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'student_result_management.settings'),),
+        )
+        pending = deque()
+        try:
+            for pks, records in chunks:
+                if records is None:
+                    future = pool.submit(score_stored, pks)
+                else:
+                    future = pool.submit(score_batch, records)
+                pending.append((pks, future))
+                if len(pending) >= 2 * workers:
+                    pks, future = pending.popleft()
+                    self.write_chunk(pks, future.result(), checkpoint)
+            while pending:
+                pks, future = pending.popleft()
+                self.write_chunk(pks, future.result(), checkpoint)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def write_chunk(self, pks, result, checkpoint):
+        """Upsert one chunk of predictions and advance the checkpoint in the same transaction"""
+        now = timezone.now()
+        errors = result['errors']
+        predictions = [
+            StudentPrediction(
+                student_id=pk,
+                predicted_grade=result['predictions'][i],
+                confidence=result['confidences'][i],
+                lower=result['lower'][i],
+                upper=result['upper'][i],
+                model_version=result['model_version'],
+                scored_at=now,
+            )
+            for i, pk in enumerate(pks) if i not in errors
+        ]
+        for i, error in errors.items():
+            self.stderr.write(f'Student pk {pks[i]}: {error}')
+        self.failed += len(errors)
+
+        with transaction.atomic():
+            StudentPrediction.objects.bulk_create(
+                predictions,
+                update_conflicts=True,
+                unique_fields=['student'],
+                update_fields=PREDICTION_FIELDS,
+            )
+            checkpoint.last_pk = pks[-1]
+            checkpoint.scored += len(predictions)
+            if result['model_version']:
+                checkpoint.model_version = result['model_version']
+            checkpoint.save()
+
+        self.scored_this_run += len(predictions)
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(
+            f'  {checkpoint.scored} scored, through pk {checkpoint.last_pk} '
+            f'({self.scored_this_run / elapsed:.0f} students/s)'
+        )
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from student_app.models import StudentAggregate
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the per-course/grade student counters, or check them against a full recount. '
+        'Writes that skip Student.save()/delete() (bulk_create, update(), raw SQL, fixtures) leave them '
+        'out of date, so run `check --repair` on a schedule'
+    )
+
+    def add_arguments(self, parser):
+        actions = parser.add_subparsers(dest='action', required=True)
+        actions.add_parser('rebuild', help='Recount every student and replace the counters')
+        check = actions.add_parser(
+            'check', help='Recount every student and report counters that differ (exit status 1)',
+        )
+        check.add_argument(
+            '--repair', action='store_true',
+            help='Rebuild the counters when they differ instead of failing',
+        )
+
+    def handle(self, *args, **options):
+        if options['action'] == 'rebuild':
+            self.rebuild()
+        else:
+            self.check_counters(options['repair'])
+
+    def rebuild(self):
+        # One transaction, so readers never see the table half rebuilt
+        with transaction.atomic():
+            totals = StudentAggregate.recount()
+            StudentAggregate.objects.all().delete()
+            StudentAggregate.objects.bulk_create([
+                StudentAggregate(course=course, grade=grade, count=count, marks_sum=total, marks_sum_squares=squares)
+                for (course, grade), (count, total, squares) in sorted(totals.items())
+            ])
+        students = sum(count for count, _, _ in totals.values())
+        self.stdout.write(self.style.SUCCESS(f'Counted {students} students in {len(totals)} course/grade groups'))
+
+    def check_counters(self, repair=False):
+        expected = StudentAggregate.recount()
+        stored = {
+            (course, grade): (count, total, squares)
+            for course, grade, count, total, squares in StudentAggregate.objects.values_list(
+                'course', 'grade', 'count', 'marks_sum', 'marks_sum_squares'
+            )
+            # A group whose last student left keeps an all-zero row
+            if (count, total, squares) != (0, 0, 0)
+        }
+        mismatched = sorted(key for key in expected.keys() | stored.keys() if expected.get(key) != stored.get(key))
+        for course, grade in mismatched:
+            self.stdout.write(
+                f'{course} {grade}: stored {stored.get((course, grade), (0, 0, 0))}, '
+                f'recounted {expected.get((course, grade), (0, 0, 0))} (count, marks sum, sum of squares)'
+            )
+        if mismatched and repair:
+            self.rebuild()
+            return
+        if mismatched:
+            raise CommandError(
+                f'{len(mismatched)} of {len(expected)} groups differ; run `manage.py student_aggregates rebuild`'
+            )
+        self.stdout.write(self.style.SUCCESS(f'All {len(expected)} course/grade groups match a full recount'))
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:43
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_app', '0002_student_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoringCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_pk', models.BigIntegerField(default=0, help_text='Highest student pk already scored')),
+                ('model_version', models.CharField(blank=True, max_length=64)),
+                ('scored', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PerformanceProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gender', models.CharField(choices=[('Male', 'Male'), ('Female', 'Female')], max_length=10)),
+                ('race_ethnicity', models.CharField(choices=[('group A', 'Group A'), ('group B', 'Group B'), ('group C', 'Group C'), ('group D', 'Group D'), ('group E', 'Group E')], max_length=10)),
+                ('parental_level_of_education', models.CharField(choices=[('some high school', 'Some High School'), ('high school', 'High School'), ('some college', 'Some College'), ("associate's degree", "Associate's Degree"), ("bachelor's degree", "Bachelor's Degree"), ("master's degree", "Master's Degree")], max_length=30)),
+                ('lunch', models.CharField(choices=[('standard', 'Standard'), ('free/reduced', 'Free/Reduced')], max_length=20)),
+                ('test_preparation_course', models.CharField(choices=[('none', 'None'), ('completed', 'Completed')], max_length=20)),
+                ('study_hours_per_week', models.PositiveSmallIntegerField()),
+                ('attendance_rate', models.FloatField(validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('previous_grade', models.FloatField(validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='performance_profile', to='student_app.student')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StudentPrediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('predicted_grade', models.FloatField()),
+                ('confidence', models.FloatField()),
+                ('lower', models.FloatField()),
+                ('upper', models.FloatField()),
+                ('model_version', models.CharField(max_length=64)),
+                ('scored_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='prediction', to='student_app.student')),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_app', '0003_performance_profile_prediction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scoringcheckpoint',
+            name='full_run',
+            field=models.BooleanField(default=True, help_text='Whether the current run rescores every student'),
+        ),
+        migrations.AddField(
+            model_name='scoringcheckpoint',
+            name='watermark',
+            field=models.DateTimeField(blank=True, help_text='Start of the last finished run; profiles changed after it need rescoring', null=True),
+        ),
+        migrations.AddField(
+            model_name='scoringcheckpoint',
+            name='watermark_version',
+            field=models.CharField(blank=True, help_text='Model version of the last finished run', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='performanceprofile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='studentprediction',
+            name='predicted_grade',
+            field=models.FloatField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,85 @@
+from django.db import migrations
+
+# FTS5 indexes over the searchable columns, as created by this migration.
+# The SQL is frozen here rather than built by student_app.search, so later
+# changes to that module never change what this migration runs.
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE student_app_student_fts USING fts5("
+    "name, roll_number, email, course, content='student_app_student', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER student_app_student_fts_ai AFTER INSERT ON student_app_student BEGIN "
+    "INSERT INTO student_app_student_fts(rowid, name, roll_number, email, course) "
+    "VALUES (new.id, new.name, new.roll_number, new.email, new.course); END",
+    "CREATE TRIGGER student_app_student_fts_ad AFTER DELETE ON student_app_student BEGIN "
+    "INSERT INTO student_app_student_fts(student_app_student_fts, rowid, name, roll_number, email, course) "
+    "VALUES ('delete', old.id, old.name, old.roll_number, old.email, old.course); END",
+    "CREATE TRIGGER student_app_student_fts_au AFTER UPDATE OF name, roll_number, email, course "
+    "ON student_app_student BEGIN "
+    "INSERT INTO student_app_student_fts(student_app_student_fts, rowid, name, roll_number, email, course) "
+    "VALUES ('delete', old.id, old.name, old.roll_number, old.email, old.course); "
+    "INSERT INTO student_app_student_fts(rowid, name, roll_number, email, course) "
+    "VALUES (new.id, new.name, new.roll_number, new.email, new.course); END",
+    "INSERT INTO student_app_student_fts(student_app_student_fts) VALUES ('rebuild')",
+
+    "CREATE VIRTUAL TABLE student_app_teacher_fts USING fts5("
+    "name, email, course, content='student_app_teacher', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER student_app_teacher_fts_ai AFTER INSERT ON student_app_teacher BEGIN "
+    "INSERT INTO student_app_teacher_fts(rowid, name, email, course) "
+    "VALUES (new.id, new.name, new.email, new.course); END",
+    "CREATE TRIGGER student_app_teacher_fts_ad AFTER DELETE ON student_app_teacher BEGIN "
+    "INSERT INTO student_app_teacher_fts(student_app_teacher_fts, rowid, name, email, course) "
+    "VALUES ('delete', old.id, old.name, old.email, old.course); END",
+    "CREATE TRIGGER student_app_teacher_fts_au AFTER UPDATE OF name, email, course "
+    "ON student_app_teacher BEGIN "
+    "INSERT INTO student_app_teacher_fts(student_app_teacher_fts, rowid, name, email, course) "
+    "VALUES ('delete', old.id, old.name, old.email, old.course); "
+    "INSERT INTO student_app_teacher_fts(rowid, name, email, course) "
+    "VALUES (new.id, new.name, new.email, new.course); END",
+    "INSERT INTO student_app_teacher_fts(student_app_teacher_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS student_app_student_fts_ai",
+    "DROP TRIGGER IF EXISTS student_app_student_fts_ad",
+    "DROP TRIGGER IF EXISTS student_app_student_fts_au",
+    "DROP TABLE IF EXISTS student_app_student_fts",
+    "DROP TRIGGER IF EXISTS student_app_teacher_fts_ai",
+    "DROP TRIGGER IF EXISTS student_app_teacher_fts_ad",
+    "DROP TRIGGER IF EXISTS student_app_teacher_fts_au",
+    "DROP TABLE IF EXISTS student_app_teacher_fts",
+]
+
+
+def fts5_supported(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_indexes(apps, schema_editor):
+    # Other databases (or SQLite builds without FTS5) keep the icontains search
+    if not fts5_supported(schema_editor.connection):
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_app', '0004_incremental_scoring'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_app', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(fields=['name', 'id'], name='teacher_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:17
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def count_existing_students(apps, schema_editor):
+    Student = apps.get_model('student_app', 'Student')
+    StudentAggregate = apps.get_model('student_app', 'StudentAggregate')
+    totals = {}
+    for course, grade, marks in Student.objects.values_list('course', 'grade', 'marks').iterator(chunk_size=5000):
+        marks = int(Decimal(str(marks)).scaleb(2).to_integral_value())
+        count, total, squares = totals.get((course, grade), (0, 0, 0))
+        totals[(course, grade)] = (count + 1, total + marks, squares + marks * marks)
+    StudentAggregate.objects.bulk_create([
+        StudentAggregate(course=course, grade=grade, count=count, marks_sum=total, marks_sum_squares=squares)
+        for (course, grade), (count, total, squares) in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_app', '0006_teacher_name_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course', models.CharField(max_length=100)),
+                ('grade', models.CharField(choices=[('A+', 'A+'), ('A', 'A'), ('A-', 'A-'), ('B+', 'B+'), ('B', 'B'), ('B-', 'B-'), ('C+', 'C+'), ('C', 'C'), ('C-', 'C-'), ('D+', 'D+'), ('D', 'D'), ('F', 'F')], max_length=2)),
+                ('count', models.BigIntegerField(default=0)),
+                ('marks_sum', models.BigIntegerField(default=0, help_text='Sum of marks, in hundredths')),
+                ('marks_sum_squares', models.BigIntegerField(default=0, help_text='Sum of squared marks, in ten-thousandths')),
+            ],
+            options={
+                'unique_together': {('course', 'grade')},
+            },
+        ),
+        migrations.RunPython(count_existing_students, migrations.RunPython.noop),
+    ]
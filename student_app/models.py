@@ -1,4 +1,7 @@
-from django.db import models
+import math
+from decimal import Decimal
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
@@ -78,7 +81,17 @@ class Student(models.Model):
             self.grade = 'D'
         else:
             self.grade = 'F'
-        super().save(*args, **kwargs)
+        # The per-course/grade counters move in the same transaction as the row
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = Student.objects.filter(pk=self.pk).values_list('course', 'grade', 'marks').first()
+            super().save(*args, **kwargs)
+            current = (self.course, self.grade, Decimal(str(self.marks)))
+            if previous != current:
+                if previous is not None:
+                    StudentAggregate.add(*previous, sign=-1)
+                StudentAggregate.add(*current)
 
 
 class Teacher(models.Model):
@@ -96,6 +109,8 @@ class Teacher(models.Model):
     
     class Meta:
         ordering = ['name']
+        # Keyset pagination walks (name, id) ranges
+        indexes = [models.Index(fields=['name', 'id'], name='teacher_name_id_idx')]
         verbose_name = "Teacher"
         verbose_name_plural = "Teachers"
     
@@ -107,3 +122,158 @@ class Teacher(models.Model):
         """Calculate years of service"""
         today = timezone.now().date()
         return (today - self.hire_date).days // 365
+
+
+class PerformanceProfile(models.Model):
+    """Inputs the performance model scores a student on"""
+
+    GENDER_CHOICES = [('Male', 'Male'), ('Female', 'Female')]
+    RACE_ETHNICITY_CHOICES = [(f'group {g}', f'Group {g}') for g in 'ABCDE']
+    PARENTAL_EDUCATION_CHOICES = [
+        ('some high school', 'Some High School'),
+        ('high school', 'High School'),
+        ('some college', 'Some College'),
+        ("associate's degree", "Associate's Degree"),
+        ("bachelor's degree", "Bachelor's Degree"),
+        ("master's degree", "Master's Degree"),
+    ]
+    LUNCH_CHOICES = [('standard', 'Standard'), ('free/reduced', 'Free/Reduced')]
+    TEST_PREPARATION_CHOICES = [('none', 'None'), ('completed', 'Completed')]
+
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='performance_profile')
+    gender = models.CharField(max_length=10, choices=GENDER_CHOICES)
+    race_ethnicity = models.CharField(max_length=10, choices=RACE_ETHNICITY_CHOICES)
+    parental_level_of_education = models.CharField(max_length=30, choices=PARENTAL_EDUCATION_CHOICES)
+    lunch = models.CharField(max_length=20, choices=LUNCH_CHOICES)
+    test_preparation_course = models.CharField(max_length=20, choices=TEST_PREPARATION_CHOICES)
+    study_hours_per_week = models.PositiveSmallIntegerField()
+    attendance_rate = models.FloatField(validators=[MinValueValidator(0), MaxValueValidator(100)])
+    previous_grade = models.FloatField(validators=[MinValueValidator(0), MaxValueValidator(100)])
+    # Indexed: incremental scoring selects profiles changed since its watermark
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Field names match the predictor's input columns
+    FEATURE_FIELDS = [
+        'gender', 'race_ethnicity', 'parental_level_of_education', 'lunch',
+        'test_preparation_course', 'study_hours_per_week', 'attendance_rate', 'previous_grade',
+    ]
+
+    def __str__(self):
+        return f"Performance profile for {self.student}"
+
+    def to_features(self):
+        return {field: getattr(self, field) for field in self.FEATURE_FIELDS}
+
+
+class StudentPrediction(models.Model):
+    """Latest model prediction stored for a student by the bulk scorer"""
+
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='prediction')
+    # Indexed: the at-risk list is a range query on this column
+    predicted_grade = models.FloatField(db_index=True)
+    confidence = models.FloatField()
+    lower = models.FloatField()
+    upper = models.FloatField()
+    model_version = models.CharField(max_length=64)
+    scored_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.student}: {self.predicted_grade} (model {self.model_version})"
+
+
+class ScoringCheckpoint(models.Model):
+    """Progress of a bulk scoring run, so an interrupted run can resume"""
+
+    name = models.CharField(max_length=50, unique=True)
+    last_pk = models.BigIntegerField(default=0, help_text="Highest student pk already scored")
+    model_version = models.CharField(max_length=64, blank=True)
+    scored = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    full_run = models.BooleanField(default=True, help_text="Whether the current run rescores every student")
+    watermark = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Start of the last finished run; profiles changed after it need rescoring",
+    )
+    watermark_version = models.CharField(max_length=64, blank=True, help_text="Model version of the last finished run")
+
+    def __str__(self):
+        state = 'finished' if self.finished_at else f'at pk {self.last_pk}'
+        return f"{self.name} ({state})"
+
+
+class StudentAggregate(models.Model):
+    """Running count and marks totals of the students in one course and grade
+
+    Kept up to date by Student.save() and the student delete signal, and
+    rebuilt with `manage.py student_aggregates rebuild`. Marks are summed
+    as whole hundredths so the totals stay exact and a recount matches
+    them to the digit.
+    """
+
+    course = models.CharField(max_length=100)
+    grade = models.CharField(max_length=2, choices=Student.GRADE_CHOICES)
+    count = models.BigIntegerField(default=0)
+    marks_sum = models.BigIntegerField(default=0, help_text="Sum of marks, in hundredths")
+    marks_sum_squares = models.BigIntegerField(default=0, help_text="Sum of squared marks, in ten-thousandths")
+
+    class Meta:
+        unique_together = [('course', 'grade')]
+
+    def __str__(self):
+        return f"{self.course} {self.grade}: {self.count} students"
+
+    @staticmethod
+    def hundredths(marks):
+        return int(Decimal(str(marks)).scaleb(2).to_integral_value())
+
+    @classmethod
+    def add(cls, course, grade, marks, sign=1):
+        """Count a student in (``sign=1``) or out of (``sign=-1``) a course and grade"""
+        marks = cls.hundredths(marks)
+        changes = {
+            'count': F('count') + sign,
+            'marks_sum': F('marks_sum') + sign * marks,
+            'marks_sum_squares': F('marks_sum_squares') + sign * marks * marks,
+        }
+        if cls.objects.filter(course=course, grade=grade).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    course=course, grade=grade, count=sign,
+                    marks_sum=sign * marks, marks_sum_squares=sign * marks * marks,
+                )
+        except IntegrityError:
+            # Another transaction created the row first
+            cls.objects.filter(course=course, grade=grade).update(**changes)
+
+    @classmethod
+    def recount(cls):
+        """{(course, grade): (count, marks_sum, marks_sum_squares)} counted from the students table"""
+        totals = {}
+        for course, grade, marks in Student.objects.values_list('course', 'grade', 'marks').iterator(chunk_size=5000):
+            marks = cls.hundredths(marks)
+            count, total, squares = totals.get((course, grade), (0, 0, 0))
+            totals[(course, grade)] = (count + 1, total + marks, squares + marks * marks)
+        return totals
+
+    @classmethod
+    def summary(cls, course=None, grade=None):
+        """Count, mean and standard deviation of marks, optionally for one course and/or grade"""
+        rows = cls.objects.all()
+        if course is not None:
+            rows = rows.filter(course=course)
+        if grade is not None:
+            rows = rows.filter(grade=grade)
+        count = total = squares = 0
+        for row_count, row_total, row_squares in rows.values_list('count', 'marks_sum', 'marks_sum_squares'):
+            count += row_count
+            total += row_total
+            squares += row_squares
+        if not count:
+            return {'count': 0, 'mean': None, 'std': None}
+        # Population variance from the exact integer sums
+        variance = (count * squares - total * total) / (count * count)
+        return {'count': count, 'mean': total / count / 100, 'std': math.sqrt(max(variance, 0)) / 100}
@@ -0,0 +1,152 @@
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'student_app.pagination'
+
+
+def cursor_salt(model):
+    return f'{CURSOR_SALT}.{model._meta.label_lower}'
+
+
+def read_cursor(model, cursor):
+    """The payload of a cursor for ``model``, or None when it is missing or was tampered with"""
+    if not cursor:
+        return None
+    try:
+        return signing.loads(cursor, salt=cursor_salt(model))
+    except signing.BadSignature:
+        return None
+
+
+def _comparison(field, descending, direction):
+    forward = (direction == 'next') != descending
+    return f'{field}__gt' if forward else f'{field}__lt'
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator, iterable like a Paginator page"""
+
+    is_keyset = True
+
+    def __init__(self, object_list, next_cursor, previous_cursor, count):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        # Total matching rows as of the first page, or None when not counted
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Paginate a queryset by its ordering key instead of OFFSET
+
+    A page starts right after (or ends right before) the key of the row the
+    cursor points at, so it is one indexed range scan however deep it is.
+    The key is the queryset's ordering up to its first unique field, with
+    the pk added as a tie-breaker when no field is unique.
+
+    Cursors are signed and carry the filter state of the listing, so a
+    cursor alone reproduces the page and cannot be edited into another
+    query. The optional count is taken once on the first page and carried
+    along in the cursors, unless a ``total`` known without counting is given.
+    """
+
+    def __init__(self, queryset, per_page, filters=None, count=True, total=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.filters = filters or {}
+        self.count = count
+        self.total = total
+        self.key = self._key_fields(queryset)
+
+    @staticmethod
+    def _key_fields(queryset):
+        opts = queryset.model._meta
+        key = []
+        for name in list(queryset.query.order_by or opts.ordering) + ['pk']:
+            descending = name.startswith('-')
+            field = opts.pk if name.lstrip('-') == 'pk' else opts.get_field(name.lstrip('-'))
+            key.append((field.attname, descending))
+            if field.unique:
+                break
+        return key
+
+    def page(self, cursor=None):
+        payload = read_cursor(self.queryset.model, cursor)
+        if payload is None or payload.get('f') != self.filters:
+            payload = None
+        direction = payload['d'] if payload else 'next'
+        backwards = direction == 'previous'
+        ordering = [('-' if descending != backwards else '') + field for field, descending in self.key]
+
+        queryset = self.queryset.order_by(*ordering)
+        if payload:
+            queryset = queryset.filter(self._after(payload['k'], direction))
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'previous':
+            rows.reverse()
+
+        if self.total is not None:
+            count = self.total
+        elif payload and payload.get('n') is not None:
+            count = payload['n']
+        elif self.count and not payload:
+            count = self.queryset.count() if more else len(rows)
+        else:
+            count = None
+
+        # Going forward there is a previous page iff we came from one, and vice versa
+        has_next = more if direction == 'next' else True
+        has_previous = more if direction == 'previous' else payload is not None
+        return KeysetPage(
+            rows,
+            self._cursor(rows[-1], 'next', count) if rows and has_next else None,
+            self._cursor(rows[0], 'previous', count) if rows and has_previous else None,
+            count,
+        )
+
+    def _cursor(self, row, direction, count):
+        values = [getattr(row, field) for field, _ in self.key]
+        return signing.dumps(
+            {'f': self.filters, 'k': [self._dump(value) for value in values], 'd': direction, 'n': count},
+            salt=cursor_salt(self.queryset.model), compress=True,
+        )
+
+    @staticmethod
+    def _dump(value):
+        return value if value is None or isinstance(value, (str, int, float, bool)) else str(value)
+
+    def _after(self, values, direction):
+        """Rows strictly past ``values`` in ``direction``
+
+        Written as ``k1 >= v1 AND (k1 > v1 OR k2 > v2 ...)`` so the database
+        can start an index range scan at v1 instead of testing every row.
+        """
+        opts = self.queryset.model._meta
+        values = [opts.get_field(field).to_python(value) for (field, _), value in zip(self.key, values)]
+        past = Q()
+        for i, (field, descending) in enumerate(self.key):
+            step = Q(**{_comparison(field, descending, direction): values[i]})
+            for j in range(i):
+                step &= Q(**{self.key[j][0]: values[j]})
+            past |= step
+        if len(self.key) == 1:
+            return past
+        first, descending = self.key[0]
+        return Q(**{_comparison(first, descending, direction) + 'e': values[0]}) & past
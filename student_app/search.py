@@ -0,0 +1,136 @@
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# Searchable columns of each table, indexed by an FTS5 table named <table>_fts
+SEARCH_INDEXES = {
+    'student_app_student': ['name', 'roll_number', 'email', 'course'],
+    'student_app_teacher': ['name', 'email', 'course'],
+}
+
+# unicode61 splits on everything but letters and digits (underscore included)
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+# Columns also matched as substrings when only digits are typed, since the
+# index only matches word prefixes and "1234" should still find "R0001234"
+SUBSTRING_COLUMNS = ['roll_number']
+
+_index_ready = {}
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def index_sql(table, columns):
+    """Statements that create the FTS5 index for ``table``, its sync triggers and its initial contents
+
+    The index is an external-content table: it stores only the tokens and
+    reads the column values back from ``table``. The triggers run inside
+    SQLite, so bulk_create(), update() and raw SQL keep it in sync too.
+    """
+    fts = fts_table(table)
+    cols = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def index_ready(table):
+    """True when the FTS index for ``table`` exists in the default database (checked once per process)"""
+    ready = _index_ready.get(table)
+    if ready is None:
+        ready = False
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts_table(table)])
+                ready = cursor.fetchone() is not None
+        _index_ready[table] = ready
+    return ready
+
+
+def match_expression(text, columns):
+    """FTS5 query matching rows where, in ``columns``, every word of ``text`` starts a token
+
+    Words are quoted, so FTS5 operators typed by the user are searched for
+    literally. Returns None when ``text`` has no letters or digits.
+    """
+    words = TOKEN_RE.findall(text)
+    if not words:
+        return None
+    terms = ' '.join(f'"{word}"*' for word in words)
+    return '{%s} : (%s)' % (' '.join(columns), terms)
+
+
+def contains_filter(text, columns):
+    """The substring filter used when no FTS index is available"""
+    condition = Q()
+    for column in columns:
+        condition |= Q(**{f'{column}__icontains': text})
+    return condition
+
+
+def substring_columns(text, columns):
+    """The columns of ``columns`` still searched with icontains next to the index for ``text``"""
+    if not text.strip().isdigit():
+        return []
+    return [column for column in columns if column in SUBSTRING_COLUMNS]
+
+
+def filter_search(queryset, text, columns):
+    """Restrict ``queryset`` to rows matching ``text`` in ``columns``, keeping its ordering
+
+    Uses prefix matching through the FTS index when it exists and
+    substring matching with icontains otherwise. Digits-only text also
+    matches inside roll numbers.
+    """
+    table = queryset.model._meta.db_table
+    match = match_expression(text, columns)
+    if match is None or not index_ready(table):
+        return queryset.filter(contains_filter(text, columns))
+    fts = fts_table(table)
+    condition = Q(pk__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [match]))
+    return queryset.filter(condition | contains_filter(text.strip(), substring_columns(text, columns)))
+
+
+def ranked_search(model, text, columns, limit=10):
+    """The ``limit`` best matches for ``text`` in ``columns``, best first
+
+    Matches are ordered by bm25 rank, which FTS5 has to compute for every
+    matching row. A short prefix can match most of a large table, so when
+    more than SEARCH_RANK_LIMIT rows match, the first ``limit`` in index
+    order are returned unranked instead. Digits-only text is topped up
+    with roll numbers containing it.
+    """
+    table = model._meta.db_table
+    match = match_expression(text, columns)
+    if match is None or not index_ready(table):
+        return list(model.objects.filter(contains_filter(text, columns))[:limit])
+    fts = fts_table(table)
+    rank_limit = getattr(settings, 'SEARCH_RANK_LIMIT', 1000)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s LIMIT %s', [match, rank_limit + 1])
+        ids = [row[0] for row in cursor.fetchall()]
+        if len(ids) <= rank_limit:
+            cursor.execute(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s ORDER BY rank LIMIT %s', [match, limit])
+            ids = [row[0] for row in cursor.fetchall()]
+    ids = ids[:limit]
+    extra = substring_columns(text, columns)
+    if extra and len(ids) < limit:
+        more = model.objects.filter(contains_filter(text.strip(), extra)).exclude(pk__in=ids)
+        ids += list(more.values_list('pk', flat=True)[:limit - len(ids)])
+    found = model.objects.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
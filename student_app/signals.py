@@ -0,0 +1,43 @@
+import logging
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from student_app.models import PerformanceProfile, Student, StudentAggregate
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=PerformanceProfile)
+@receiver(post_delete, sender=PerformanceProfile)
+def performance_profile_changed(sender, instance, **kwargs):
+    """Keep the student's row in the feature store in step with their profile"""
+    from ml_models.feature_store import queue_sync
+    student_pk = instance.student_id
+    # Applied by a background thread once the change is committed
+    transaction.on_commit(lambda: queue_sync([student_pk]))
+
+
+def _update_autocomplete(student_pk, record):
+    from student_app.autocomplete import student_changed
+    try:
+        student_changed(student_pk, record)
+    except Exception:
+        # Other workers catch up by rebuilding once the change log has a gap
+        logger.exception("Error updating the autocomplete index for student %s", student_pk)
+
+
+@receiver(post_save, sender=Student)
+def student_saved(sender, instance, **kwargs):
+    """Publish the student's new name, roll number and email to the autocomplete index"""
+    from student_app.autocomplete import RECORD_FIELDS
+    student_pk = instance.pk
+    record = {field: getattr(instance, field) for field in RECORD_FIELDS}
+    transaction.on_commit(lambda: _update_autocomplete(student_pk, record))
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted(sender, instance, **kwargs):
+    # Runs inside the delete's transaction, also for cascades and queryset deletes
+    StudentAggregate.add(instance.course, instance.grade, instance.marks, sign=-1)
+    student_pk = instance.pk
+    transaction.on_commit(lambda: _update_autocomplete(student_pk, None))
@@ -1,3 +1,475 @@
-from django.test import TestCase
+import json
+import statistics
+import tempfile
+from decimal import Decimal
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from io import StringIO
+from unittest import mock
+from . import autocomplete, search
+from .models import PerformanceProfile, ScoringCheckpoint, Student, StudentAggregate, StudentPrediction, Teacher
+from .pagination import KeysetPaginator
+from .views import what_if_grid
+from ml_models.predictor import FAILED, LOADING, NOT_LOADED, READY, StudentPerformancePredictor, predictor
+from ml_models.tests import sample_records, train_artifacts
+from teacher_app.models import TeacherProfile
 
-# Create your tests here.
+
+def make_student(i, **fields):
+    values = {
+        'name': f'Student {i}',
+        'roll_number': f'R{i:04d}',
+        'email': f'student{i}@example.edu',
+        'course': 'Physics',
+        'marks': Decimal('70.00'),
+    }
+    values.update(fields)
+    return Student.objects.create(**values)
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(23):
+            make_student(i)
+        # Repeated names: the pk breaks the ties
+        for i in range(11):
+            Teacher.objects.create(name=f'Teacher {i % 3}', email=f'teacher{i}@example.edu', course='Physics')
+
+    def walk(self, queryset, per_page):
+        """Follow next cursors to the end, then previous cursors back; return both lists of pages"""
+        paginator = KeysetPaginator(queryset, per_page)
+        page = paginator.page()
+        forward = [[row.pk for row in page]]
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            forward.append([row.pk for row in page])
+        backward = [[row.pk for row in page]]
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            backward.insert(0, [row.pk for row in page])
+        return forward, backward
+
+    def assertWalksEveryRow(self, queryset, per_page):
+        expected = list(queryset.values_list('pk', flat=True))
+        forward, backward = self.walk(queryset, per_page)
+        self.assertEqual([pk for page in forward for pk in page], expected)
+        self.assertEqual(backward, forward)
+        self.assertTrue(all(len(page) == per_page for page in forward[:-1]))
+
+    def test_students_by_roll_number(self):
+        self.assertWalksEveryRow(Student.objects.all(), 5)
+
+    def test_filtered_descending_order(self):
+        self.assertWalksEveryRow(Student.objects.filter(roll_number__gt='R0003').order_by('-roll_number'), 4)
+
+    def test_teachers_with_repeated_names(self):
+        for per_page in (1, 2, 4):
+            with self.subTest(per_page=per_page):
+                self.assertWalksEveryRow(Teacher.objects.all(), per_page)
+
+    def test_counts_once_and_carries_the_count(self):
+        paginator = KeysetPaginator(Student.objects.all(), 10)
+        first = paginator.page()
+        self.assertEqual(first.count, 23)
+        with self.assertNumQueries(1):
+            second = paginator.page(first.next_cursor)
+        self.assertEqual(second.count, 23)
+
+    def test_tampered_cursor_starts_over(self):
+        paginator = KeysetPaginator(Student.objects.all(), 5)
+        cursor = paginator.page().next_cursor
+        page = paginator.page(cursor[:-2] + 'xx')
+        self.assertEqual([row.roll_number for row in page], [f'R{i:04d}' for i in range(5)])
+        self.assertFalse(page.has_previous())
+
+    def test_cursor_from_other_filters_starts_over(self):
+        cursor = KeysetPaginator(Student.objects.all(), 5, filters={'course_filter': 'Physics'}).page().next_cursor
+        page = KeysetPaginator(Student.objects.all(), 5, filters={}).page(cursor)
+        self.assertFalse(page.has_previous())
+
+
+class StudentAggregateTests(TestCase):
+    def assertCountersMatch(self):
+        stored = {
+            (row.course, row.grade): (row.count, row.marks_sum, row.marks_sum_squares)
+            for row in StudentAggregate.objects.all()
+            if (row.count, row.marks_sum, row.marks_sum_squares) != (0, 0, 0)
+        }
+        self.assertEqual(stored, StudentAggregate.recount())
+
+    def test_saves_and_deletes_keep_the_counters_exact(self):
+        students = [
+            make_student(i, marks=Decimal(marks), course=course)
+            for i, (marks, course) in enumerate([
+                ('91.25', 'Physics'), ('72.50', 'Physics'), ('72.75', 'Chemistry'), ('38.00', 'Chemistry'),
+            ])
+        ]
+        self.assertCountersMatch()
+
+        # Same grade, new marks; new grade; new course
+        students[1].marks = Decimal('73.10')
+        students[1].save()
+        students[2].marks = Decimal('88.00')
+        students[2].save()
+        students[3].course = 'Physics'
+        students[3].save()
+        self.assertCountersMatch()
+
+        students[0].delete()
+        Student.objects.filter(course='Physics').delete()
+        self.assertCountersMatch()
+
+    def test_summary(self):
+        marks = ['55.00', '61.50', '61.75', '99.99', '0.01']
+        for i, value in enumerate(marks):
+            make_student(i, marks=Decimal(value), course='Maths' if i % 2 else 'Physics')
+        values = [float(value) for value in marks]
+
+        summary = StudentAggregate.summary()
+        self.assertEqual(summary['count'], 5)
+        self.assertAlmostEqual(summary['mean'], statistics.fmean(values))
+        self.assertAlmostEqual(summary['std'], statistics.pstdev(values))
+        self.assertEqual(StudentAggregate.summary(course='Maths')['count'], 2)
+        self.assertEqual(StudentAggregate.summary(grade='F'), {'count': 1, 'mean': 0.01, 'std': 0.0})
+        self.assertEqual(StudentAggregate.summary(course='History'), {'count': 0, 'mean': None, 'std': None})
+
+    def test_check_finds_and_repairs_drift(self):
+        student = make_student(1)
+        make_student(2)
+        call_command('student_aggregates', 'check', stdout=StringIO())
+
+        # update() skips Student.save(), so the counters drift
+        Student.objects.filter(pk=student.pk).update(marks=Decimal('95.00'), grade='A+')
+        with self.assertRaises(CommandError):
+            call_command('student_aggregates', 'check', stdout=StringIO())
+        call_command('student_aggregates', 'check', '--repair', stdout=StringIO())
+        self.assertCountersMatch()
+        call_command('student_aggregates', 'check', stdout=StringIO())
+
+
+class StudentListTotalTests(TestCase):
+    def setUp(self):
+        for i in range(12):
+            make_student(i)
+        user = User.objects.create_user('teacher', password='secret')
+        TeacherProfile.objects.create(user=user, course='Physics')
+        self.client.force_login(user)
+
+    def listing_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('student_list'))
+        self.assertEqual(response.context['total_students'], 12)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_numbered_pages_count_without_the_counters(self):
+        with self.settings(LISTING_PAGINATION='offset'):
+            queries = self.listing_queries()
+        self.assertFalse(any(StudentAggregate._meta.db_table in sql for sql in queries))
+        self.assertTrue(any('COUNT(*)' in sql for sql in queries))
+
+    def test_cursor_pages_take_the_total_from_the_counters(self):
+        with self.settings(LISTING_PAGINATION='keyset'):
+            queries = self.listing_queries()
+        self.assertTrue(any(StudentAggregate._meta.db_table in sql for sql in queries))
+        self.assertFalse(any('COUNT(*)' in sql for sql in queries))
+
+
+class SearchIndexTests(TestCase):
+    COLUMNS = ['name', 'roll_number', 'email']
+
+    def setUp(self):
+        if not search.index_ready(Student._meta.db_table):
+            self.skipTest('No FTS5 index in this database')
+
+    def found(self, text):
+        return set(search.filter_search(Student.objects.all(), text, self.COLUMNS).values_list('pk', flat=True))
+
+    def test_triggers_follow_inserts_updates_and_deletes(self):
+        student = make_student(1, name='Sita Thapa')
+        self.assertEqual(self.found('thap'), {student.pk})
+        self.assertEqual(self.found('sita th'), {student.pk})
+
+        student.name = 'Gita Rai'
+        student.save()
+        self.assertEqual(self.found('thapa'), set())
+        self.assertEqual(self.found('rai'), {student.pk})
+
+        # Writes that bypass the ORM's save() are indexed by the triggers too
+        Student.objects.filter(pk=student.pk).update(email='gita.rai@example.edu')
+        self.assertEqual(self.found('gita.rai'), {student.pk})
+        bulk = Student.objects.bulk_create([
+            Student(name='Hari Lama', roll_number='R9001', email='hari@example.edu', course='Physics',
+                    marks=Decimal('64.00'), grade='C+'),
+        ])
+        self.assertEqual(len(self.found('lama')), 1)
+
+        student.delete()
+        Student.objects.filter(pk__in=[row.pk for row in bulk]).delete()
+        self.assertEqual(self.found('rai') | self.found('lama'), set())
+        with connection.cursor() as cursor:
+            fts = search.fts_table(Student._meta.db_table)
+            cursor.execute(f"INSERT INTO {fts}({fts}, rank) VALUES ('integrity-check', 1)")
+
+    def test_accents_and_operators(self):
+        student = make_student(1, name='Śītā Thapa')
+        self.assertEqual(self.found('sita'), {student.pk})
+        # FTS5 syntax typed into the box is searched for literally
+        self.assertEqual(self.found('thapa OR "'), set())
+
+    def test_ranked_search_puts_the_best_match_first(self):
+        make_student(1, name='Bikash Kumar Gurung Thapa Magar')
+        exact = make_student(2, name='Thapa')
+        make_student(3, name='Kiran Lama')
+        results = search.ranked_search(Student, 'thapa', self.COLUMNS)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0].pk, exact.pk)
+
+    def test_digits_match_inside_roll_numbers(self):
+        student = make_student(1, roll_number='R0001234')
+        make_student(2, roll_number='R0005678')
+        self.assertEqual(self.found('1234'), {student.pk})
+        self.assertEqual([row.pk for row in search.ranked_search(Student, '1234', self.COLUMNS)], [student.pk])
+        # Words are still matched by prefix only
+        self.assertEqual(self.found('tudent'), set())
+
+
+class ModelEndpointTests(TestCase):
+    def test_readiness_probe_needs_no_login(self):
+        for state, expected in ((READY, 200), (LOADING, 503), (FAILED, 503), (NOT_LOADED, 503)):
+            with self.subTest(state=state), mock.patch.object(predictor, 'state', state), \
+                    mock.patch.object(predictor, 'load_error', 'secret path'):
+                response = self.client.get(reverse('model_ready'))
+                self.assertEqual(response.status_code, expected)
+                # The state only: no error text for anonymous callers
+                self.assertEqual(response.json(), {'state': state})
+
+    def test_status_and_metrics_need_a_login(self):
+        for name in ('model_status', 'model_metrics'):
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 302)
+
+        user = User.objects.create_user('teacher', password='secret')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('model_status')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('model_metrics')).status_code, 302)
+        user.is_staff = True
+        user.save()
+        self.assertEqual(self.client.get(reverse('model_metrics')).status_code, 200)
+
+    def test_at_risk_threshold_must_be_finite(self):
+        user = User.objects.create_user('teacher', password='secret')
+        TeacherProfile.objects.create(user=user, course='Physics')
+        self.client.force_login(user)
+        for value, expected in (('45.5', 45.5), ('nan', 60), ('inf', 60), ('-inf', 60), ('abc', 60)):
+            with self.subTest(threshold=value), self.settings(ML_AT_RISK_THRESHOLD=60):
+                response = self.client.get(reverse('at_risk_students'), {'threshold': value})
+                self.assertEqual(response.context['threshold'], expected)
+
+
+PROFILE = {
+    'gender': 'female',
+    'race_ethnicity': 'group B',
+    'parental_level_of_education': "bachelor's degree",
+    'lunch': 'standard',
+    'test_preparation_course': 'none',
+    'study_hours_per_week': 20,
+    'attendance_rate': 90.0,
+    'previous_grade': 75.0,
+}
+NUMERIC_FIELDS = ['study_hours_per_week', 'attendance_rate', 'previous_grade']
+
+
+def with_raw_value(field, raw):
+    """PROFILE as a JSON body with ``field`` set to the literal ``raw`` (which json.dumps cannot write)"""
+    return json.dumps({**PROFILE, field: '@'}).replace('"@"', raw)
+
+
+class PredictionApiTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('student', password='secret'))
+
+    def test_non_finite_numbers_are_rejected(self):
+        for field in NUMERIC_FIELDS:
+            for raw in ('Infinity', '-Infinity', 'NaN', '1e400'):
+                with self.subTest(field=field, value=raw):
+                    response = self.client.post(
+                        reverse('predict_performance_api'), with_raw_value(field, raw), content_type='application/json',
+                    )
+                    self.assertEqual(response.status_code, 400)
+
+
+class WhatIfGridTests(TestCase):
+    def test_grid_values(self):
+        grid = what_if_grid({'study_hours_per_week': {'start': 0, 'stop': 40, 'steps': 5}, 'attendance_rate': [80, 90]})
+        self.assertEqual(grid, {'study_hours_per_week': [0, 10, 20, 30, 40], 'attendance_rate': [80.0, 90.0]})
+        grid = what_if_grid({'previous_grade': {'start': 50, 'stop': 90, 'steps': 1}})
+        self.assertEqual(grid, {'previous_grade': [50.0]})
+
+    def test_grid_size_is_limited(self):
+        with self.settings(ML_WHAT_IF_MAX_POINTS=100):
+            grid = what_if_grid({'attendance_rate': {'start': 0, 'stop': 100, 'steps': 100}})
+            self.assertEqual(len(grid['attendance_rate']), 100)
+            with self.assertRaisesRegex(ValueError, '101 points'):
+                what_if_grid({'attendance_rate': {'start': 0, 'stop': 100, 'steps': 101}})
+            with self.assertRaisesRegex(ValueError, '110 points'):
+                what_if_grid({
+                    'attendance_rate': {'start': 0, 'stop': 100, 'steps': 11}, 'previous_grade': list(range(10)),
+                })
+
+    def test_invalid_steps_are_rejected(self):
+        self.client.force_login(User.objects.create_user('student', password='secret'))
+        for raw in ('0', '-3', 'Infinity', 'NaN', '1e400', '"many"'):
+            with self.subTest(steps=raw):
+                body = json.dumps({
+                    'profile': PROFILE, 'sweep': {'study_hours_per_week': {'start': 0, 'stop': 40, 'steps': '@'}},
+                }).replace('"@"', raw)
+                response = self.client.post(reverse('what_if_api'), body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+
+@override_settings(STUDENT_AUTOCOMPLETE_SINGLE_PROCESS=True)
+class AutocompleteIndexTests(TestCase):
+    def names(self, index, text):
+        return [match['name'] for match in index.search(text)]
+
+    def test_enabled_only_where_every_process_sees_the_changes(self):
+        self.assertTrue(autocomplete.enabled())
+        with self.settings(STUDENT_AUTOCOMPLETE_SINGLE_PROCESS=False):
+            self.assertFalse(autocomplete.enabled())
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            self.assertFalse(autocomplete.enabled())
+
+    def test_prefixes_of_names_roll_numbers_and_emails(self):
+        make_student(1, name='Śītā Thapa', email='sita@example.edu')
+        make_student(2, name='Sita Rai')
+        make_student(3, name='Hari Lama')
+        index = autocomplete.AutocompleteIndex()
+        self.assertEqual(self.names(index, 'sita'), ['Sita Rai', 'Śītā Thapa'])
+        self.assertEqual(self.names(index, 'tha'), ['Śītā Thapa'])
+        self.assertEqual(self.names(index, 'sita th'), ['Śītā Thapa'])
+        self.assertEqual(self.names(index, 'R0003'), ['Hari Lama'])
+        self.assertEqual(self.names(index, 'sita@'), ['Śītā Thapa'])
+        self.assertEqual(self.names(index, 'kiran'), [])
+
+    def test_saves_and_deletes_reach_this_and_other_workers(self):
+        student = make_student(1, name='Sita Thapa')
+        here = autocomplete.get_index()
+        other = autocomplete.AutocompleteIndex()
+        here.refresh()
+        other.refresh()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            student.name = 'Gita Rai'
+            student.save()
+            added = make_student(2, name='Hari Lama')
+        # Applied in place here; another worker reloads the changed students
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(here, 'gita'), ['Gita Rai'])
+        self.assertEqual(self.names(other, 'sita'), [])
+        self.assertEqual(self.names(other, 'gita'), ['Gita Rai'])
+        self.assertEqual(self.names(other, 'hari'), ['Hari Lama'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added.delete()
+        self.assertEqual(self.names(here, 'hari'), [])
+        self.assertEqual(self.names(other, 'hari'), [])
+        self.assertEqual(sorted(other.keys), sorted(here.keys))
+
+    def test_gap_in_the_change_log_rebuilds(self):
+        make_student(1, name='Sita Thapa')
+        index = autocomplete.AutocompleteIndex()
+        index.refresh()
+        student = make_student(2, name='Gita Rai')
+        generation = autocomplete.record_change(student.pk)
+        autocomplete._cache().delete(autocomplete.CHANGE_KEY % generation)
+        # Written with update(), which sends no signal: only a rebuild finds it
+        Student.objects.filter(pk=student.pk).update(name='Hari Lama')
+        self.assertEqual(self.names(index, 'hari'), ['Hari Lama'])
+        self.assertEqual(index.generation, generation)
+
+
+@override_settings(ML_FEATURE_STORE_PATH=None)
+class ScoreStudentsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        model_dir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(model_dir.cleanup)
+        train_artifacts(model_dir.name)
+        cls.predictor = StudentPerformancePredictor(mode='flat', model_dir=model_dir.name)
+
+    @classmethod
+    def setUpTestData(cls):
+        for i, record in enumerate(sample_records(10)):
+            PerformanceProfile.objects.create(student=make_student(i), **record)
+
+    def setUp(self):
+        patcher = mock.patch('ml_models.predictor.predictor', self.predictor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def score(self, *args):
+        out = StringIO()
+        call_command('score_students', '--chunk-size', '3', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def scored_at(self):
+        return dict(StudentPrediction.objects.values_list('student_id', 'scored_at'))
+
+    def test_an_interrupted_run_resumes_after_its_checkpoint(self):
+        from ml_models.executor import score_batch
+        pks = list(Student.objects.order_by('pk').values_list('pk', flat=True))
+        calls = []
+
+        def interrupt_second_chunk(records):
+            calls.append(len(records))
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return score_batch(records)
+
+        with mock.patch('student_app.management.commands.score_students.score_batch', interrupt_second_chunk):
+            with self.assertRaisesRegex(CommandError, f'Interrupted after student pk {pks[2]}'):
+                self.score()
+        checkpoint = ScoringCheckpoint.objects.get(name='score_students')
+        self.assertEqual((checkpoint.last_pk, checkpoint.scored), (pks[2], 3))
+        self.assertIsNone(checkpoint.finished_at)
+        first_chunk = self.scored_at()
+        self.assertEqual(sorted(first_chunk), pks[:3])
+
+        self.assertIn(f'Resuming after student pk {pks[2]}', self.score())
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.scored, 10)
+        self.assertIsNotNone(checkpoint.finished_at)
+        scored_at = self.scored_at()
+        self.assertEqual(sorted(scored_at), pks)
+        # The chunk written before the interruption is not scored again
+        self.assertEqual({pk: scored_at[pk] for pk in pks[:3]}, first_chunk)
+
+        records = [profile.to_features() for profile in PerformanceProfile.objects.order_by('student_id')]
+        self.assertEqual(
+            list(StudentPrediction.objects.order_by('student_id').values_list('predicted_grade', flat=True)),
+            self.predictor.predict_batch(records)['predictions'],
+        )
+
+    def test_incremental_runs_rescore_changed_profiles(self):
+        self.score()
+        before = self.scored_at()
+        changed = list(PerformanceProfile.objects.order_by('student_id')[:2])
+        for profile in changed:
+            profile.attendance_rate = 50
+            profile.save()
+
+        self.assertIn('Rescoring students whose profile changed', self.score('--incremental'))
+        after = self.scored_at()
+        self.assertEqual({pk for pk in after if after[pk] != before[pk]}, {profile.student_id for profile in changed})
+        self.assertEqual(ScoringCheckpoint.objects.get(name='score_students').scored, 2)
+
+        # Nothing changed since: nothing is rescored
+        self.score('--incremental')
+        self.assertEqual(self.scored_at(), after)
@@ -16,6 +16,7 @@ urlpatterns = [
     # Student CRUD routes
     path('students/', views.student_list, name='student_list'),
     path('students/create/', views.student_create, name='student_create'),
+    path('students/at-risk/', views.at_risk_students, name='at_risk_students'),
     path('students/<int:pk>/', views.student_detail, name='student_detail'),
     path('students/<int:pk>/update/', views.student_update, name='student_update'),
     path('students/<int:pk>/delete/', views.student_delete, name='student_delete'),
@@ -35,4 +36,9 @@ urlpatterns = [
     # ML-powered features
     path('predict-performance/', views.predict_performance, name='predict_performance'),
     path('performance-analytics/', views.performance_analytics, name='performance_analytics'),
+    path('api/ml/predict/', views.predict_performance_api, name='predict_performance_api'),
+    path('api/ml/what-if/', views.what_if_api, name='what_if_api'),
+    path('api/ml/ready/', views.model_ready, name='model_ready'),
+    path('api/ml/status/', views.model_status, name='model_status'),
+    path('api/ml/metrics/', views.model_metrics, name='model_metrics'),
 ]
@@ -11,17 +11,28 @@ def student_results(request):
         pass
     return render(request, 'student_app/student_results.html', {'student': student})
 # ...existing code...
+import json
+import logging
+import math
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
-from django.db.models import Q
 from django.http import JsonResponse
-from .models import Student, Teacher
+from django.views.decorators.http import require_POST
+from .models import PerformanceProfile, Student, StudentAggregate, StudentPrediction, Teacher
+from . import autocomplete, search
+from .pagination import KeysetPaginator, read_cursor
 from .forms import StudentForm, TeacherForm, StudentSearchForm, TeacherSearchForm, StudentSignupForm, TeacherSignupForm
-from ml_models.predictor import predictor
+from ml_models import batching, executor, prediction_cache
+from ml_models.predictor import READY, predictor
+from ml_models.registry import get_registry
+
+logger = logging.getLogger(__name__)
 
 # Create your views here.
 def home(request):  
@@ -211,12 +222,45 @@ def is_teacher(user):
     from teacher_app.models import TeacherProfile
     return user.is_authenticated and TeacherProfile.objects.filter(user=user).exists()
 
+
+def keyset_listings():
+    return getattr(settings, 'LISTING_PAGINATION', 'offset') == 'keyset'
+
+
+def listing_form(request, form_class, model):
+    """A listing's search form, bound to the filters its cursor carries when paging by cursor"""
+    payload = read_cursor(model, request.GET.get('cursor')) if keyset_listings() else None
+    return form_class(payload['f'] if payload else request.GET)
+
+
+def paginate_listing(request, queryset, search_form, per_page, total=None):
+    """Page a filtered listing and return (page, total)
+
+    Pages are numbered (OFFSET) by default, or walked with signed cursors
+    when LISTING_PAGINATION is 'keyset'. ``total`` is a count known without
+    counting (from the per-course/grade counters) that labels a cursor
+    listing instead of a COUNT(*); cursors stop where the rows stop, so it
+    never decides which pages exist. Numbered pages count the queryset.
+    """
+    if keyset_listings():
+        filters = {name: search_form.data[name] for name in search_form.fields if search_form.data.get(name)}
+        paginator = KeysetPaginator(
+            queryset, per_page, filters, count=getattr(settings, 'LISTING_COUNTS', True), total=total,
+        )
+        page_obj = paginator.page(request.GET.get('cursor'))
+        return page_obj, page_obj.count
+    paginator = Paginator(queryset, per_page)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return page_obj, paginator.count
+
+
 @login_required
 @user_passes_test(is_teacher)
 def student_list(request):
     """Display list of all students with search and pagination"""
     students = Student.objects.all()
-    search_form = StudentSearchForm(request.GET)
+    search_form = listing_form(request, StudentSearchForm, Student)
+    known_total = None
     
     # Apply search filters
     if search_form.is_valid():
@@ -225,28 +269,24 @@ def student_list(request):
         grade_filter = search_form.cleaned_data.get('grade_filter')
         
         if search_query:
-            students = students.filter(
-                Q(name__icontains=search_query) |
-                Q(roll_number__icontains=search_query) |
-                Q(email__icontains=search_query) |
-                Q(course__icontains=search_query)
-            )
+            students = search.filter_search(students, search_query, ['name', 'roll_number', 'email', 'course'])
         
         if course_filter:
             students = students.filter(course__icontains=course_filter)
             
         if grade_filter:
             students = students.filter(grade=grade_filter)
+
+        if keyset_listings() and not search_query and not course_filter:
+            # Shown instead of a COUNT(*) when paging by cursor
+            known_total = StudentAggregate.summary(grade=grade_filter or None)['count']
     
-    # Pagination
-    paginator = Paginator(students, 10)  # 10 students per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj, total_students = paginate_listing(request, students, search_form, 10, known_total)  # 10 students per page
     
     context = {
         'page_obj': page_obj,
         'search_form': search_form,
-        'total_students': students.count(),
+        'total_students': total_students,
     }
     return render(request, 'student_app/student_list.html', context)
 
@@ -324,12 +364,43 @@ def student_delete(request, pk):
     return render(request, 'student_app/confirm_delete.html', context)
 
 
+@login_required
+@user_passes_test(is_teacher)
+def at_risk_students(request):
+    """Students whose stored prediction is below the at-risk threshold
+
+    Reads the scores precomputed by manage.py score_students; the list is
+    one range scan over the indexed predicted_grade column, lowest first.
+    """
+    default_threshold = getattr(settings, 'ML_AT_RISK_THRESHOLD', 60)
+    try:
+        threshold = finite(request.GET.get('threshold', default_threshold), 'threshold')
+    except ValueError:
+        threshold = default_threshold
+
+    predictions = (
+        StudentPrediction.objects
+        .filter(predicted_grade__lt=threshold)
+        .select_related('student')
+        .order_by('predicted_grade', 'pk')
+    )
+    paginator = Paginator(predictions, 25)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    context = {
+        'page_obj': page_obj,
+        'threshold': threshold,
+        'total_at_risk': paginator.count,
+    }
+    return render(request, 'student_app/at_risk_students.html', context)
+
+
 # ============== TEACHER CRUD VIEWS ==============
 
 def teacher_list(request):
     """Display list of all teachers with search and pagination"""
     teachers = Teacher.objects.all()
-    search_form = TeacherSearchForm(request.GET)
+    search_form = listing_form(request, TeacherSearchForm, Teacher)
     
     # Apply search filters
     if search_form.is_valid():
@@ -337,24 +408,17 @@ def teacher_list(request):
         course_filter = search_form.cleaned_data.get('course_filter')
         
         if search_query:
-            teachers = teachers.filter(
-                Q(name__icontains=search_query) |
-                Q(email__icontains=search_query) |
-                Q(course__icontains=search_query)
-            )
+            teachers = search.filter_search(teachers, search_query, ['name', 'email', 'course'])
         
         if course_filter:
             teachers = teachers.filter(course__icontains=course_filter)
     
-    # Pagination
-    paginator = Paginator(teachers, 10)  # 10 teachers per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj, total_teachers = paginate_listing(request, teachers, search_form, 10)  # 10 teachers per page
     
     context = {
         'page_obj': page_obj,
         'search_form': search_form,
-        'total_teachers': teachers.count(),
+        'total_teachers': total_teachers,
     }
     return render(request, 'student_app/teacher_list.html', context)
 
@@ -430,21 +494,20 @@ def student_search_api(request):
     """AJAX endpoint for student search"""
     query = request.GET.get('q', '')
     if query:
-        students = Student.objects.filter(
-            Q(name__icontains=query) |
-            Q(roll_number__icontains=query) |
-            Q(email__icontains=query)
-        )[:10]  # Limit to 10 results
-        
-        data = [{
-            'id': student.id,
-            'name': student.name,
-            'roll_number': student.roll_number,
-            'email': student.email,
-            'course': student.course,
-            'grade': student.grade,
-        } for student in students]
-        
+        if autocomplete.enabled():
+            # Served from the in-memory prefix index, without a query
+            data = autocomplete.get_index().search(query, limit=10)
+        else:
+            # Best 10 prefix matches, ranked
+            students = search.ranked_search(Student, query, ['name', 'roll_number', 'email'], limit=10)
+            data = [{
+                'id': student.id,
+                'name': student.name,
+                'roll_number': student.roll_number,
+                'email': student.email,
+                'course': student.course,
+                'grade': student.grade,
+            } for student in students]
         return JsonResponse({'students': data})
     
     return JsonResponse({'students': []})
@@ -454,11 +517,8 @@ def teacher_search_api(request):
     """AJAX endpoint for teacher search"""
     query = request.GET.get('q', '')
     if query:
-        teachers = Teacher.objects.filter(
-            Q(name__icontains=query) |
-            Q(email__icontains=query) |
-            Q(course__icontains=query)
-        )[:10]  # Limit to 10 results
+        # Best 10 prefix matches, ranked
+        teachers = search.ranked_search(Teacher, query, ['name', 'email', 'course'], limit=10)
         
         data = [{
             'id': teacher.id,
@@ -482,41 +542,100 @@ def get_student_grade(request, pk):
     })
 
 
+def finite(value, name):
+    """``value`` as a float, rejecting NaN and infinities"""
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a finite number")
+    return number
+
+
+def prediction_input(data):
+    """Build the predictor's input dict from form or JSON data
+
+    Raises ValueError/TypeError when a numeric field is not a finite number.
+    """
+    return {
+        'gender': data.get('gender'),
+        'race_ethnicity': data.get('race_ethnicity'),
+        'parental_level_of_education': data.get('parental_level_of_education'),
+        'lunch': data.get('lunch'),
+        'test_preparation_course': data.get('test_preparation_course'),
+        'study_hours_per_week': int(finite(data.get('study_hours_per_week', 0), 'study_hours_per_week')),
+        'attendance_rate': finite(data.get('attendance_rate', 0), 'attendance_rate'),
+        'previous_grade': finite(data.get('previous_grade', 0), 'previous_grade'),
+    }
+
+
+def save_performance_profile(request, student_data):
+    """Keep a student's latest inputs so the bulk scorer can rescore them
+
+    Inputs outside the profile's choices and ranges are not stored (they
+    would end up in the training data), and a profile that cannot be saved
+    never costs the user their prediction.
+    """
+    try:
+        student = Student.objects.filter(user=request.user).first()
+        if student is None:
+            return
+        profile = PerformanceProfile.objects.filter(student=student).first() or PerformanceProfile(student=student)
+        for field, value in student_data.items():
+            setattr(profile, field, value)
+        profile.full_clean()
+        profile.save()
+    except ValidationError as e:
+        messages.warning(request, f'Your inputs were not saved to your profile: {"; ".join(e.messages)}')
+    except Exception:
+        logger.exception("Could not save the performance profile of user %s", request.user.pk)
+
+
+def shadow_score(student_data, result):
+    """Queue a served prediction for the registry's shadow models (never blocks)"""
+    registry = get_registry()
+    if registry is not None:
+        registry.submit(student_data, result)
+
+
 @login_required
 def predict_performance(request):
     """ML-powered student performance prediction view"""
     if request.method == 'POST':
         try:
             # Get input data from form
-            student_data = {
-                'gender': request.POST.get('gender'),
-                'race_ethnicity': request.POST.get('race_ethnicity'),
-                'parental_level_of_education': request.POST.get('parental_level_of_education'),
-                'lunch': request.POST.get('lunch'),
-                'test_preparation_course': request.POST.get('test_preparation_course'),
-                'study_hours_per_week': int(request.POST.get('study_hours_per_week', 0)),
-                'attendance_rate': float(request.POST.get('attendance_rate', 0)),
-                'previous_grade': float(request.POST.get('previous_grade', 0)),
-            }
+            student_data = prediction_input(request.POST)
             
-            # Make prediction
-            predicted_grade, confidence = predictor.predict_grade(student_data)
+            # Make prediction (inline or in the inference worker pool)
+            outcome = executor.run_prediction(student_data, explain=True)
+            result = outcome['prediction']
+            predicted_grade = result['predicted_grade']
             
             if predicted_grade is not None:
-                # Generate recommendations
-                recommendations = predictor.generate_recommendations(student_data, predicted_grade)
+                shadow_score(student_data, result)
+                recommendations = outcome['recommendations']
+
+                save_performance_profile(request, student_data)
                 
+                # Why the model predicted this grade, feature by feature
+                explanation = outcome['explanation']
+                if explanation is not None and explanation['error'] is not None:
+                    explanation = None
+                if explanation is not None:
+                    for item in explanation['contributions']:
+                        item['label'] = item['feature'].replace('_', ' ').capitalize()
+
                 context = {
                     'prediction_made': True,
                     'predicted_grade': predicted_grade,
-                    'confidence': confidence,
+                    'confidence': result['confidence'],
+                    'model_version': result['model_version'],
                     'recommendations': recommendations,
+                    'explanation': explanation,
                     'student_data': student_data,
                 }
                 
                 messages.success(request, f'Prediction completed! Expected grade: {predicted_grade}')
             else:
-                messages.error(request, f'Prediction failed: {confidence}')
+                messages.error(request, f'Prediction failed: {result["error"]}')
                 context = {'prediction_made': False}
         
         except Exception as e:
@@ -528,6 +647,135 @@ def predict_performance(request):
     return render(request, 'student_app/predict_performance.html', context)
 
 
+@require_POST
+async def predict_performance_api(request):
+    """Async JSON prediction endpoint for ASGI deployments
+
+    Accepts the prediction form fields as a JSON object (or form data).
+    The session and user are loaded through the async ORM and inference
+    runs on a thread pool, so the event loop keeps serving other requests
+    while this one is scored.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    try:
+        if request.content_type == 'application/json':
+            data = json.loads(request.body)
+            if not isinstance(data, dict):
+                raise ValueError("expected a JSON object")
+        else:
+            data = request.POST
+        student_data = prediction_input(data)
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'error': f'Invalid input: {e}'}, status=400)
+
+    outcome = await executor.arun_prediction(student_data)
+    result = outcome['prediction']
+    if result['predicted_grade'] is None:
+        return JsonResponse({'error': result['error']}, status=503)
+    shadow_score(student_data, result)
+
+    return JsonResponse({
+        'predicted_grade': result['predicted_grade'],
+        'confidence': result['confidence'],
+        'lower': result['lower'],
+        'upper': result['upper'],
+        'model_version': result['model_version'],
+        'recommendations': outcome['recommendations'],
+    })
+
+
+def what_if_grid(sweep):
+    """Turn the request's sweep spec into {column: [values]}
+
+    Each column takes either an explicit list of values or
+    {"start": a, "stop": b, "steps": n} for n evenly spaced values. The
+    grid size is checked against ML_WHAT_IF_MAX_POINTS before any values
+    are built.
+    """
+    if not isinstance(sweep, dict):
+        raise ValueError("'sweep' must be an object mapping feature names to values")
+    max_points = getattr(settings, 'ML_WHAT_IF_MAX_POINTS', 10000)
+    sizes = {}
+    for column, spec in sweep.items():
+        if isinstance(spec, dict):
+            sizes[column] = int(finite(spec['steps'], 'steps'))
+            if sizes[column] < 1:
+                raise ValueError(f"'steps' for {column} must be at least 1")
+        elif isinstance(spec, list):
+            sizes[column] = len(spec)
+        else:
+            raise ValueError(f"{column} must be a list of values or a start/stop/steps object")
+    n_points = math.prod(sizes.values())
+    if n_points > max_points:
+        raise ValueError(f"Grid has {n_points} points, at most {max_points} allowed")
+
+    grid = {}
+    for column, spec in sweep.items():
+        if isinstance(spec, dict):
+            start, stop, steps = finite(spec['start'], 'start'), finite(spec['stop'], 'stop'), sizes[column]
+            step = (stop - start) / (steps - 1) if steps > 1 else 0
+            grid[column] = [start + i * step for i in range(steps)]
+        else:
+            grid[column] = [finite(value, column) for value in spec]
+    return grid
+
+
+@require_POST
+async def what_if_api(request):
+    """What-if sweep for one profile over one or two numeric inputs (JSON)
+
+    Body: {"profile": {<prediction form fields>}, "sweep": {"study_hours_per_week":
+    {"start": 0, "stop": 40, "steps": 41}, "attendance_rate": [80, 90, 100]}}.
+    Every grid point is scored in one batched model call.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    try:
+        data = json.loads(request.body)
+        student_data = prediction_input(data['profile'])
+        grid = what_if_grid(data['sweep'])
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        return JsonResponse({'error': f'Invalid input: {e}'}, status=400)
+
+    result = await executor.arun(predictor.what_if, student_data, grid)
+    if result['error']:
+        status = 400 if result['model_version'] else 503
+        return JsonResponse({'error': result['error']}, status=status)
+    return JsonResponse(result)
+
+
+def model_ready(request):
+    """Unauthenticated readiness probe: the model load state, 200 when ready and 503 otherwise"""
+    state = predictor.state
+    return JsonResponse({'state': state}, status=200 if state == READY else 503)
+
+
+@login_required
+def model_status(request):
+    """Detailed ML model load and reload status (JSON)"""
+    return JsonResponse(predictor.status())
+
+
+@login_required
+@user_passes_test(lambda user: user.is_staff)
+def model_metrics(request):
+    """Serving metrics for tuning the ML inference path (JSON)"""
+    cache = prediction_cache.get_cache()
+    registry = get_registry()
+    return JsonResponse({
+        'model': predictor.status(),
+        'batching': batching.get_batcher().metrics() if getattr(settings, 'ML_MICROBATCH_ENABLED', False) else None,
+        'executor': executor.get_executor().metrics(),
+        'cache': cache.metrics() if cache else None,
+        'registry': registry.metrics() if registry else None,
+    })
+
+
 @login_required
 def performance_analytics(request):
     """View for performance analytics and insights"""
@@ -132,3 +132,101 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = 'student_login'
 LOGIN_REDIRECT_URL = 'student_dashboard'
 LOGOUT_REDIRECT_URL = 'home'
+
+# Machine learning settings
+# The model artifacts in ml_models/ are not in the repository: run
+# `python ml_models/train_model.py` (or `--source db` to train on the
+# database) before serving predictions
+# 'flat' serves predictions from the packed NumPy forest engine,
+# 'sklearn' from the fitted RandomForestRegressor itself
+ML_PREDICTOR_MODE = 'flat'
+
+# 'compact' serves the distilled float32 forest written by
+# `train_model.py --compact`: smaller and faster, slightly less accurate, and
+# its trees agree more closely, so confidence and intervals read tighter
+ML_MODEL_VARIANT = 'full'
+
+# Start loading the model in the background when a WSGI/ASGI worker boots;
+# otherwise it is loaded on the first prediction
+ML_MODEL_PRELOAD = True
+
+# Seconds a prediction request waits for an in-progress model load
+ML_MODEL_LOAD_TIMEOUT = 10
+
+# Seconds between checks of ml_models/ for a newly deployed model (0 disables);
+# `manage.py reload_model` also triggers a reload through this watcher
+ML_MODEL_WATCH_INTERVAL = 5
+
+# Signal that makes a worker hot-reload the model, e.g. 'SIGUSR2' (None
+# disables). Only set it where every serving process installs the handler:
+# a worker that receives a signal it does not handle exits (e.g. under
+# gunicorn --preload), and the watcher above reloads without it
+ML_MODEL_RELOAD_SIGNAL = None
+
+# Coalesce concurrent prediction requests arriving within the window (or up
+# to the row limit) into a single vectorized model call
+ML_MICROBATCH_ENABLED = True
+ML_MICROBATCH_WINDOW_MS = 2
+ML_MICROBATCH_MAX_ROWS = 64
+ML_MICROBATCH_TIMEOUT = 30
+
+# Where prediction work runs: 'inline' on the request thread, or 'process'
+# in a pool of prewarmed worker processes (None workers = one per CPU)
+ML_EXECUTOR_BACKEND = 'inline'
+ML_EXECUTOR_WORKERS = None
+ML_EXECUTOR_MAX_PENDING = 64
+ML_EXECUTOR_TIMEOUT = 10
+
+# Threads that run predictions for the async API view under ASGI
+ML_ASYNC_INFERENCE_THREADS = 64
+
+# LRU cache of prediction results, keyed on the inputs + model version
+# (0 disables). QUANTIZE optionally snaps numeric inputs to a grid, e.g.
+# {'study_hours_per_week': 0.5, 'attendance_rate': 1, 'previous_grade': 1}
+ML_PREDICTION_CACHE_SIZE = 1024
+ML_PREDICTION_CACHE_TTL = 300
+ML_PREDICTION_CACHE_QUANTIZE = None
+
+# Largest grid the what-if endpoint scores in one call
+ML_WHAT_IF_MAX_POINTS = 10000
+
+# Predicted grade below which a student shows up on the teachers' at-risk list
+ML_AT_RISK_THRESHOLD = 60
+
+# Memory-mapped file of every student's encoded features, rebuilt by
+# `manage.py build_feature_store` and kept current on profile saves (None disables)
+ML_FEATURE_STORE_PATH = str(BASE_DIR / 'ml_models' / 'student_features.store')
+
+# Shadow model versions (managed with `manage.py model_registry`) score the
+# same prediction inputs in a background process; work beyond the queue size is
+# dropped rather than delaying requests. Set the path to None to disable.
+ML_MODEL_REGISTRY_PATH = str(BASE_DIR / 'ml_models' / 'registry.json')
+ML_SHADOW_QUEUE_SIZE = 256
+ML_SHADOW_SAMPLE_RATE = 1.0
+# Local address, e.g. ('127.0.0.1', 6391), for one shared shadow scorer per
+# host: the first worker to bind it starts the scorer process, the other
+# workers send their samples to it. None binds no port and gives every
+# worker its own scorer process once a shadow is registered
+ML_SHADOW_SCORER_ADDRESS = None
+
+# Search typeahead results are ranked by relevance (bm25) when at most this
+# many rows match; broader prefixes return the first matches unranked
+SEARCH_RANK_LIMIT = 1000
+
+# Cache holding the student autocomplete generation counter and change log.
+# With several worker processes the in-memory index needs a shared cache
+# (e.g. Redis or Memcached); with a per-process one such as the default
+# LocMemCache the type-ahead queries the database instead
+STUDENT_AUTOCOMPLETE_CACHE = 'default'
+
+# One process serves every request (runserver), so the index may use a
+# per-process cache. Keep this False when running several workers without a
+# shared cache, or workers would miss each other's changes
+STUDENT_AUTOCOMPLETE_SINGLE_PROCESS = DEBUG
+
+# 'offset' pages the student and teacher lists by page number; 'keyset' walks
+# them with signed next/previous cursors, so deep pages cost the same as the
+# first. In keyset mode the total is counted once on the first page, or not
+# at all with LISTING_COUNTS = False.
+LISTING_PAGINATION = 'offset'
+LISTING_COUNTS = True
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'student_result_management.settings')
 
 application = get_wsgi_application()
+
+# Warm up the ML model and the student type-ahead index in the background
+# so the worker can serve other traffic while they load
+from ml_models.predictor import preload_model
+from student_app.autocomplete import preload_index
+
+preload_model()
+preload_index()